@@ -19,6 +19,8 @@ from sqlmodel import SQLModel
 # Import all models so Alembic can detect them
 from app.models.user import User
 from app.models.token import RefreshToken, VerificationCode
+from app.models.usage import AgentUsage
+from app.models.checkpoint import checkpoint_metadata
 
 # Alembic Config object
 config = context.config
@@ -27,8 +29,8 @@ config = context.config
 if config.config_file_name is not None:
     fileConfig(config.config_file_name)
 
-# Set MetaData
-target_metadata = SQLModel.metadata
+# Set MetaData (checkpoint tables are plain Tables with their own MetaData)
+target_metadata = [SQLModel.metadata, checkpoint_metadata]
 
 
 # Get database URL from environment variables
@@ -3,39 +3,84 @@ Author: xuyoushun
 Email: xuyoushun@bestpay.com.cn
 Date: 2026/1/13 16:23
 Description:
+
+智能体注册表
+
+启动时只读取每个智能体目录下的 metadata.toml（不导入任何模块），智能体模块在第一次使用时才导入并实例化。
+metadata.toml 中通过 entry = "<模块>:<类名>" 指定入口，例如 entry = "graph:DeepAgent"。
+没有 metadata.toml 的智能体目录会退化为直接导入模块并查找 BaseAgent 子类。
+
 FilePath: __init__.py
 """
 
 import asyncio
 import importlib
 import inspect
+import threading
+import tomllib
+from dataclasses import dataclass, field
 from pathlib import Path
 
 from app.utils.singleton import SingletonMeta
-
-# from app.agents.common import BaseAgent
 from app.core.logger import logger_manager
 
 logger = logger_manager.get_logger(__name__)
 
+MANIFEST_FILE = "metadata.toml"
+
+
+@dataclass
+class AgentSpec:
+    """智能体清单信息（来自 metadata.toml）"""
+
+    id: str
+    package: str
+    module: str
+    class_name: str
+    metadata: dict = field(default_factory=dict)
+
 
 class AgentManager(metaclass=SingletonMeta):
     def __init__(self):
+        self._specs: dict[str, AgentSpec] = {}
         self._classes = {}
         self._instances = {}  # 存储已创建的 agent 实例
+        self._lock = threading.RLock()
 
     def register_agent(self, agent_class):
         self._classes[agent_class.__name__] = agent_class
 
+    def register_spec(self, spec: AgentSpec):
+        self._specs[spec.id] = spec
+
+    def _load_class(self, agent_id):
+        """按需导入智能体模块"""
+        if agent_id in self._classes:
+            return self._classes[agent_id]
+        if agent_id not in self._specs:
+            raise KeyError(f"Agent {agent_id} is not registered")
+
+        spec = self._specs[agent_id]
+        module = importlib.import_module(spec.module)
+        agent_class = getattr(module, spec.class_name)
+        logger.info(f"加载智能体: {agent_id} 来自 {spec.module}")
+        self.register_agent(agent_class)
+        return agent_class
+
+    def get_agent_ids(self) -> list[str]:
+        return list(dict.fromkeys([*self._specs, *self._classes]))
+
     def init_all_agents(self):
-        for agent_id in self._classes.keys():
+        for agent_id in self.get_agent_ids():
             self.get_agent(agent_id)
 
     def get_agent(self, agent_id, reload=False, reload_graph=False, **kwargs):
         # 检查是否已经创建了该 agent 的实例
         if reload or agent_id not in self._instances:
-            agent_class = self._classes[agent_id]
-            self._instances[agent_id] = agent_class()
+            with self._lock:
+                if reload or agent_id not in self._instances:
+                    agent_class = self._load_class(agent_id)
+                    self._instances[agent_id] = agent_class()
 
         # 如果仅需要重新加载 graph，则清空 graph 缓存
         if reload_graph and agent_id in self._instances:
@@ -43,29 +88,102 @@ class AgentManager(metaclass=SingletonMeta):
 
         return self._instances[agent_id]
 
+    async def aget_agent(self, agent_id, reload=False, reload_graph=False):
+        """异步获取智能体：导入模块和实例化在线程中执行，事件循环上不持有线程锁"""
+        if not reload and not reload_graph and agent_id in self._instances:
+            return self._instances[agent_id]
+        return await asyncio.to_thread(self.get_agent, agent_id, reload=reload, reload_graph=reload_graph)
+
     def get_agents(self):
+        """返回所有智能体实例（未加载的智能体会在此时加载）"""
+        self.init_all_agents()
         return list(self._instances.values())
 
+    def list_agents(self) -> list[dict]:
+        """列出所有已注册的智能体：有清单的读取清单信息（不导入模块），没有清单的读取类属性"""
+        agents = []
+        for agent_id in self.get_agent_ids():
+            spec = self._specs.get(agent_id)
+            if spec is not None:
+                name, description = spec.metadata.get("name", agent_id), spec.metadata.get("description", "")
+            else:
+                agent_class = self._classes[agent_id]
+                name, description = getattr(agent_class, "name", agent_id), getattr(agent_class, "description", "")
+            agents.append({
+                "id": agent_id,
+                "name": name,
+                "description": description,
+                "loaded": agent_id in self._instances,
+            })
+        return agents
+
     async def reload_all(self):
-        for agent_id in self._classes.keys():
-            self.get_agent(agent_id, reload=True)
+        for agent_id in self.get_agent_ids():
+            await self.aget_agent(agent_id, reload=True)
 
     async def get_agents_info(self):
-        agents = self.get_agents()
+        agents = [await self.aget_agent(agent_id) for agent_id in self.get_agent_ids()]
         return await asyncio.gather(*[a.get_info() for a in agents])
 
+    async def warm_up(self, build_graph: bool = False):
+        """后台预热：在线程中导入并实例化所有智能体，可选地预先构建默认配置的 graph"""
+        for agent_id in self.get_agent_ids():
+            try:
+                agent = await asyncio.to_thread(self.get_agent, agent_id)
+                if build_graph:
+                    await agent.get_graph()
+                logger.info(f"智能体预热完成: {agent_id}")
+            except Exception as e:
+                logger.warning(f"智能体 {agent_id} 预热失败: {e}")
+
+    def _read_manifest(self, item: Path) -> AgentSpec | None:
+        manifest = item / MANIFEST_FILE
+        if not manifest.exists():
+            return None
+        with open(manifest, "rb") as f:
+            metadata = tomllib.load(f)
+        entry = metadata.get("entry")
+        if not entry or ":" not in entry:
+            raise ValueError(f"{manifest} 缺少 entry = \"<模块>:<类名>\"")
+        module_name, class_name = entry.split(":", 1)
+        package = f"{__name__}.{item.name}"
+        return AgentSpec(
+            id=class_name,
+            package=package,
+            module=f"{package}.{module_name}",
+            class_name=class_name,
+            metadata=metadata,
+        )
+
+    def _import_agents(self, item: Path):
+        """没有清单的智能体：直接导入模块查找 BaseAgent 子类"""
+        from app.agents.common import BaseAgent
+
+        module_name = f"{__name__}.{item.name}"
+        module = importlib.import_module(module_name)
+
+        # 查找模块中所有 BaseAgent 的子类
+        for name, obj in inspect.getmembers(module):
+            if (
+                inspect.isclass(obj)
+                and issubclass(obj, BaseAgent)
+                and obj is not BaseAgent
+                and obj.__module__.startswith(module_name)
+            ):
+                logger.info(f"自动发现智能体: {obj.__name__} 来自 {item.name}")
+                self.register_agent(obj)
+
     def auto_discover_agents(self):
-        """自动发现并注册 src/agents/ 下的所有智能体。
+        """自动发现并注册 app/agents/ 下的所有智能体。
 
-        遍历 src/agents/ 目录下的所有子文件夹，如果子文件夹包含 __init__.py，
-        则尝试从中导入 BaseAgent 的子类并注册。(使用自动导入的方式，支持私有agent)
+        遍历 app/agents/ 目录下的所有子文件夹，优先读取 metadata.toml 清单（不导入模块），
+        没有清单时导入子文件夹中的 BaseAgent 子类并注册。(使用自动导入的方式，支持私有agent)
         """
         # 获取 agents 目录的路径
         agents_dir = Path(__file__).parent
 
         # 遍历所有子目录
-        for item in agents_dir.iterdir():
-            logger.info(f"尝试导入模块：{item}")
+        for item in sorted(agents_dir.iterdir()):
             # 跳过非目录、common 目录、__pycache__ 等
             if not item.is_dir() or item.name.startswith("_") or item.name == "common":
                 continue
@@ -76,32 +194,22 @@ class AgentManager(metaclass=SingletonMeta):
                 logger.warning(f"{item} 不是一个有效的模块")
                 continue
 
-            # 尝试导入模块
             try:
-                module_name = f"src.agents.{item.name}"
-                module = importlib.import_module(module_name)
-
-                # 查找模块中所有 BaseAgent 的子类
-                for name, obj in inspect.getmembers(module):
-                    if (
-                        inspect.isclass(obj)
-                        and issubclass(obj, BaseAgent)
-                        and obj is not BaseAgent
-                        and obj.__module__.startswith(module_name)
-                    ):
-                        logger.info(f"自动发现智能体: {obj.__name__} 来自 {item.name}")
-                        self.register_agent(obj)
-
+                spec = self._read_manifest(item)
+                if spec is not None:
+                    self.register_spec(spec)
+                    logger.debug(f"注册智能体清单: {spec.id} 来自 {item.name}")
+                else:
+                    self._import_agents(item)
             except Exception as e:
                 logger.warning(f"无法从 {item.name} 加载智能体: {e}")
 
 
 agent_manager = AgentManager()
-# 自动发现并注册所有智能体
+# 只读取清单注册智能体，模块在第一次使用时才导入
 agent_manager.auto_discover_agents()
-agent_manager.init_all_agents()
 
-__all__ = ["agent_manager"]
+__all__ = ["agent_manager", "AgentManager", "AgentSpec"]
 
 
 if __name__ == "__main__":
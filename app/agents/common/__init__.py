@@ -11,7 +11,7 @@ from app.agents.common.base import BaseAgent
 from app.agents.common.context import BaseContext
 
 # Model utilities - 模型加载
-from app.agents.common.models import load_chat_model
+from app.agents.common.models import load_chat_model, load_configured_chat_model
 from app.agents.common.state import BaseState
 
 # Tools - 核心工具函数
@@ -27,6 +27,7 @@ __all__ = [
     "BaseState",
     # Model utilities
     "load_chat_model",
+    "load_configured_chat_model",
     # Core tools
     "get_buildin_tools",
     "gen_tool_info",
@@ -0,0 +1,193 @@
+"""
+Author: xuyoushun
+Email: xuyoushun@bestpay.com.cn
+Date: 2026/1/30 16:30
+Description:
+
+附件检索：只把与当前问题相关的附件片段放进提示词
+
+- 每个附件按段落切分为约 AGENT_ATTACHMENT_CHUNK_TOKENS 的片段，片段带上所在的标题和起始行号
+- 在片段上建立 BM25 倒排索引；中文没有空格分词，按连续汉字的二元组（bigram）切词
+- 索引按附件内容哈希缓存（LRU，AGENT_ATTACHMENT_CACHE_SIZE），同一线程的多次运行只切分和建索引一次
+- search 按最新的用户问题取 top-k 片段，总长度不超过 AGENT_ATTACHMENT_RETRIEVAL_TOKENS
+
+FilePath: attachment_index
+"""
+
+from __future__ import annotations
+
+import math
+import re
+import threading
+from collections import Counter, OrderedDict
+from collections.abc import Sequence
+
+from app.agents.common.prompt import estimate_tokens, truncate_tokens
+from app.core.config import settings
+from app.core.metrics import metrics_manager
+
+_WORD = re.compile(r"[a-z0-9_]+|[\u3400-\u9fff]+")
+
+
+def tokenize(text: str) -> list[str]:
+    """英文数字按单词切分，连续的汉字切为二元组（单个汉字保留本身）"""
+    terms: list[str] = []
+    for word in _WORD.findall(text.lower()):
+        if word[0].isascii():
+            terms.append(word)
+        elif len(word) == 1:
+            terms.append(word)
+        else:
+            terms.extend(word[i:i + 2] for i in range(len(word) - 1))
+    return terms
+
+
+def chunk_markdown(markdown: str, max_tokens: int) -> list[tuple[int, str]]:
+    """
+    按段落切分 markdown，相邻段落合并到 max_tokens 以内
+
+    Returns:
+        [(起始行号（从 0 开始）, 片段文本)]，片段不在标题处开始时在前面补上最近的标题
+    """
+    chunks: list[tuple[int, str]] = []
+    heading = ""  # 最近的标题
+    context = ""  # 当前片段开始时所在的标题
+    start, lines, tokens = 0, [], 0
+
+    def flush():
+        text = "\n".join(lines).strip()
+        if text:
+            if context and not text.startswith(context):
+                text = f"{context}\n{text}"
+            chunks.append((start, text))
+
+    for lineno, line in enumerate(markdown.splitlines()):
+        line_tokens = estimate_tokens(line) + 1
+        if line_tokens > max_tokens:  # 超长的单行直接截断
+            line = truncate_tokens(line, max_tokens - 1)
+            line_tokens = max_tokens
+        # 超出长度时开始新的片段；已超过一半长度时在空行或标题处提前断开
+        boundary = not line.strip() or line.startswith("#")
+        if lines and (tokens + line_tokens > max_tokens or (boundary and tokens >= max_tokens // 2)):
+            flush()
+            lines, tokens = [], 0
+        if not lines and not line.strip():  # 片段不以空行开始
+            continue
+        if line.startswith("#"):
+            heading = line.strip()
+        if not lines:
+            start, context = lineno, heading
+        lines.append(line)
+        tokens += line_tokens
+    flush()
+    return chunks
+
+
+class BM25Index:
+    """附件片段的 BM25 索引"""
+
+    def __init__(self, chunks: list[dict], k1: float = 1.5, b: float = 0.75):
+        self.chunks = chunks
+        self.k1 = k1
+        self.b = b
+        self.postings: dict[str, list[tuple[int, int]]] = {}
+        self.lengths: list[int] = []
+        for doc_id, chunk in enumerate(chunks):
+            terms = Counter(tokenize(chunk["text"]))
+            self.lengths.append(sum(terms.values()))
+            for term, freq in terms.items():
+                self.postings.setdefault(term, []).append((doc_id, freq))
+        self.avg_length = sum(self.lengths) / len(self.lengths) if self.lengths else 0.0
+        n = len(chunks)
+        self.idf = {
+            term: math.log(1 + (n - len(docs) + 0.5) / (len(docs) + 0.5))
+            for term, docs in self.postings.items()
+        }
+
+    def scores(self, query: str) -> dict[int, float]:
+        scores: dict[int, float] = {}
+        for term in set(tokenize(query)):
+            idf = self.idf.get(term)
+            if idf is None:
+                continue
+            for doc_id, freq in self.postings[term]:
+                norm = self.k1 * (1 - self.b + self.b * self.lengths[doc_id] / (self.avg_length or 1))
+                scores[doc_id] = scores.get(doc_id, 0.0) + idf * freq * (self.k1 + 1) / (freq + norm)
+        return scores
+
+    def search(self, query: str, top_k: int, max_tokens: int) -> list[dict]:
+        """
+        返回与 query 最相关的片段，按附件和行号排序
+
+        没有任何词命中时返回每个附件开头的片段
+        """
+        scores = self.scores(query)
+        if scores:
+            ranked = sorted(scores, key=lambda doc_id: (-scores[doc_id], doc_id))
+        else:
+            ranked = [i for i, chunk in enumerate(self.chunks) if chunk["first"]]
+
+        selected, used = [], 0
+        for doc_id in ranked:
+            if len(selected) >= top_k:
+                break
+            chunk = self.chunks[doc_id]
+            if used + chunk["tokens"] > max_tokens:
+                if selected:
+                    continue
+                # 最相关的片段超出额度时截断后返回
+                text = truncate_tokens(chunk["text"], max_tokens)
+                if not text:
+                    break
+                chunk = {**chunk, "text": text, "tokens": estimate_tokens(text)}
+            selected.append(chunk)
+            used += chunk["tokens"]
+        return sorted(selected, key=lambda chunk: (chunk["attachment"], chunk["line"]))
+
+
+def build_index(attachments: Sequence[dict], chunk_tokens: int | None = None) -> BM25Index:
+    chunk_tokens = chunk_tokens or settings.agent.AGENT_ATTACHMENT_CHUNK_TOKENS
+    chunks = []
+    for idx, attachment in enumerate(attachments, 1):
+        if attachment.get("status") != "parsed" or not attachment.get("markdown"):
+            continue
+        for n, (line, text) in enumerate(chunk_markdown(attachment["markdown"], chunk_tokens)):
+            chunks.append({
+                "attachment": idx,
+                "file_name": attachment.get("file_name") or f"附件 {idx}",
+                "line": line,
+                "text": text,
+                "tokens": estimate_tokens(text),
+                "first": n == 0,
+            })
+    return BM25Index(chunks)
+
+
+class AttachmentIndexCache:
+    """附件哈希 -> BM25Index 的 LRU 缓存"""
+
+    def __init__(self, max_size: int | None = None):
+        self.max_size = max_size
+        self._items: OrderedDict[str, BM25Index] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, digest: str, attachments: Sequence[dict]) -> BM25Index:
+        with self._lock:
+            if digest in self._items:
+                self._items.move_to_end(digest)
+                return self._items[digest]
+
+        metrics_manager.inc("agent_attachment_index_builds_total")
+        index = build_index(attachments)
+        with self._lock:
+            self._items[digest] = index
+            while len(self._items) > (self.max_size or settings.agent.AGENT_ATTACHMENT_CACHE_SIZE):
+                self._items.popitem(last=False)
+        return index
+
+    def clear(self) -> None:
+        with self._lock:
+            self._items.clear()
+
+
+attachment_index_cache = AttachmentIndexCache()
@@ -9,18 +9,23 @@ FilePath: base
 from __future__ import annotations
 
 import importlib.util
-import os
 import tomllib as tomli
 from abc import abstractmethod
+from contextvars import Token
 from pathlib import Path
 
+from langchain_core.messages import BaseMessage, RemoveMessage
 from langchain_core.runnables import RunnableConfig
-from langgraph.checkpoint.memory import InMemorySaver
-# from langgraph.checkpoint.sqlite.aio import AsyncSqliteSaver, aiosqlite
+from langgraph.checkpoint.base import BaseCheckpointSaver
 from langgraph.graph.state import CompiledStateGraph
 
 from app.core.config import settings
+from app.agents.common.checkpoint import checkpointer_manager
 from app.agents.common.context import BaseContext
+from app.agents.common.graph_cache import GraphCache, graph_cache_key
+from app.agents.common.history import Projection, history_cache, paginate
+from app.agents.common.scheduler import run_priority
+from app.agents.common.usage import UsageCallbackHandler
 
 from app.core.logger import logger_manager
 
@@ -29,6 +34,29 @@ logger = logger_manager.get_logger(__name__)
 SAVE_DIR = "/.saves"
 
 
+def scoped_thread_id(user_id: str | None, thread_id: str) -> str:
+    """checkpoint 中使用的线程 ID，按用户划分命名空间，其他用户即使拿到 thread_id 也无法读取或续写该线程"""
+    return f"{user_id}:{thread_id}" if user_id else thread_id
+
+
+def _index_messages(messages: list[BaseMessage]) -> dict[str, BaseMessage]:
+    return {msg.id or f"#{i}": msg for i, msg in enumerate(messages)}
+
+
+def _diff_messages(
+        seen: dict[str, BaseMessage], messages: list[BaseMessage]
+) -> tuple[list[BaseMessage], dict[str, BaseMessage]]:
+    """返回相对 seen 新增 / 变化 / 删除的消息以及新的索引"""
+    current = _index_messages(messages)
+    delta = [
+        msg for key, msg in current.items()
+        # 大部分步骤中未变化的消息是同一个对象，只有对象不同时才比较内容
+        if key not in seen or (seen[key] is not msg and seen[key] != msg)
+    ]
+    delta.extend(RemoveMessage(id=key) for key in seen if key not in current and not key.startswith("#"))
+    return delta, current
+
+
 class BaseAgent:
     """
     定义一个基础 Agent 供 各类 graph 继承
@@ -38,9 +66,11 @@ class BaseAgent:
     description = "base_agent"
     capabilities: list[str] = []  # 智能体能力列表，如 ["file_upload", "web_search"] 等
     context_schema: type[BaseContext] = BaseContext  # 智能体上下文 schema
+    # 影响 graph 结构的上下文字段，取值不同的请求使用各自编译的 graph
+    graph_fields: tuple[str, ...] = ("model", "tools", "knowledges", "mcps")
 
     def __init__(self, **kwargs):
-        self.graph = None  # will be covered by get_graph
+        self.graph_cache: GraphCache = GraphCache(self.__class__.__name__, settings.agent.AGENT_GRAPH_CACHE_SIZE)
         self.checkpointer = None
         self.workdir = Path(SAVE_DIR) / "agents" / self.module_name
         self.workdir.mkdir(parents=True, exist_ok=True)
@@ -76,54 +106,133 @@ class BaseAgent:
     async def get_config(self):
         return self.context_schema.from_file(module_name=self.module_name)
 
-    async def stream_values(self, messages: list[str], input_context=None, **kwargs):
-        graph = await self.get_graph()
+    async def stream_values(self, messages: list[str], input_context=None, full_snapshot: bool = False, **kwargs):
+        """
+        按步骤流式输出消息
+
+        默认每一步只输出相对上一步新增或变化的消息（被删除的消息以 RemoveMessage 表示），
+        第一步以运行前线程中已有的消息为基准；full_snapshot=True 时每一步输出完整消息列表。
+        """
         context = self.context_schema.from_file(
             module_name=self.module_name, input_context=input_context
         )
-        for event in graph.astream(
-            {"messages": messages}, stream_mode="values", context=context
-        ):
-            yield event["messages"]
+        graph = await self.get_graph(context=context)
+
+        attachments = (input_context or {}).get("attachments", [])
+        input_config = self._run_config(input_context, recursion_limit=300)
+
+        seen: dict[str, BaseMessage] = {}
+        if not full_snapshot and (input_context or {}).get("thread_id") and graph.checkpointer is not None:
+            state = await graph.aget_state(input_config)
+            seen = _index_messages(state.values.get("messages", []) if state else [])
+
+        # 模型调用排队时的优先级：interactive（默认）或 background，运行结束后恢复
+        priority_token = run_priority.set(kwargs.get("priority", "interactive"))
+        try:
+            async for event in graph.astream(
+                {"messages": messages, "attachments": attachments},
+                stream_mode="values",
+                context=context,
+                config=input_config,
+            ):
+                current = event.get("messages", [])
+                if full_snapshot:
+                    yield current
+                    continue
+                delta, seen = _diff_messages(seen, current)
+                if delta:
+                    yield delta
+        finally:
+            await self._finish_run(input_config, priority_token)
 
     async def stream_messages(self, messages: list[str], input_context=None, **kwargs):
-        graph = await self.get_graph()
         context = self.context_schema.from_file(
             module_name=self.module_name, input_context=input_context
         )
+        graph = await self.get_graph(context=context)
         logger.debug(f"stream_messages: {context}")
         # TODO Checkpointer 似乎还没有适配最新的 1.0 Context API
 
         # 从 input_context 中提取 attachments（如果有）
         attachments = (input_context or {}).get("attachments", [])
 
-        input_config = RunnableConfig(configurable=input_context, recursion_limit=300)
+        input_config = self._run_config(input_context, recursion_limit=300)
 
-        async for msg, metadata in graph.astream(
-            {"messages": messages, "attachments": attachments},
-            stream_mode="messages",
-            context=context,
-            config=input_config,
-        ):
-            yield msg, metadata
+        # 模型调用排队时的优先级：interactive（默认）或 background，运行结束后恢复
+        priority_token = run_priority.set(kwargs.get("priority", "interactive"))
+        try:
+            async for msg, metadata in graph.astream(
+                {"messages": messages, "attachments": attachments},
+                stream_mode="messages",
+                context=context,
+                config=input_config,
+            ):
+                yield msg, metadata
+        finally:
+            await self._finish_run(input_config, priority_token)
 
     async def invoke_messages(self, messages: list[str], input_context=None, **kwargs):
-        graph = await self.get_graph()
         context = self.context_schema.from_file(
             module_name=self.module_name, input_context=input_context
         )
+        graph = await self.get_graph(context=context)
         logger.debug(f"invoke_messages: {context}")
 
         # 从 input_context 中提取 attachments（如果有）
         attachments = (input_context or {}).get("attachments", [])
-        input_config = RunnableConfig(configurable=input_context, recursion_limit=100)
-        msg = await graph.ainvoke(
-            {"messages": messages, "attachments": attachments},
-            context=context,
-            config=input_config,
-        )
+        input_config = self._run_config(input_context, recursion_limit=100)
+        # 模型调用排队时的优先级：interactive（默认）或 background，运行结束后恢复
+        priority_token = run_priority.set(kwargs.get("priority", "interactive"))
+        try:
+            msg = await graph.ainvoke(
+                {"messages": messages, "attachments": attachments},
+                context=context,
+                config=input_config,
+            )
+        finally:
+            await self._finish_run(input_config, priority_token)
         return msg
 
+    def client_context(self, config: dict) -> dict:
+        """
+        校验客户端传入的上下文覆盖项
+
+        只接受 AGENT_CLIENT_CONFIG_FIELDS 中且为 context_schema 字段的配置，thread_id / user_id 始终由服务端决定
+
+        Raises:
+            ValueError: 包含不允许覆盖的字段或取值类型不正确
+        """
+        allowed = set(settings.agent.AGENT_CLIENT_CONFIG_FIELDS) & set(self.context_schema.model_fields)
+        allowed -= {"thread_id", "user_id"}
+        rejected = sorted(set(config) - allowed)
+        if rejected:
+            raise ValueError(f"不允许覆盖的配置项: {', '.join(rejected)}")
+        return self.context_schema.model_validate(config).model_dump(include=set(config))
+
+    def _run_config(self, input_context: dict | None, recursion_limit: int) -> RunnableConfig:
+        configurable = dict(input_context or {})
+        if configurable.get("thread_id"):
+            configurable["thread_id"] = scoped_thread_id(configurable.get("user_id"), configurable["thread_id"])
+        config = RunnableConfig(configurable=configurable, recursion_limit=recursion_limit)
+        if settings.llm.LLM_USAGE_ENABLED:
+            # 回调会传递给运行中的所有模型调用，包括子智能体和中间件内部的调用
+            config["callbacks"] = [UsageCallbackHandler((input_context or {}).get("user_id"), self.id)]
+        return config
+
+    async def _flush_checkpoints(self, config: RunnableConfig) -> None:
+        """运行结束时同步刷新 write-behind 缓冲，保证其他 worker 可以继续该线程"""
+        thread_id = config["configurable"].get("thread_id")
+        if thread_id:
+            await checkpointer_manager.flush(thread_id)
+
+    async def _finish_run(self, config: RunnableConfig, priority_token: Token) -> None:
+        """运行结束：先刷新 checkpoint，再恢复运行优先级"""
+        await self._flush_checkpoints(config)
+        try:
+            run_priority.reset(priority_token)
+        except ValueError:  # 异步生成器在其他上下文中被关闭时 token 无法恢复，该上下文随之丢弃
+            pass
+
     async def check_checkpointer(self):
         app = await self.get_graph()
         if not hasattr(app, "checkpointer") or app.checkpointer is None:
@@ -133,77 +242,112 @@ class BaseAgent:
             return False
         return True
 
-    async def get_history(self, user_id, thread_id) -> list[dict]:
-        """获取历史消息"""
+    async def get_history(
+            self,
+            user_id,
+            thread_id,
+            limit: int | None = None,
+            before: str | None = None,
+            after: str | None = None,
+            projection: Projection = "full",
+    ) -> list[dict]:
+        """获取历史消息，参数含义见 get_history_page"""
+        page = await self.get_history_page(user_id, thread_id, limit, before, after, projection)
+        return page["messages"] if page else []
+
+    async def get_history_page(
+            self,
+            user_id,
+            thread_id,
+            limit: int | None = None,
+            before: str | None = None,
+            after: str | None = None,
+            projection: Projection = "full",
+    ) -> dict | None:
+        """
+        分页获取历史消息
+
+        Args:
+            limit: 最多返回的消息数，默认全部
+            before / after: 消息 id 游标，返回该消息之前 / 之后的消息
+            projection: full 为完整消息，light 只包含角色、文本内容和工具名
+
+        Returns:
+            {"messages", "has_more", "total", "checkpoint_id"}；线程不存在或不属于 user_id 时返回 None
+        """
+        page = {"messages": [], "has_more": False, "total": 0, "checkpoint_id": None}
         try:
             app = await self.get_graph()
 
             if not await self.check_checkpointer():
-                return []
+                return page
 
+            scoped_id = scoped_thread_id(user_id, thread_id)
             config = RunnableConfig(
-                configurable={"thread_id": thread_id, "user_id": user_id}
+                configurable={"thread_id": scoped_id, "user_id": user_id}
             )
             state = await app.aget_state(config)
+            checkpoint_id = (state.config or {}).get("configurable", {}).get("checkpoint_id") if state else None
+            if checkpoint_id is None:  # 线程按用户划分命名空间，其他用户的线程在这里同样查不到
+                return None
 
-            result = []
-            if state:
-                messages = state.values.get("messages", [])
-                for msg in messages:
-                    if hasattr(msg, "model_dump"):
-                        msg_dict = msg.model_dump()  # 转换成字典
-                    else:
-                        msg_dict = (
-                            dict(msg)
-                            if hasattr(msg, "__dict__")
-                            else {"content": str(msg)}
-                        )
-                    result.append(msg_dict)
-
-            return result
+            serialized = history_cache.get_or_serialize(
+                f"{self.id}:{scoped_id}", checkpoint_id, state.values.get("messages", []), projection
+            )
+            messages, has_more = paginate(serialized, limit, before, after)
+            page.update(messages=messages, has_more=has_more, total=len(serialized), checkpoint_id=checkpoint_id)
+            return page
 
         except Exception as e:
             logger.error(f"获取智能体 {self.name} 历史消息出错: {e}")
-            return []
+            return page
 
     def reload_graph(self):
         """重置 graph 缓存，强制下次调用 get_graph 时重新构建"""
-        self.graph = None
+        self.graph_cache.invalidate()
         logger.info(f"{self.name} graph 缓存已清空，将在下次调用时重新构建")
 
+    async def areload_graph(self) -> CompiledStateGraph:
+        """清空 graph 缓存并按文件配置重建，并发调用只会触发一次重建"""
+        context = self.context_schema.from_file(module_name=self.module_name)
+        graph = await self.graph_cache.reload(self.get_graph_key(context), lambda: self.build_graph(context))
+        logger.info(f"{self.name} graph 已重新构建")
+        return graph
+
+    def get_graph_key(self, context: BaseContext) -> str:
+        """根据 graph_fields 计算 graph 缓存 key"""
+        return graph_cache_key({field: getattr(context, field, None) for field in self.graph_fields})
+
+    async def get_graph(self, context: BaseContext | None = None, **kwargs) -> CompiledStateGraph:
+        """获取 context 对应的已编译 graph，未指定 context 时使用文件配置"""
+        if context is None:
+            context = self.context_schema.from_file(module_name=self.module_name)
+        return await self.graph_cache.get_or_build(self.get_graph_key(context), lambda: self.build_graph(context))
+
     @abstractmethod
-    async def get_graph(self, **kwargs) -> CompiledStateGraph:
+    async def build_graph(self, context: BaseContext) -> CompiledStateGraph:
         """
-        获取并编译对话图实例。
+        根据上下文配置构建并编译对话图实例，结果由 get_graph 按配置缓存。
         必须确保在编译时设置 checkpointer，否则将无法获取历史记录。
         例如: graph = workflow.compile(checkpointer=sqlite_checkpointer)
         """
         pass
 
-    async def _get_checkpointer(self):
-        # 创建数据库连接并确保设置 checkpointer
-        checkpointer = None
-
+    async def _get_checkpointer(self) -> BaseCheckpointSaver:
+        # 使用进程内共享的 checkpointer，同一个数据库文件只维护一个连接池；各配置的 graph 共用同一个实例
+        if self.checkpointer is not None:
+            return self.checkpointer
         try:
-            checkpointer = AsyncSqliteSaver(await self.get_async_conn())
-
+            self.checkpointer = await self.get_aio_memory()
         except Exception as e:
-            logger.error(f"构建 Graph 设置 checkpointer 时出错: {e}, 尝试使用内存存储")
-            checkpointer = InMemorySaver()
-
-        return checkpointer
-
-    async def get_async_conn(self) -> aiosqlite.Connection:
-        """获取异步数据库连接"""
-        conn = await aiosqlite.connect(os.path.join(self.workdir, "aio_history.db"))
-        # Patch: langgraph's AsyncSqliteSaver expects is_alive() method which aiosqlite may not have
-        if not hasattr(conn, "is_alive"):
-            conn.is_alive = lambda: True
-        return conn
+            # 不回退到内存存储：否则对话历史会在没有任何提示的情况下丢失
+            logger.error(f"构建 Graph 设置 checkpointer 时出错: {e}")
+            raise
+        return self.checkpointer
 
-    async def get_aio_memory(self) -> AsyncSqliteSaver:
+    async def get_aio_memory(self) -> BaseCheckpointSaver:
         """获取异步存储实例"""
-        return AsyncSqliteSaver(await self.get_async_conn())
+        return await checkpointer_manager.get_checkpointer(self.workdir / "aio_history.db")
 
     def load_metadata(self) -> dict:
         """Load metadata from metadata.toml file in the agent's source directory."""
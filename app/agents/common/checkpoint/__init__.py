@@ -0,0 +1,138 @@
+"""
+Author: xuyoushun
+Email: xuyoushun@bestpay.com.cn
+Date: 2026/1/20 10:18
+Description:
+
+Checkpointer 子系统：进程内所有智能体共享
+
+- sqlite：同一个数据库文件只维护一个连接池和一个 saver 实例
+- mysql / redis：整个进程共享一个 saver，可以被多个 worker / 主机同时访问
+- 开启压缩时 sqlite 后端在智能体工作目录下训练各自的 zstd 字典；
+  mysql / redis 的数据会被其他主机读取，不使用本地字典
+
+FilePath: __init__.py
+"""
+
+import asyncio
+from pathlib import Path
+
+from app.agents.common.checkpoint.base import BufferedCheckpointSaver
+from app.agents.common.checkpoint.mysql import MySQLSaver
+from app.agents.common.checkpoint.redis import RedisSaver
+from app.agents.common.checkpoint.serde import CompressedSerializer
+from app.agents.common.checkpoint.sqlite import PooledSqliteSaver, SqliteConnectionPool
+from app.core.config import settings
+from app.core.logger import logger_manager
+
+logger = logger_manager.get_logger(__name__)
+
+
+class CheckpointerManager:
+    """管理进程内共享的 checkpointer 实例"""
+
+    def __init__(self):
+        self._savers: dict[str, BufferedCheckpointSaver] = {}
+        self._pools: dict[str, SqliteConnectionPool] = {}
+        self._lock = asyncio.Lock()
+
+    @staticmethod
+    def _build_serde(dict_dir: Path | None = None) -> CompressedSerializer:
+        cfg = settings.checkpoint
+        return CompressedSerializer(
+            compress=cfg.CHECKPOINT_COMPRESSION,
+            level=cfg.CHECKPOINT_COMPRESSION_LEVEL,
+            dict_dir=dict_dir,
+            dict_samples=cfg.CHECKPOINT_ZSTD_DICT_SAMPLES,
+        )
+
+    def _build_saver(self, backend: str, db_path: str) -> BufferedCheckpointSaver:
+        cfg = settings.checkpoint
+        if backend == "mysql":
+            return MySQLSaver(
+                serde=self._build_serde(),
+                delta_snapshot_interval=cfg.CHECKPOINT_DELTA_SNAPSHOT_INTERVAL,
+                flush_interval=cfg.CHECKPOINT_FLUSH_INTERVAL_SECONDS,
+                max_buffered_rows=cfg.CHECKPOINT_FLUSH_MAX_ROWS,
+            )
+        if backend == "redis":
+            return RedisSaver(
+                serde=self._build_serde(),
+                prefix=cfg.CHECKPOINT_REDIS_PREFIX,
+                ttl=cfg.CHECKPOINT_REDIS_TTL or None,
+                delta_snapshot_interval=cfg.CHECKPOINT_DELTA_SNAPSHOT_INTERVAL,
+                flush_interval=cfg.CHECKPOINT_FLUSH_INTERVAL_SECONDS,
+                max_buffered_rows=cfg.CHECKPOINT_FLUSH_MAX_ROWS,
+            )
+
+        Path(db_path).parent.mkdir(parents=True, exist_ok=True)
+        pool = SqliteConnectionPool(db_path, pool_size=cfg.CHECKPOINT_SQLITE_POOL_SIZE)
+        self._pools[db_path] = pool
+        return PooledSqliteSaver(
+            pool,
+            serde=self._build_serde(Path(db_path).parent / "checkpoint_dicts"),
+            delta_snapshot_interval=cfg.CHECKPOINT_DELTA_SNAPSHOT_INTERVAL,
+        )
+
+    async def get_checkpointer(self, db_path: str | Path) -> BufferedCheckpointSaver:
+        """获取（必要时创建）checkpointer；db_path 仅在 sqlite 后端下生效"""
+        backend = settings.checkpoint.CHECKPOINT_BACKEND
+        key = str(Path(db_path).resolve()) if backend == "sqlite" else backend
+        if key in self._savers:
+            return self._savers[key]
+
+        async with self._lock:
+            if key not in self._savers:
+                saver = self._build_saver(backend, key)
+                await saver.setup()
+                self._savers[key] = saver
+                logger.info(f"Checkpointer 已创建: {backend} ({key})")
+        return self._savers[key]
+
+    async def initialize(self) -> None:
+        """启动时创建 mysql / redis 后端的共享 checkpointer，连接失败时直接抛出异常；sqlite 按智能体在首次使用时创建"""
+        backend = settings.checkpoint.CHECKPOINT_BACKEND
+        if backend == "sqlite":
+            return
+        try:
+            await self.get_checkpointer(backend)
+        except Exception as e:
+            logger.error(f"Checkpointer 初始化失败: {backend}, {e}")
+            raise
+
+    async def flush(self, thread_id: str | None = None) -> None:
+        """同步刷新所有 checkpointer 中指定线程的缓冲数据（运行结束时调用）"""
+        for key, saver in list(self._savers.items()):
+            try:
+                await saver.aflush(thread_id)
+            except Exception as e:
+                logger.error(f"刷新 checkpointer {key} 出错: {e}")
+
+    def stats(self) -> dict[str, dict[str, int]]:
+        return {key: pool.stats() for key, pool in self._pools.items()}
+
+    async def close(self) -> None:
+        """刷新缓存的数据并关闭所有连接池"""
+        for key, saver in list(self._savers.items()):
+            try:
+                await saver.aclose()
+            except Exception as e:
+                logger.error(f"关闭 checkpointer {key} 出错: {e}")
+        for pool in self._pools.values():
+            await pool.close()
+        self._savers.clear()
+        self._pools.clear()
+
+
+checkpointer_manager = CheckpointerManager()
+
+__all__ = [
+    "checkpointer_manager",
+    "CheckpointerManager",
+    "BufferedCheckpointSaver",
+    "CompressedSerializer",
+    "MySQLSaver",
+    "RedisSaver",
+    "PooledSqliteSaver",
+    "SqliteConnectionPool",
+]
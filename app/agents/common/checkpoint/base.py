@@ -0,0 +1,536 @@
+"""
+Author: xuyoushun
+Email: xuyoushun@bestpay.com.cn
+Date: 2026/1/21 14:05
+Description:
+
+带写缓冲的 checkpointer 基类
+
+子类只需要实现存储层的批量写入和读取原语，缓冲策略由基类统一处理：
+- write_behind=False：task 的 writes 缓存到下一个 checkpoint，与其在同一批次中提交（每个 super-step 一次提交）
+- write_behind=True：checkpoint 与 writes 都先缓存在内存中，按条数阈值或定时批量刷新，
+  运行结束时由调用方通过 aflush(thread_id) 同步刷新
+
+读取某个线程之前总是先刷新该线程的缓冲，保证读到自己写入的数据。
+
+delta_snapshot_interval > 0 时开启增量编码（见 delta.py），只保存每一步变化的 channel。
+
+aprune 用于定期清理：每个线程只保留最近 N 个 checkpoint 和中断点，删除空闲超时的线程。
+
+FilePath: base
+"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import random
+import time
+import uuid
+from abc import abstractmethod
+from collections.abc import AsyncIterator, Sequence
+from typing import Any, NamedTuple, cast
+
+from langchain_core.runnables import RunnableConfig
+from langgraph.checkpoint.base import (
+    WRITES_IDX_MAP,
+    BaseCheckpointSaver,
+    ChannelVersions,
+    Checkpoint,
+    CheckpointMetadata,
+    CheckpointTuple,
+    get_checkpoint_id,
+    get_checkpoint_metadata,
+)
+from langgraph.checkpoint.serde.base import SerializerProtocol
+
+from app.agents.common.checkpoint.delta import DeltaCodec
+from app.core.logger import logger_manager
+
+logger = logger_manager.get_logger(__name__)
+
+INTERRUPT_CHANNEL = "__interrupt__"
+# UUID v1/v6 时间戳（1582-10-15 起的 100ns 计数）与 Unix 时间戳的差值
+_UUID_EPOCH_OFFSET = 0x01B21DD213814000
+
+
+def checkpoint_timestamp(checkpoint_id: str) -> float | None:
+    """从 checkpoint_id（uuid6）中解析出创建时间，无法解析时返回 None"""
+    try:
+        value = uuid.UUID(checkpoint_id)
+    except (TypeError, ValueError):
+        return None
+    if value.version != 6:
+        return None
+    # 高 64 位依次为 time_high(32) / time_mid(16) / version(4) / time_low(12)
+    high = value.int >> 64
+    ticks = (high >> 16 << 12) | (high & 0xFFF)
+    return (ticks - _UUID_EPOCH_OFFSET) / 1e7
+
+
+class CheckpointRow(NamedTuple):
+    thread_id: str
+    checkpoint_ns: str
+    checkpoint_id: str
+    parent_checkpoint_id: str | None
+    type: str | None
+    checkpoint: bytes | None
+    metadata: bytes | None
+
+
+class WriteRow(NamedTuple):
+    thread_id: str
+    checkpoint_ns: str
+    checkpoint_id: str
+    task_id: str
+    idx: int
+    channel: str
+    type: str | None
+    value: bytes | None
+    replace: bool  # True: 覆盖已有记录（特殊 channel），False: 已存在时忽略
+
+
+class BufferedCheckpointSaver(BaseCheckpointSaver[str]):
+    """带写缓冲的异步 checkpointer 基类（仅实现异步接口）"""
+
+    def __init__(
+        self,
+        *,
+        serde: SerializerProtocol | None = None,
+        write_behind: bool = False,
+        flush_interval: float = 1.0,
+        max_buffered_rows: int = 500,
+        delta_snapshot_interval: int = 0,
+    ):
+        super().__init__(serde=serde)
+        self.delta = DeltaCodec(self.serde, delta_snapshot_interval) if delta_snapshot_interval > 0 else None
+        self.write_behind = write_behind
+        self.flush_interval = flush_interval
+        self.max_buffered_rows = max_buffered_rows
+        self._setup_lock = asyncio.Lock()
+        self._flush_lock = asyncio.Lock()
+        self._is_setup = False
+        # (thread_id, checkpoint_ns) -> {checkpoint_id: CheckpointRow}
+        self._pending_checkpoints: dict[tuple[str, str], dict[str, CheckpointRow]] = {}
+        # (thread_id, checkpoint_ns) -> {(checkpoint_id, task_id, idx): WriteRow}
+        self._pending_writes: dict[tuple[str, str], dict[tuple[str, str, int], WriteRow]] = {}
+        self._buffered_rows = 0
+        self._flush_task: asyncio.Task | None = None
+
+    # -------------------------------
+    # 存储层原语（子类实现）
+    # -------------------------------
+
+    @abstractmethod
+    async def _setup_storage(self) -> None:
+        """创建表 / 索引等存储结构"""
+
+    @abstractmethod
+    async def _write_batch(self, checkpoints: list[CheckpointRow], writes: list[WriteRow]) -> None:
+        """在一个事务（或一个 pipeline）中写入一批 checkpoint 和 writes"""
+
+    @abstractmethod
+    async def _fetch_checkpoints(
+        self,
+        thread_id: str | None,
+        checkpoint_ns: str | None,
+        checkpoint_id: str | None = None,
+        before: str | None = None,
+        limit: int | None = None,
+    ) -> list[CheckpointRow]:
+        """按 checkpoint_id 倒序返回匹配的 checkpoint"""
+
+    @abstractmethod
+    async def _fetch_writes(
+        self, thread_id: str, checkpoint_ns: str, checkpoint_id: str
+    ) -> list[tuple[str, str, str | None, bytes | None]]:
+        """返回 (task_id, channel, type, value)，按 task_id, idx 排序"""
+
+    @abstractmethod
+    async def _delete_thread(self, thread_id: str) -> None:
+        """删除线程的所有 checkpoint 和 writes"""
+
+    @abstractmethod
+    async def _scan_threads(self, after: str | None, limit: int) -> list[str]:
+        """按 thread_id 升序分页返回线程，after 为上一页最后一个 thread_id"""
+
+    @abstractmethod
+    async def _list_checkpoint_keys(self, thread_id: str) -> list[tuple[str, str, str | None, str | None]]:
+        """返回线程下所有 checkpoint 的 (checkpoint_ns, checkpoint_id, parent_checkpoint_id, type)，按 checkpoint_id 倒序"""
+
+    @abstractmethod
+    async def _list_interrupt_keys(self, thread_id: str) -> set[tuple[str, str]]:
+        """返回线程下存在中断（__interrupt__ writes）的 (checkpoint_ns, checkpoint_id)"""
+
+    @abstractmethod
+    async def _delete_checkpoints(self, thread_id: str, checkpoint_ns: str, checkpoint_ids: list[str]) -> None:
+        """删除指定的 checkpoint 及其 writes"""
+
+    async def avacuum(self, max_pages: int | None = None) -> int:
+        """回收存储空间，返回回收的字节数；默认不需要（由存储自行复用空间）"""
+        return 0
+
+    # -------------------------------
+    # 初始化与刷新
+    # -------------------------------
+
+    async def setup(self) -> None:
+        if self._is_setup:
+            return
+        async with self._setup_lock:
+            if not self._is_setup:
+                await self._setup_storage()
+                self._is_setup = True
+
+    def _drain(self, thread_id: str | None = None):
+        keys = {
+            k
+            for k in (*self._pending_checkpoints, *self._pending_writes)
+            if thread_id is None or k[0] == thread_id
+        }
+        checkpoints: dict[tuple[str, str], dict] = {}
+        writes: dict[tuple[str, str], dict] = {}
+        for key in keys:
+            if key in self._pending_checkpoints:
+                checkpoints[key] = self._pending_checkpoints.pop(key)
+            if key in self._pending_writes:
+                writes[key] = self._pending_writes.pop(key)
+        drained = sum(len(v) for v in checkpoints.values()) + sum(len(v) for v in writes.values())
+        self._buffered_rows = max(0, self._buffered_rows - drained)
+        return checkpoints, writes
+
+    def _restore(self, checkpoints: dict, writes: dict) -> None:
+        """写入失败时把数据放回缓冲区，保留更新的数据"""
+        for key, rows in checkpoints.items():
+            bucket = self._pending_checkpoints.setdefault(key, {})
+            for cid, row in rows.items():
+                if cid not in bucket:
+                    bucket[cid] = row
+                    self._buffered_rows += 1
+        for key, rows in writes.items():
+            bucket = self._pending_writes.setdefault(key, {})
+            for wkey, row in rows.items():
+                if wkey not in bucket:
+                    bucket[wkey] = row
+                    self._buffered_rows += 1
+
+    async def aflush(self, thread_id: str | None = None) -> None:
+        """同步刷新缓冲区；thread_id 为空时刷新全部线程"""
+        thread_id = str(thread_id) if thread_id is not None else None
+        async with self._flush_lock:
+            checkpoints, writes = self._drain(thread_id)
+            if not checkpoints and not writes:
+                return
+            await self.setup()
+            try:
+                await self._write_batch(
+                    [row for rows in checkpoints.values() for row in rows.values()],
+                    [row for rows in writes.values() for row in rows.values()],
+                )
+            except BaseException:
+                self._restore(checkpoints, writes)
+                raise
+
+    def _schedule_flush(self) -> None:
+        if self._flush_task is None or self._flush_task.done():
+            self._flush_task = asyncio.create_task(self._flush_loop())
+
+    async def _flush_loop(self) -> None:
+        while self._pending_checkpoints or self._pending_writes:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                await self.aflush()
+            except Exception as e:
+                logger.error(f"{type(self).__name__} 后台刷新 checkpoint 出错: {e}")
+
+    async def aclose(self) -> None:
+        if self._flush_task and not self._flush_task.done():
+            self._flush_task.cancel()
+        await self.aflush()
+
+    # -------------------------------
+    # 写入
+    # -------------------------------
+
+    async def aput(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        await self.setup()
+        thread_id = str(config["configurable"]["thread_id"])
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        parent_checkpoint_id = config["configurable"].get("checkpoint_id")
+        if self.delta is not None:
+            type_, serialized_checkpoint = self.delta.encode(thread_id, checkpoint_ns, parent_checkpoint_id, checkpoint)
+        else:
+            type_, serialized_checkpoint = self.serde.dumps_typed(checkpoint)
+        serialized_metadata = json.dumps(get_checkpoint_metadata(config, metadata), ensure_ascii=False).encode(
+            "utf-8", "ignore"
+        )
+        row = CheckpointRow(
+            thread_id,
+            checkpoint_ns,
+            checkpoint["id"],
+            parent_checkpoint_id,
+            type_,
+            serialized_checkpoint,
+            serialized_metadata,
+        )
+        bucket = self._pending_checkpoints.setdefault((thread_id, checkpoint_ns), {})
+        if row.checkpoint_id not in bucket:
+            self._buffered_rows += 1
+        bucket[row.checkpoint_id] = row
+
+        if not self.write_behind:
+            # 上一个 super-step 缓存的 writes 与新的 checkpoint 一起提交
+            await self.aflush(thread_id)
+        elif self._buffered_rows >= self.max_buffered_rows:
+            await self.aflush()
+        else:
+            self._schedule_flush()
+
+        return {
+            "configurable": {
+                "thread_id": thread_id,
+                "checkpoint_ns": checkpoint_ns,
+                "checkpoint_id": checkpoint["id"],
+            }
+        }
+
+    async def aput_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[tuple[str, Any]],
+        task_id: str,
+        task_path: str = "",
+    ) -> None:
+        thread_id = str(config["configurable"]["thread_id"])
+        checkpoint_ns = str(config["configurable"].get("checkpoint_ns", ""))
+        checkpoint_id = str(config["configurable"]["checkpoint_id"])
+        replace = all(w[0] in WRITES_IDX_MAP for w in writes)
+
+        bucket = self._pending_writes.setdefault((thread_id, checkpoint_ns), {})
+        for idx, (channel, value) in enumerate(writes):
+            write_idx = WRITES_IDX_MAP.get(channel, idx)
+            key = (checkpoint_id, task_id, write_idx)
+            if not replace and key in bucket:
+                continue
+            if key not in bucket:
+                self._buffered_rows += 1
+            bucket[key] = WriteRow(
+                thread_id,
+                checkpoint_ns,
+                checkpoint_id,
+                task_id,
+                write_idx,
+                channel,
+                *self.serde.dumps_typed(value),
+                replace,
+            )
+
+        if self.write_behind:
+            if self._buffered_rows >= self.max_buffered_rows:
+                await self.aflush()
+            else:
+                self._schedule_flush()
+
+    # -------------------------------
+    # 读取
+    # -------------------------------
+
+    async def aget_tuple(self, config: RunnableConfig) -> CheckpointTuple | None:
+        await self.setup()
+        thread_id = str(config["configurable"]["thread_id"])
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        await self.aflush(thread_id)
+
+        rows = await self._fetch_checkpoints(thread_id, checkpoint_ns, get_checkpoint_id(config), limit=1)
+        if not rows:
+            return None
+        return await self._load_tuple(rows[0])
+
+    async def alist(
+        self,
+        config: RunnableConfig | None,
+        *,
+        filter: dict[str, Any] | None = None,
+        before: RunnableConfig | None = None,
+        limit: int | None = None,
+    ) -> AsyncIterator[CheckpointTuple]:
+        await self.setup()
+        thread_id = checkpoint_ns = checkpoint_id = None
+        if config is not None:
+            thread_id = str(config["configurable"]["thread_id"])
+            checkpoint_ns = config["configurable"].get("checkpoint_ns")
+            checkpoint_id = get_checkpoint_id(config)
+        await self.aflush(thread_id)
+
+        # metadata 过滤在 Python 侧完成，此时 limit 需要在过滤后再生效
+        rows = await self._fetch_checkpoints(
+            thread_id,
+            checkpoint_ns,
+            checkpoint_id,
+            before=get_checkpoint_id(before) if before is not None else None,
+            limit=None if filter else limit,
+        )
+        yielded = 0
+        for row in rows:
+            item = await self._load_tuple(row)
+            if filter and not all(item.metadata.get(k) == v for k, v in filter.items()):
+                continue
+            yield item
+            yielded += 1
+            if limit is not None and yielded >= limit:
+                return
+
+    async def _load_row(self, thread_id: str, checkpoint_ns: str, checkpoint_id: str) -> CheckpointRow | None:
+        rows = await self._fetch_checkpoints(thread_id, checkpoint_ns, checkpoint_id, limit=1)
+        return rows[0] if rows else None
+
+    async def _load_checkpoint(self, row: CheckpointRow) -> Checkpoint:
+        if self.delta is not None:
+            return await self.delta.load(row, self._load_row)
+        if DeltaCodec.is_delta(row.type):
+            # 关闭增量编码后仍然可以读取之前写入的增量记录
+            return await DeltaCodec(self.serde).load(row, self._load_row)
+        return self.serde.loads_typed((row.type, row.checkpoint))
+
+    async def _load_tuple(self, row: CheckpointRow) -> CheckpointTuple:
+        writes = await self._fetch_writes(row.thread_id, row.checkpoint_ns, row.checkpoint_id)
+        return CheckpointTuple(
+            {
+                "configurable": {
+                    "thread_id": row.thread_id,
+                    "checkpoint_ns": row.checkpoint_ns,
+                    "checkpoint_id": row.checkpoint_id,
+                }
+            },
+            await self._load_checkpoint(row),
+            cast(CheckpointMetadata, json.loads(row.metadata) if row.metadata is not None else {}),
+            (
+                {
+                    "configurable": {
+                        "thread_id": row.thread_id,
+                        "checkpoint_ns": row.checkpoint_ns,
+                        "checkpoint_id": row.parent_checkpoint_id,
+                    }
+                }
+                if row.parent_checkpoint_id
+                else None
+            ),
+            [(task_id, channel, self.serde.loads_typed((t, v))) for task_id, channel, t, v in writes],
+        )
+
+    async def adelete_thread(self, thread_id: str) -> None:
+        await self.setup()
+        thread_id = str(thread_id)
+        async with self._flush_lock:
+            self._drain(thread_id)
+            if self.delta is not None:
+                self.delta.forget_thread(thread_id)
+            await self._delete_thread(thread_id)
+
+    async def aprune(
+        self,
+        *,
+        keep_last: int = 20,
+        idle_ttl: float | None = None,
+        batch_size: int = 100,
+        pause: float = 0.0,
+    ) -> dict[str, int]:
+        """清理历史 checkpoint
+
+        Args:
+            keep_last: 每个 (thread_id, checkpoint_ns) 保留最近的 checkpoint 数量（中断点始终保留）
+            idle_ttl: 最近一个 checkpoint 早于该秒数的线程整体删除，None 表示不按空闲时间删除
+            batch_size: 每批处理的线程数，以及单次删除的最大 checkpoint 数
+            pause: 每批之间让出的秒数，避免长时间占用存储影响在线请求
+
+        Returns:
+            dict: 扫描的线程数、删除的线程数、删除的 checkpoint 数、重写为完整快照的 checkpoint 数
+        """
+        await self.setup()
+        await self.aflush()
+        keep_last = max(1, keep_last)
+        stats = {"threads_scanned": 0, "threads_deleted": 0, "checkpoints_deleted": 0, "snapshots_rewritten": 0}
+
+        after: str | None = None
+        while thread_ids := await self._scan_threads(after, batch_size):
+            after = thread_ids[-1]
+            for thread_id in thread_ids:
+                stats["threads_scanned"] += 1
+                keys = await self._list_checkpoint_keys(thread_id)
+                if not keys:
+                    continue
+
+                latest = checkpoint_timestamp(max(key[1] for key in keys))
+                if idle_ttl and latest is not None and time.time() - latest > idle_ttl:
+                    await self.adelete_thread(thread_id)
+                    stats["threads_deleted"] += 1
+                    stats["checkpoints_deleted"] += len(keys)
+                    continue
+
+                if len(keys) <= keep_last:
+                    continue
+                deleted, rewritten = await self._prune_thread(thread_id, keys, keep_last, batch_size)
+                stats["checkpoints_deleted"] += deleted
+                stats["snapshots_rewritten"] += rewritten
+            await asyncio.sleep(pause)
+
+        return stats
+
+    async def _prune_thread(
+        self,
+        thread_id: str,
+        keys: list[tuple[str, str, str | None, str | None]],
+        keep_last: int,
+        batch_size: int,
+    ) -> tuple[int, int]:
+        interrupts = await self._list_interrupt_keys(thread_id)
+        by_ns: dict[str, list[tuple[str, str | None, str | None]]] = {}
+        for checkpoint_ns, checkpoint_id, parent_id, type_ in keys:
+            by_ns.setdefault(checkpoint_ns, []).append((checkpoint_id, parent_id, type_))
+
+        deleted = rewritten = 0
+        for checkpoint_ns, items in by_ns.items():
+            kept = {
+                checkpoint_id
+                for i, (checkpoint_id, _, _) in enumerate(items)
+                if i < keep_last or (checkpoint_ns, checkpoint_id) in interrupts
+            }
+            dropped = [checkpoint_id for checkpoint_id, _, _ in items if checkpoint_id not in kept]
+            if not dropped:
+                continue
+
+            # 增量记录的基准被删除前，先把它重写为完整快照，保证增量链完整
+            for checkpoint_id, parent_id, type_ in items:
+                if checkpoint_id in kept and DeltaCodec.is_delta(type_) and parent_id not in kept:
+                    row = await self._load_row(thread_id, checkpoint_ns, checkpoint_id)
+                    if row is None:
+                        continue
+                    new_type, blob = self.serde.dumps_typed(await self._load_checkpoint(row))
+                    await self._write_batch([row._replace(type=new_type, checkpoint=blob)], [])
+                    rewritten += 1
+
+            for i in range(0, len(dropped), batch_size):
+                await self._delete_checkpoints(thread_id, checkpoint_ns, dropped[i : i + batch_size])
+            deleted += len(dropped)
+
+        if self.delta is not None:
+            self.delta.forget_thread(thread_id)
+        return deleted, rewritten
+
+    def get_next_version(self, current: str | None, channel: None) -> str:
+        """与 AsyncSqliteSaver 保持一致的版本号格式，保证读取历史数据时版本可比较"""
+        if current is None:
+            current_v = 0
+        elif isinstance(current, int):
+            current_v = current
+        else:
+            current_v = int(current.split(".")[0])
+        next_v = current_v + 1
+        next_h = random.random()
+        return f"{next_v:032}.{next_h:016}"
@@ -0,0 +1,152 @@
+"""
+Author: xuyoushun
+Email: xuyoushun@bestpay.com.cn
+Date: 2026/1/22 11:30
+Description:
+
+Checkpoint 增量编码
+
+每个 checkpoint 只保存相对父 checkpoint 发生变化的 channel：
+- 列表类型（如 messages）只保存保留的前缀长度和新增的尾部
+- 其他类型直接保存新值，被删除的 channel 记录在 drop 中
+每隔 snapshot_interval 个 checkpoint 保存一次完整快照，读取时最多回溯 snapshot_interval 步。
+
+增量记录的 type 以 "delta+" 开头，未编码的历史数据按原方式读取。
+
+FilePath: delta
+"""
+
+from __future__ import annotations
+
+from collections import OrderedDict
+from collections.abc import Awaitable, Callable
+from typing import TYPE_CHECKING, Any, NamedTuple
+
+from langgraph.checkpoint.base import Checkpoint
+from langgraph.checkpoint.serde.base import SerializerProtocol
+
+if TYPE_CHECKING:
+    from app.agents.common.checkpoint.base import CheckpointRow
+
+DELTA_KEY = "__delta__"
+DELTA_PREFIX = "delta+"
+
+RowLoader = Callable[[str, str, str], Awaitable["CheckpointRow | None"]]
+
+
+class _State(NamedTuple):
+    values: dict[str, Any]
+    versions: dict[str, Any]
+    depth: int  # 距离最近一个完整快照的步数，完整快照为 0
+
+
+def _common_prefix(old: list, new: list) -> int:
+    """两个列表相同前缀的长度（优先按对象身份比较，避免逐个比较消息内容）"""
+    size = min(len(old), len(new))
+    i = 0
+    while i < size and (old[i] is new[i] or old[i] == new[i]):
+        i += 1
+    return i
+
+
+class DeltaCodec:
+    """Checkpoint 增量编解码器，内部维护最近解码 / 编码过的 channel_values 的 LRU 缓存"""
+
+    def __init__(self, serde: SerializerProtocol, snapshot_interval: int = 20, cache_size: int = 512):
+        self.serde = serde
+        self.snapshot_interval = max(1, snapshot_interval)
+        self.cache_size = cache_size
+        self._states: OrderedDict[tuple[str, str, str], _State] = OrderedDict()
+
+    @staticmethod
+    def is_delta(type_: str | None) -> bool:
+        return bool(type_) and type_.startswith(DELTA_PREFIX)
+
+    def _remember(self, key: tuple[str, str, str], values: dict, versions: dict, depth: int) -> None:
+        # 列表做浅拷贝，避免缓存被后续的原地修改污染
+        values = {ch: list(v) if isinstance(v, list) else v for ch, v in values.items()}
+        self._states[key] = _State(values, dict(versions), depth)
+        self._states.move_to_end(key)
+        while len(self._states) > self.cache_size:
+            self._states.popitem(last=False)
+
+    def _lookup(self, key: tuple[str, str, str]) -> _State | None:
+        state = self._states.get(key)
+        if state is not None:
+            self._states.move_to_end(key)
+        return state
+
+    def forget_thread(self, thread_id: str) -> None:
+        for key in [k for k in self._states if k[0] == thread_id]:
+            self._states.pop(key, None)
+
+    # -------------------------------
+    # 编码
+    # -------------------------------
+
+    def encode(
+        self, thread_id: str, checkpoint_ns: str, parent_id: str | None, checkpoint: Checkpoint
+    ) -> tuple[str, bytes]:
+        values = checkpoint["channel_values"]
+        versions = checkpoint["channel_versions"]
+        key = (thread_id, checkpoint_ns, checkpoint["id"])
+        parent = self._lookup((thread_id, checkpoint_ns, parent_id)) if parent_id else None
+
+        # 父状态不在缓存中或增量链过长时写完整快照
+        if parent is None or parent.depth + 1 >= self.snapshot_interval:
+            self._remember(key, values, versions, 0)
+            return self.serde.dumps_typed(checkpoint)
+
+        delta: dict[str, Any] = {"base": parent_id, "set": {}, "extend": {}, "drop": []}
+        for channel, value in values.items():
+            if channel in parent.values and versions.get(channel) == parent.versions.get(channel):
+                continue
+            old = parent.values.get(channel)
+            if isinstance(value, list) and isinstance(old, list):
+                keep = _common_prefix(old, value)
+                if keep > 0:
+                    delta["extend"][channel] = {"keep": keep, "tail": value[keep:]}
+                    continue
+            delta["set"][channel] = value
+        delta["drop"] = [channel for channel in parent.values if channel not in values]
+
+        self._remember(key, values, versions, parent.depth + 1)
+        type_, blob = self.serde.dumps_typed({**checkpoint, "channel_values": {DELTA_KEY: delta}})
+        return DELTA_PREFIX + type_, blob
+
+    # -------------------------------
+    # 解码
+    # -------------------------------
+
+    async def load(self, row: CheckpointRow, load_row: RowLoader) -> Checkpoint:
+        """解码一条 checkpoint 记录，必要时通过 load_row 回溯加载增量链上的父记录"""
+        key = (row.thread_id, row.checkpoint_ns, row.checkpoint_id)
+        if not self.is_delta(row.type):
+            checkpoint = self.serde.loads_typed((row.type, row.checkpoint))
+            self._remember(key, checkpoint["channel_values"], checkpoint["channel_versions"], 0)
+            return checkpoint
+
+        checkpoint = self.serde.loads_typed((row.type[len(DELTA_PREFIX) :], row.checkpoint))
+        delta = checkpoint["channel_values"][DELTA_KEY]
+        base = await self._resolve(row.thread_id, row.checkpoint_ns, delta["base"], load_row)
+
+        values = dict(base.values)
+        for channel in delta["drop"]:
+            values.pop(channel, None)
+        values.update(delta["set"])
+        for channel, ext in delta["extend"].items():
+            values[channel] = list(base.values.get(channel, []))[: ext["keep"]] + list(ext["tail"])
+
+        checkpoint["channel_values"] = values
+        self._remember(key, values, checkpoint["channel_versions"], base.depth + 1)
+        return checkpoint
+
+    async def _resolve(self, thread_id: str, checkpoint_ns: str, checkpoint_id: str, load_row: RowLoader) -> _State:
+        key = (thread_id, checkpoint_ns, checkpoint_id)
+        if (state := self._lookup(key)) is not None:
+            return state
+        row = await load_row(thread_id, checkpoint_ns, checkpoint_id)
+        if row is None:
+            raise ValueError(f"Delta base checkpoint {checkpoint_id} of thread {thread_id} is missing")
+        await self.load(row, load_row)
+        return self._states[key]
@@ -0,0 +1,190 @@
+"""
+Author: xuyoushun
+Email: xuyoushun@bestpay.com.cn
+Date: 2026/1/21 15:10
+Description:
+
+基于 MySQL 的 checkpointer，复用 MySQLManager 的异步连接池
+
+默认开启 write-behind：运行过程中的中间 checkpoint 批量写入，运行结束时同步刷新，
+这样任意 API worker 都可以恢复任意 thread_id 的会话。
+
+表结构见 app.models.checkpoint，由 alembic 迁移创建。
+
+FilePath: mysql
+"""
+
+from __future__ import annotations
+
+from sqlalchemy import and_, delete, select
+from sqlalchemy.dialects.mysql import insert as mysql_insert
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.ext.asyncio import AsyncEngine
+from langgraph.checkpoint.serde.base import SerializerProtocol
+
+from app.agents.common.checkpoint.base import INTERRUPT_CHANNEL, BufferedCheckpointSaver, CheckpointRow, WriteRow
+from app.core.database.mysql import mysql_manager
+from app.models.checkpoint import checkpoints_table, writes_table
+
+
+class MySQLSaver(BufferedCheckpointSaver):
+    """基于 MySQL 的异步 checkpointer"""
+
+    def __init__(
+        self,
+        engine: AsyncEngine | None = None,
+        *,
+        serde: SerializerProtocol | None = None,
+        write_behind: bool = True,
+        flush_interval: float = 1.0,
+        max_buffered_rows: int = 500,
+        delta_snapshot_interval: int = 0,
+    ):
+        super().__init__(
+            serde=serde,
+            write_behind=write_behind,
+            flush_interval=flush_interval,
+            max_buffered_rows=max_buffered_rows,
+            delta_snapshot_interval=delta_snapshot_interval,
+        )
+        self._engine = engine
+
+    @property
+    def engine(self) -> AsyncEngine:
+        engine = self._engine or mysql_manager.async_engine
+        if engine is None:
+            raise RuntimeError("Database not initialized. Call initialize() first.")
+        return engine
+
+    async def _setup_storage(self) -> None:
+        # 表由 alembic 迁移创建，这里只检查表是否存在
+        try:
+            async with self.engine.connect() as conn:
+                await conn.execute(select(checkpoints_table.c.thread_id).limit(1))
+                await conn.execute(select(writes_table.c.thread_id).limit(1))
+        except SQLAlchemyError as e:
+            raise RuntimeError(f"checkpoint 表不可用，请先执行 alembic upgrade head: {e}") from e
+
+    async def _write_batch(self, checkpoints: list[CheckpointRow], writes: list[WriteRow]) -> None:
+        upserts = [row._asdict() for row in writes if row.replace]
+        inserts = [row._asdict() for row in writes if not row.replace]
+        for row in (*upserts, *inserts):
+            row.pop("replace")
+
+        async with self.engine.begin() as conn:
+            if upserts:
+                stmt = mysql_insert(writes_table)
+                await conn.execute(
+                    stmt.on_duplicate_key_update(channel=stmt.inserted.channel, type=stmt.inserted.type, value=stmt.inserted.value),
+                    upserts,
+                )
+            if inserts:
+                await conn.execute(mysql_insert(writes_table).prefix_with("IGNORE"), inserts)
+            if checkpoints:
+                stmt = mysql_insert(checkpoints_table)
+                await conn.execute(
+                    stmt.on_duplicate_key_update(
+                        parent_checkpoint_id=stmt.inserted.parent_checkpoint_id,
+                        type=stmt.inserted.type,
+                        checkpoint=stmt.inserted.checkpoint,
+                        metadata=stmt.inserted.metadata,
+                    ),
+                    [row._asdict() for row in checkpoints],
+                )
+
+    async def _fetch_checkpoints(
+        self,
+        thread_id: str | None,
+        checkpoint_ns: str | None,
+        checkpoint_id: str | None = None,
+        before: str | None = None,
+        limit: int | None = None,
+    ) -> list[CheckpointRow]:
+        t = checkpoints_table
+        conditions = []
+        if thread_id is not None:
+            conditions.append(t.c.thread_id == thread_id)
+        if checkpoint_ns is not None:
+            conditions.append(t.c.checkpoint_ns == checkpoint_ns)
+        if checkpoint_id:
+            conditions.append(t.c.checkpoint_id == checkpoint_id)
+        if before:
+            conditions.append(t.c.checkpoint_id < before)
+
+        stmt = select(
+            t.c.thread_id,
+            t.c.checkpoint_ns,
+            t.c.checkpoint_id,
+            t.c.parent_checkpoint_id,
+            t.c.type,
+            t.c.checkpoint,
+            t.c.metadata,
+        ).order_by(t.c.checkpoint_id.desc())
+        if conditions:
+            stmt = stmt.where(and_(*conditions))
+        if limit is not None:
+            stmt = stmt.limit(limit)
+
+        async with self.engine.connect() as conn:
+            result = await conn.execute(stmt)
+            return [CheckpointRow(*row) for row in result.all()]
+
+    async def _fetch_writes(
+        self, thread_id: str, checkpoint_ns: str, checkpoint_id: str
+    ) -> list[tuple[str, str, str | None, bytes | None]]:
+        w = writes_table
+        stmt = (
+            select(w.c.task_id, w.c.channel, w.c.type, w.c.value)
+            .where(w.c.thread_id == thread_id, w.c.checkpoint_ns == checkpoint_ns, w.c.checkpoint_id == checkpoint_id)
+            .order_by(w.c.task_id, w.c.idx)
+        )
+        async with self.engine.connect() as conn:
+            result = await conn.execute(stmt)
+            return [tuple(row) for row in result.all()]
+
+    async def _delete_thread(self, thread_id: str) -> None:
+        async with self.engine.begin() as conn:
+            await conn.execute(delete(checkpoints_table).where(checkpoints_table.c.thread_id == thread_id))
+            await conn.execute(delete(writes_table).where(writes_table.c.thread_id == thread_id))
+
+    async def _scan_threads(self, after: str | None, limit: int) -> list[str]:
+        t = checkpoints_table
+        stmt = select(t.c.thread_id).distinct().order_by(t.c.thread_id).limit(limit)
+        if after is not None:
+            stmt = stmt.where(t.c.thread_id > after)
+        async with self.engine.connect() as conn:
+            result = await conn.execute(stmt)
+            return [row[0] for row in result.all()]
+
+    async def _list_checkpoint_keys(self, thread_id: str) -> list[tuple[str, str, str | None, str | None]]:
+        t = checkpoints_table
+        stmt = (
+            select(t.c.checkpoint_ns, t.c.checkpoint_id, t.c.parent_checkpoint_id, t.c.type)
+            .where(t.c.thread_id == thread_id)
+            .order_by(t.c.checkpoint_id.desc())
+        )
+        async with self.engine.connect() as conn:
+            result = await conn.execute(stmt)
+            return [tuple(row) for row in result.all()]
+
+    async def _list_interrupt_keys(self, thread_id: str) -> set[tuple[str, str]]:
+        w = writes_table
+        stmt = (
+            select(w.c.checkpoint_ns, w.c.checkpoint_id)
+            .distinct()
+            .where(w.c.thread_id == thread_id, w.c.channel == INTERRUPT_CHANNEL)
+        )
+        async with self.engine.connect() as conn:
+            result = await conn.execute(stmt)
+            return {tuple(row) for row in result.all()}
+
+    async def _delete_checkpoints(self, thread_id: str, checkpoint_ns: str, checkpoint_ids: list[str]) -> None:
+        async with self.engine.begin() as conn:
+            for table in (checkpoints_table, writes_table):
+                await conn.execute(
+                    delete(table).where(
+                        table.c.thread_id == thread_id,
+                        table.c.checkpoint_ns == checkpoint_ns,
+                        table.c.checkpoint_id.in_(checkpoint_ids),
+                    )
+                )
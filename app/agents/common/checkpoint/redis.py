@@ -0,0 +1,285 @@
+"""
+Author: xuyoushun
+Email: xuyoushun@bestpay.com.cn
+Date: 2026/1/21 16:02
+Description:
+
+基于 Redis 的 checkpointer，适合热点会话：所有 key 带 TTL，空闲超时后自动过期
+
+Key 布局（thread_id / checkpoint_ns 原样拼接）：
+- {prefix}:threads                                  zset（score 全为 0，按 thread_id 字典序排列），不过期，清理时分页扫描
+- {prefix}:{thread_id}:ns                           set，线程下出现过的 checkpoint_ns
+- {prefix}:{thread_id}:{ns}:index                   zset（score 全为 0，按 checkpoint_id 字典序排列）
+- {prefix}:{thread_id}:{ns}:interrupts              set，有中断（__interrupt__ writes）的 checkpoint_id
+- {prefix}:{thread_id}:{ns}:cp:{checkpoint_id}      hash: parent / type / checkpoint / metadata
+- {prefix}:{thread_id}:{ns}:w:{checkpoint_id}       hash: "{task_id}|{idx}" -> channel \\0 type \\0 value
+
+线程索引中的线程 key 过期后，由 _scan_threads 在扫描时移除。
+
+FilePath: redis
+"""
+
+from __future__ import annotations
+
+from langgraph.checkpoint.serde.base import SerializerProtocol
+from redis.asyncio import Redis as AsyncRedis
+
+from app.agents.common.checkpoint.base import INTERRUPT_CHANNEL, BufferedCheckpointSaver, CheckpointRow, WriteRow
+from app.core.redis import redis_manager
+
+
+def _str(value: bytes | str | None) -> str | None:
+    if value is None:
+        return None
+    return value.decode("utf-8") if isinstance(value, bytes) else value
+
+
+class RedisSaver(BufferedCheckpointSaver):
+    """基于 Redis 的异步 checkpointer"""
+
+    def __init__(
+        self,
+        client: AsyncRedis | None = None,
+        *,
+        prefix: str = "checkpoint",
+        ttl: int | None = 7 * 24 * 3600,
+        serde: SerializerProtocol | None = None,
+        write_behind: bool = True,
+        flush_interval: float = 1.0,
+        max_buffered_rows: int = 500,
+        delta_snapshot_interval: int = 0,
+    ):
+        super().__init__(
+            serde=serde,
+            write_behind=write_behind,
+            flush_interval=flush_interval,
+            max_buffered_rows=max_buffered_rows,
+            delta_snapshot_interval=delta_snapshot_interval,
+        )
+        self._client = client
+        self.prefix = prefix
+        self.ttl = ttl
+
+    async def _get_client(self) -> AsyncRedis:
+        if self._client is None:
+            self._client = await redis_manager.get_async_binary_client()
+        return self._client
+
+    def _threads_key(self) -> str:
+        return f"{self.prefix}:threads"
+
+    def _ns_key(self, thread_id: str) -> str:
+        return f"{self.prefix}:{thread_id}:ns"
+
+    def _index_key(self, thread_id: str, checkpoint_ns: str) -> str:
+        return f"{self.prefix}:{thread_id}:{checkpoint_ns}:index"
+
+    def _interrupts_key(self, thread_id: str, checkpoint_ns: str) -> str:
+        return f"{self.prefix}:{thread_id}:{checkpoint_ns}:interrupts"
+
+    def _checkpoint_key(self, thread_id: str, checkpoint_ns: str, checkpoint_id: str) -> str:
+        return f"{self.prefix}:{thread_id}:{checkpoint_ns}:cp:{checkpoint_id}"
+
+    def _writes_key(self, thread_id: str, checkpoint_ns: str, checkpoint_id: str) -> str:
+        return f"{self.prefix}:{thread_id}:{checkpoint_ns}:w:{checkpoint_id}"
+
+    async def _setup_storage(self) -> None:
+        client = await self._get_client()
+        await client.ping()
+        if not await client.exists(self._threads_key()):
+            await self._backfill_indexes(client)
+
+    async def _backfill_indexes(self, client: AsyncRedis) -> None:
+        """为没有线程索引和中断索引的历史数据补建索引（只在线程索引不存在时执行一次）"""
+        suffix = ":ns"
+        marker = INTERRUPT_CHANNEL.encode("utf-8") + b"\0"
+        async for key in client.scan_iter(match=f"{self.prefix}:*{suffix}"):
+            thread_id = _str(key)[len(self.prefix) + 1 : -len(suffix)]
+            await client.zadd(self._threads_key(), {thread_id: 0})
+            for ns, cid in await self._list_checkpoint_ids(client, thread_id):
+                writes = await client.hvals(self._writes_key(thread_id, ns, cid))
+                if any(value.startswith(marker) for value in writes):
+                    await client.sadd(self._interrupts_key(thread_id, ns), cid)
+
+    async def _write_batch(self, checkpoints: list[CheckpointRow], writes: list[WriteRow]) -> None:
+        client = await self._get_client()
+        touched: set[str] = set()
+        async with client.pipeline(transaction=True) as pipe:
+            for row in writes:
+                key = self._writes_key(row.thread_id, row.checkpoint_ns, row.checkpoint_id)
+                field = f"{row.task_id}|{row.idx}"
+                value = b"\0".join(
+                    [row.channel.encode("utf-8"), (row.type or "").encode("utf-8"), row.value or b""]
+                )
+                if row.replace:
+                    pipe.hset(key, field, value)
+                else:
+                    pipe.hsetnx(key, field, value)
+                touched.add(key)
+                if row.channel == INTERRUPT_CHANNEL:
+                    interrupts_key = self._interrupts_key(row.thread_id, row.checkpoint_ns)
+                    pipe.sadd(interrupts_key, row.checkpoint_id)
+                    touched.add(interrupts_key)
+            for row in checkpoints:
+                key = self._checkpoint_key(row.thread_id, row.checkpoint_ns, row.checkpoint_id)
+                mapping = {
+                    "parent": row.parent_checkpoint_id or "",
+                    "type": row.type or "",
+                    "checkpoint": row.checkpoint or b"",
+                    "metadata": row.metadata or b"",
+                }
+                pipe.hset(key, mapping=mapping)
+                pipe.zadd(self._index_key(row.thread_id, row.checkpoint_ns), {row.checkpoint_id: 0})
+                pipe.sadd(self._ns_key(row.thread_id), row.checkpoint_ns)
+                pipe.zadd(self._threads_key(), {row.thread_id: 0})
+                touched.update(
+                    [key, self._index_key(row.thread_id, row.checkpoint_ns), self._ns_key(row.thread_id)]
+                )
+            if self.ttl:
+                for key in touched:
+                    pipe.expire(key, self.ttl)
+            await pipe.execute()
+
+    async def _list_threads(self, client: AsyncRedis) -> list[str]:
+        return [_str(thread_id) for thread_id in await client.zrange(self._threads_key(), 0, -1)]
+
+    async def _fetch_checkpoints(
+        self,
+        thread_id: str | None,
+        checkpoint_ns: str | None,
+        checkpoint_id: str | None = None,
+        before: str | None = None,
+        limit: int | None = None,
+    ) -> list[CheckpointRow]:
+        client = await self._get_client()
+        thread_ids = [thread_id] if thread_id is not None else await self._list_threads(client)
+
+        candidates: list[tuple[str, str, str]] = []
+        for tid in thread_ids:
+            if checkpoint_ns is not None:
+                namespaces = [checkpoint_ns]
+            else:
+                namespaces = [_str(ns) for ns in await client.smembers(self._ns_key(tid))]
+            for ns in namespaces:
+                if checkpoint_id:
+                    candidates.append((tid, ns, checkpoint_id))
+                    continue
+                ids = await client.zrevrangebylex(
+                    self._index_key(tid, ns),
+                    f"({before}" if before else "+",
+                    "-",
+                    start=0 if limit is not None else None,
+                    num=limit,
+                )
+                candidates.extend((tid, ns, _str(cid)) for cid in ids)
+
+        candidates.sort(key=lambda item: item[2], reverse=True)
+        if limit is not None:
+            candidates = candidates[:limit]
+
+        rows: list[CheckpointRow] = []
+        for tid, ns, cid in candidates:
+            data = await client.hgetall(self._checkpoint_key(tid, ns, cid))
+            if not data:
+                continue
+            data = {_str(k): v for k, v in data.items()}
+            rows.append(
+                CheckpointRow(
+                    tid,
+                    ns,
+                    cid,
+                    _str(data.get("parent")) or None,
+                    _str(data.get("type")) or None,
+                    data.get("checkpoint") or None,
+                    data.get("metadata") or None,
+                )
+            )
+        return rows
+
+    async def _fetch_writes(
+        self, thread_id: str, checkpoint_ns: str, checkpoint_id: str
+    ) -> list[tuple[str, str, str | None, bytes | None]]:
+        client = await self._get_client()
+        data = await client.hgetall(self._writes_key(thread_id, checkpoint_ns, checkpoint_id))
+        writes = []
+        for field, value in data.items():
+            task_id, idx = _str(field).rsplit("|", 1)
+            channel, type_, blob = value.split(b"\0", 2)
+            writes.append((task_id, int(idx), channel.decode("utf-8"), type_.decode("utf-8") or None, blob))
+        writes.sort(key=lambda item: (item[0], item[1]))
+        return [(task_id, channel, type_, blob) for task_id, _, channel, type_, blob in writes]
+
+    async def _delete_thread(self, thread_id: str) -> None:
+        # 通过 ns / index 集合定位 key，不用 SCAN 前缀匹配（会匹配到 id 以 "{thread_id}:" 开头的其他线程）
+        client = await self._get_client()
+        keys = [self._ns_key(thread_id)]
+        for ns, cid in await self._list_checkpoint_ids(client, thread_id):
+            keys.extend([self._checkpoint_key(thread_id, ns, cid), self._writes_key(thread_id, ns, cid)])
+        for ns in await client.smembers(self._ns_key(thread_id)):
+            keys.extend([self._index_key(thread_id, _str(ns)), self._interrupts_key(thread_id, _str(ns))])
+        async with client.pipeline(transaction=True) as pipe:
+            pipe.delete(*keys)
+            pipe.zrem(self._threads_key(), thread_id)
+            await pipe.execute()
+
+    async def _scan_threads(self, after: str | None, limit: int) -> list[str]:
+        client = await self._get_client()
+        while True:
+            thread_ids = [
+                _str(thread_id)
+                for thread_id in await client.zrangebylex(
+                    self._threads_key(), f"({after}" if after is not None else "-", "+", start=0, num=limit
+                )
+            ]
+            if not thread_ids:
+                return []
+            # 移除 key 已经过期的线程
+            async with client.pipeline(transaction=False) as pipe:
+                for thread_id in thread_ids:
+                    pipe.exists(self._ns_key(thread_id))
+                exists = await pipe.execute()
+            expired = [thread_id for thread_id, found in zip(thread_ids, exists) if not found]
+            if expired:
+                await client.zrem(self._threads_key(), *expired)
+            alive = [thread_id for thread_id, found in zip(thread_ids, exists) if found]
+            if alive:
+                return alive
+            after = thread_ids[-1]
+
+    async def _list_checkpoint_ids(self, client: AsyncRedis, thread_id: str) -> list[tuple[str, str]]:
+        keys = []
+        for ns in await client.smembers(self._ns_key(thread_id)):
+            ns = _str(ns)
+            keys.extend((ns, _str(cid)) for cid in await client.zrange(self._index_key(thread_id, ns), 0, -1))
+        return keys
+
+    async def _list_checkpoint_keys(self, thread_id: str) -> list[tuple[str, str, str | None, str | None]]:
+        client = await self._get_client()
+        ids = await self._list_checkpoint_ids(client, thread_id)
+        async with client.pipeline(transaction=False) as pipe:
+            for ns, cid in ids:
+                pipe.hmget(self._checkpoint_key(thread_id, ns, cid), "parent", "type")
+            values = await pipe.execute()
+        keys = [(ns, cid, _str(parent) or None, _str(type_) or None) for (ns, cid), (parent, type_) in zip(ids, values)]
+        keys.sort(key=lambda item: item[1], reverse=True)
+        return keys
+
+    async def _list_interrupt_keys(self, thread_id: str) -> set[tuple[str, str]]:
+        client = await self._get_client()
+        keys = set()
+        for ns in await client.smembers(self._ns_key(thread_id)):
+            ns = _str(ns)
+            keys.update((ns, _str(cid)) for cid in await client.smembers(self._interrupts_key(thread_id, ns)))
+        return keys
+
+    async def _delete_checkpoints(self, thread_id: str, checkpoint_ns: str, checkpoint_ids: list[str]) -> None:
+        client = await self._get_client()
+        async with client.pipeline(transaction=True) as pipe:
+            for cid in checkpoint_ids:
+                pipe.delete(
+                    self._checkpoint_key(thread_id, checkpoint_ns, cid),
+                    self._writes_key(thread_id, checkpoint_ns, cid),
+                )
+            pipe.zrem(self._index_key(thread_id, checkpoint_ns), *checkpoint_ids)
+            pipe.srem(self._interrupts_key(thread_id, checkpoint_ns), *checkpoint_ids)
+            await pipe.execute()
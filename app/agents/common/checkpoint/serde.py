@@ -0,0 +1,186 @@
+"""
+Author: xuyoushun
+Email: xuyoushun@bestpay.com.cn
+Date: 2026/1/23 10:40
+Description:
+
+压缩的 checkpoint 序列化器
+
+在 JsonPlusSerializer（msgpack 二进制编码）的基础上做 zstd 压缩：
+- 压缩后的 type 为 "zstd+{原 type}"，未安装 zstandard 时退化为 "zlib+{原 type}"
+- 体积小于 min_size 的数据不压缩，直接保存原始编码
+- 读取时按 type 前缀识别，历史上未压缩的数据原样交给内部序列化器
+- compress=False 时只写入未压缩的数据，但仍可读取之前压缩过的数据
+
+指定 dict_dir 时会在积累足够样本后在后台线程训练一个 zstd 字典并保存到该目录（每个智能体的工作目录各自一份），
+之后的数据使用字典压缩。字典 ID 记录在 zstd 帧头中，解压时按 ID 加载对应字典，
+因此重新训练字典不影响已有数据的读取。
+
+FilePath: serde
+"""
+
+from __future__ import annotations
+
+import os
+import threading
+import zlib
+from pathlib import Path
+from typing import Any
+
+from langgraph.checkpoint.serde.base import SerializerProtocol
+from langgraph.checkpoint.serde.jsonplus import JsonPlusSerializer
+
+from app.core.logger import logger_manager
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover - zstandard 为可选依赖
+    zstandard = None
+
+logger = logger_manager.get_logger(__name__)
+
+ZSTD_PREFIX = "zstd+"
+ZLIB_PREFIX = "zlib+"
+DICT_SUFFIX = ".zdict"
+
+
+class CompressedSerializer(SerializerProtocol):
+    """对内部序列化器的输出做 zstd / zlib 压缩"""
+
+    def __init__(
+        self,
+        inner: SerializerProtocol | None = None,
+        *,
+        compress: bool = True,
+        level: int = 3,
+        min_size: int = 256,
+        dict_dir: str | Path | None = None,
+        dict_size: int = 112640,
+        dict_samples: int = 256,
+    ):
+        self.inner = inner or JsonPlusSerializer()
+        self.compress = compress
+        self.level = level
+        self.min_size = min_size
+        self.dict_dir = Path(dict_dir) if dict_dir and zstandard is not None else None
+        self.dict_size = dict_size
+        self.dict_samples = dict_samples
+
+        self._lock = threading.Lock()
+        self._samples: list[bytes] = []
+        self._trainer: threading.Thread | None = None
+        self._dicts: dict[int, Any] = {}
+        self._compressor = None
+        self._decompressors: dict[int, Any] = {}
+        if zstandard is not None:
+            self._load_dicts()
+            self._compressor = self._make_compressor()
+
+    @property
+    def algorithm(self) -> str:
+        return "zstd" if zstandard is not None else "zlib"
+
+    @property
+    def dict_id(self) -> int:
+        """当前用于压缩的字典 ID，0 表示未使用字典"""
+        return max(self._dicts) if self._dicts else 0
+
+    # -------------------------------
+    # 字典管理
+    # -------------------------------
+
+    def _load_dicts(self) -> None:
+        if self.dict_dir is None or not self.dict_dir.exists():
+            return
+        for path in sorted(self.dict_dir.glob(f"*{DICT_SUFFIX}")):
+            try:
+                data = zstandard.ZstdCompressionDict(path.read_bytes())
+                self._dicts[data.dict_id()] = data
+            except Exception as e:
+                logger.warning(f"加载 zstd 字典 {path} 失败: {e}")
+
+    def _make_compressor(self):
+        if self._dicts:
+            return zstandard.ZstdCompressor(level=self.level, dict_data=self._dicts[self.dict_id])
+        return zstandard.ZstdCompressor(level=self.level)
+
+    def _collect_sample(self, data: bytes) -> None:
+        """积累样本，达到数量后在后台线程训练字典（只训练一次）"""
+        if self.dict_dir is None or self._dicts or self.dict_samples <= 0:
+            return
+        with self._lock:
+            if self._dicts or self._trainer is not None:
+                return
+            self._samples.append(data[:65536])
+            if len(self._samples) < self.dict_samples:
+                return
+            samples, self._samples = self._samples, []
+            # dumps_typed 在事件循环上执行，训练耗时较长，放到后台线程；训练完成前继续不带字典压缩
+            self._trainer = threading.Thread(
+                target=self._train_dictionary, args=(samples,), name="zstd-dict-trainer", daemon=True
+            )
+            self._trainer.start()
+
+    def _train_dictionary(self, samples: list[bytes]) -> None:
+        try:
+            trained = zstandard.train_dictionary(self.dict_size, samples)
+        except Exception as e:
+            # 样本过少或过于单一时训练会失败，放弃字典继续普通压缩
+            logger.warning(f"训练 zstd 字典失败: {e}")
+            self.dict_samples = 0
+            return
+
+        # 先写临时文件再原子替换，其他进程加载字典时不会读到写了一半的文件
+        path = self.dict_dir / f"{trained.dict_id()}{DICT_SUFFIX}"
+        tmp_path = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+        try:
+            self.dict_dir.mkdir(parents=True, exist_ok=True)
+            tmp_path.write_bytes(trained.as_bytes())
+            os.replace(tmp_path, path)
+        except OSError as e:
+            # 字典没有保存时不能使用，否则重启后无法解压
+            logger.warning(f"保存 zstd 字典 {path} 失败: {e}")
+            tmp_path.unlink(missing_ok=True)
+            self.dict_samples = 0
+            return
+
+        with self._lock:
+            self._dicts[trained.dict_id()] = trained
+            self._compressor = self._make_compressor()
+        logger.info(f"zstd 字典训练完成: {self.dict_dir} (id={trained.dict_id()})")
+
+    def _decompressor(self, data: bytes):
+        dict_id = zstandard.get_frame_parameters(data).dict_id
+        if dict_id not in self._decompressors:
+            if dict_id and dict_id not in self._dicts:
+                self._load_dicts()
+            if dict_id and dict_id not in self._dicts:
+                raise ValueError(f"zstd dictionary {dict_id} not found in {self.dict_dir}")
+            if dict_id:
+                self._decompressors[dict_id] = zstandard.ZstdDecompressor(dict_data=self._dicts[dict_id])
+            else:
+                self._decompressors[dict_id] = zstandard.ZstdDecompressor()
+        return self._decompressors[dict_id]
+
+    # -------------------------------
+    # SerializerProtocol
+    # -------------------------------
+
+    def dumps_typed(self, obj: Any) -> tuple[str, bytes]:
+        type_, data = self.inner.dumps_typed(obj)
+        if not self.compress or len(data) < self.min_size:
+            return type_, data
+        if zstandard is None:
+            return ZLIB_PREFIX + type_, zlib.compress(data, min(self.level, 9))
+        self._collect_sample(data)
+        return ZSTD_PREFIX + type_, self._compressor.compress(data)
+
+    def loads_typed(self, data: tuple[str, bytes]) -> Any:
+        type_, blob = data
+        if type_.startswith(ZSTD_PREFIX):
+            if zstandard is None:
+                raise RuntimeError("zstandard is required to read zstd compressed checkpoints")
+            return self.inner.loads_typed((type_[len(ZSTD_PREFIX) :], self._decompressor(blob).decompress(blob)))
+        if type_.startswith(ZLIB_PREFIX):
+            return self.inner.loads_typed((type_[len(ZLIB_PREFIX) :], zlib.decompress(blob)))
+        return self.inner.loads_typed(data)
@@ -0,0 +1,339 @@
+"""
+Author: xuyoushun
+Email: xuyoushun@bestpay.com.cn
+Date: 2026/1/20 10:20
+Description:
+
+基于 aiosqlite 连接池的 checkpointer 实现
+
+- 每个数据库文件维护一个有上限的连接池，读请求在 WAL 模式下可以并发执行
+- 写事务在进程内串行化（SQLite 本身只允许单写者），使用 BEGIN IMMEDIATE 避免锁升级死锁
+- 同一个 super-step 内各 task 的 put_writes 先缓存在内存中，与下一个 checkpoint 在同一个事务中提交
+  （缓冲逻辑见 BufferedCheckpointSaver）
+
+表结构与 langgraph 官方 AsyncSqliteSaver 保持一致，可以直接读取已有的 aio_history.db
+
+FilePath: sqlite
+"""
+
+from __future__ import annotations
+
+import asyncio
+from collections.abc import AsyncIterator, Sequence
+from contextlib import asynccontextmanager
+from pathlib import Path
+from typing import Any
+
+import aiosqlite
+from langgraph.checkpoint.serde.base import SerializerProtocol
+
+from app.agents.common.checkpoint.base import INTERRUPT_CHANNEL, BufferedCheckpointSaver, CheckpointRow, WriteRow
+from app.core.config import settings
+from app.core.logger import logger_manager
+
+logger = logger_manager.get_logger(__name__)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS checkpoints (
+    thread_id TEXT NOT NULL,
+    checkpoint_ns TEXT NOT NULL DEFAULT '',
+    checkpoint_id TEXT NOT NULL,
+    parent_checkpoint_id TEXT,
+    type TEXT,
+    checkpoint BLOB,
+    metadata BLOB,
+    PRIMARY KEY (thread_id, checkpoint_ns, checkpoint_id)
+);
+CREATE TABLE IF NOT EXISTS writes (
+    thread_id TEXT NOT NULL,
+    checkpoint_ns TEXT NOT NULL DEFAULT '',
+    checkpoint_id TEXT NOT NULL,
+    task_id TEXT NOT NULL,
+    idx INTEGER NOT NULL,
+    channel TEXT NOT NULL,
+    type TEXT,
+    value BLOB,
+    PRIMARY KEY (thread_id, checkpoint_ns, checkpoint_id, task_id, idx)
+);
+"""
+
+_UPSERT_WRITE = (
+    "INSERT OR REPLACE INTO writes "
+    "(thread_id, checkpoint_ns, checkpoint_id, task_id, idx, channel, type, value) "
+    "VALUES (?, ?, ?, ?, ?, ?, ?, ?)"
+)
+_INSERT_WRITE = (
+    "INSERT OR IGNORE INTO writes "
+    "(thread_id, checkpoint_ns, checkpoint_id, task_id, idx, channel, type, value) "
+    "VALUES (?, ?, ?, ?, ?, ?, ?, ?)"
+)
+_UPSERT_CHECKPOINT = (
+    "INSERT OR REPLACE INTO checkpoints "
+    "(thread_id, checkpoint_ns, checkpoint_id, parent_checkpoint_id, type, checkpoint, metadata) "
+    "VALUES (?, ?, ?, ?, ?, ?, ?)"
+)
+
+
+def default_pragmas() -> list[str]:
+    """根据配置生成每个连接建立时执行的 PRAGMA 列表"""
+    cfg = settings.checkpoint
+    return [
+        # auto_vacuum 只在建表前生效，对已有数据库是无害的空操作
+        "auto_vacuum = INCREMENTAL",
+        "journal_mode = WAL",
+        "synchronous = NORMAL",
+        f"busy_timeout = {cfg.CHECKPOINT_SQLITE_BUSY_TIMEOUT_MS}",
+        f"cache_size = -{cfg.CHECKPOINT_SQLITE_CACHE_SIZE_KB}",
+        "temp_store = MEMORY",
+        f"mmap_size = {cfg.CHECKPOINT_SQLITE_MMAP_SIZE}",
+    ]
+
+
+class SqliteConnectionPool:
+    """有上限的 aiosqlite 连接池
+
+    连接按需创建，最多 pool_size 个；借出的连接在归还前会回滚未提交的事务。
+    """
+
+    def __init__(self, db_path: str | Path, pool_size: int = 4, pragmas: Sequence[str] | None = None):
+        self.db_path = str(db_path)
+        self.pool_size = max(1, pool_size)
+        self.pragmas = list(pragmas) if pragmas is not None else default_pragmas()
+        self._idle: asyncio.Queue[aiosqlite.Connection] = asyncio.Queue()
+        self._connections: list[aiosqlite.Connection] = []
+        self._create_lock = asyncio.Lock()
+        self._write_lock = asyncio.Lock()
+        self._closed = False
+
+    async def _connect(self) -> aiosqlite.Connection:
+        conn = await aiosqlite.connect(self.db_path)
+        for pragma in self.pragmas:
+            await conn.execute(f"PRAGMA {pragma}")
+        return conn
+
+    async def _checkout(self) -> aiosqlite.Connection:
+        if self._closed:
+            raise RuntimeError(f"Connection pool for {self.db_path} is closed")
+
+        try:
+            return self._idle.get_nowait()
+        except asyncio.QueueEmpty:
+            pass
+
+        async with self._create_lock:
+            if len(self._connections) < self.pool_size:
+                conn = await self._connect()
+                self._connections.append(conn)
+                return conn
+
+        return await self._idle.get()
+
+    @asynccontextmanager
+    async def acquire(self) -> AsyncIterator[aiosqlite.Connection]:
+        """借出一个连接（读操作使用）"""
+        conn = await self._checkout()
+        try:
+            yield conn
+        finally:
+            if conn.in_transaction:
+                await conn.rollback()
+            self._idle.put_nowait(conn)
+
+    @asynccontextmanager
+    async def transaction(self) -> AsyncIterator[aiosqlite.Connection]:
+        """借出一个连接并开启写事务，正常退出时提交，异常时回滚"""
+        async with self._write_lock, self.acquire() as conn:
+            await conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield conn
+            except BaseException:
+                await conn.rollback()
+                raise
+            await conn.commit()
+
+    async def executescript(self, script: str) -> None:
+        """在写锁保护下执行一段自带事务控制的脚本（如 PRAGMA incremental_vacuum）"""
+        async with self._write_lock, self.acquire() as conn:
+            await conn.executescript(script)
+
+    def stats(self) -> dict[str, int]:
+        return {
+            "size": len(self._connections),
+            "idle": self._idle.qsize(),
+            "max_size": self.pool_size,
+        }
+
+    async def close(self) -> None:
+        self._closed = True
+        for conn in self._connections:
+            try:
+                await conn.close()
+            except Exception as e:
+                logger.warning(f"关闭 SQLite 连接 {self.db_path} 出错: {e}")
+        self._connections.clear()
+        self._idle = asyncio.Queue()
+
+
+class PooledSqliteSaver(BufferedCheckpointSaver):
+    """基于连接池的异步 SQLite checkpointer
+
+    仅实现异步接口，项目中的 graph 全部通过 astream / ainvoke 调用。
+    """
+
+    def __init__(
+        self,
+        pool: SqliteConnectionPool,
+        *,
+        serde: SerializerProtocol | None = None,
+        delta_snapshot_interval: int = 0,
+    ):
+        super().__init__(serde=serde, write_behind=False, delta_snapshot_interval=delta_snapshot_interval)
+        self.pool = pool
+
+    async def _setup_storage(self) -> None:
+        async with self.pool.transaction() as conn:
+            for statement in _SCHEMA.split(";"):
+                if statement.strip():
+                    await conn.execute(statement)
+
+    async def _write_batch(self, checkpoints: list[CheckpointRow], writes: list[WriteRow]) -> None:
+        upserts = [tuple(row[:-1]) for row in writes if row.replace]
+        inserts = [tuple(row[:-1]) for row in writes if not row.replace]
+        async with self.pool.transaction() as conn:
+            if upserts:
+                await conn.executemany(_UPSERT_WRITE, upserts)
+            if inserts:
+                await conn.executemany(_INSERT_WRITE, inserts)
+            if checkpoints:
+                await conn.executemany(_UPSERT_CHECKPOINT, [tuple(row) for row in checkpoints])
+
+    async def _fetch_checkpoints(
+        self,
+        thread_id: str | None,
+        checkpoint_ns: str | None,
+        checkpoint_id: str | None = None,
+        before: str | None = None,
+        limit: int | None = None,
+    ) -> list[CheckpointRow]:
+        clauses: list[str] = []
+        params: list[Any] = []
+        if thread_id is not None:
+            clauses.append("thread_id = ?")
+            params.append(thread_id)
+        if checkpoint_ns is not None:
+            clauses.append("checkpoint_ns = ?")
+            params.append(checkpoint_ns)
+        if checkpoint_id:
+            clauses.append("checkpoint_id = ?")
+            params.append(checkpoint_id)
+        if before:
+            clauses.append("checkpoint_id < ?")
+            params.append(before)
+
+        query = (
+            "SELECT thread_id, checkpoint_ns, checkpoint_id, parent_checkpoint_id, type, checkpoint, metadata "
+            "FROM checkpoints"
+        )
+        if clauses:
+            query += " WHERE " + " AND ".join(clauses)
+        query += " ORDER BY checkpoint_id DESC"
+        if limit is not None:
+            query += f" LIMIT {int(limit)}"
+
+        async with self.pool.acquire() as conn:
+            cursor = await conn.execute(query, params)
+            rows = await cursor.fetchall()
+            await cursor.close()
+        return [CheckpointRow(*row) for row in rows]
+
+    async def _fetch_writes(
+        self, thread_id: str, checkpoint_ns: str, checkpoint_id: str
+    ) -> list[tuple[str, str, str | None, bytes | None]]:
+        async with self.pool.acquire() as conn:
+            cursor = await conn.execute(
+                "SELECT task_id, channel, type, value FROM writes "
+                "WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ? ORDER BY task_id, idx",
+                (thread_id, checkpoint_ns, checkpoint_id),
+            )
+            rows = await cursor.fetchall()
+            await cursor.close()
+        return [tuple(row) for row in rows]
+
+    async def _delete_thread(self, thread_id: str) -> None:
+        async with self.pool.transaction() as conn:
+            await conn.execute("DELETE FROM checkpoints WHERE thread_id = ?", (thread_id,))
+            await conn.execute("DELETE FROM writes WHERE thread_id = ?", (thread_id,))
+
+    async def _scan_threads(self, after: str | None, limit: int) -> list[str]:
+        async with self.pool.acquire() as conn:
+            cursor = await conn.execute(
+                "SELECT DISTINCT thread_id FROM checkpoints WHERE thread_id > ? ORDER BY thread_id LIMIT ?",
+                (after or "", limit),
+            )
+            rows = await cursor.fetchall()
+            await cursor.close()
+        return [row[0] for row in rows]
+
+    async def _list_checkpoint_keys(self, thread_id: str) -> list[tuple[str, str, str | None, str | None]]:
+        async with self.pool.acquire() as conn:
+            cursor = await conn.execute(
+                "SELECT checkpoint_ns, checkpoint_id, parent_checkpoint_id, type FROM checkpoints "
+                "WHERE thread_id = ? ORDER BY checkpoint_id DESC",
+                (thread_id,),
+            )
+            rows = await cursor.fetchall()
+            await cursor.close()
+        return [tuple(row) for row in rows]
+
+    async def _list_interrupt_keys(self, thread_id: str) -> set[tuple[str, str]]:
+        async with self.pool.acquire() as conn:
+            cursor = await conn.execute(
+                "SELECT DISTINCT checkpoint_ns, checkpoint_id FROM writes WHERE thread_id = ? AND channel = ?",
+                (thread_id, INTERRUPT_CHANNEL),
+            )
+            rows = await cursor.fetchall()
+            await cursor.close()
+        return {tuple(row) for row in rows}
+
+    async def _delete_checkpoints(self, thread_id: str, checkpoint_ns: str, checkpoint_ids: list[str]) -> None:
+        params = [(thread_id, checkpoint_ns, checkpoint_id) for checkpoint_id in checkpoint_ids]
+        async with self.pool.transaction() as conn:
+            await conn.executemany(
+                "DELETE FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ?", params
+            )
+            await conn.executemany(
+                "DELETE FROM writes WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ?", params
+            )
+
+    async def _pragma(self, name: str) -> int:
+        async with self.pool.acquire() as conn:
+            cursor = await conn.execute(f"PRAGMA {name}")
+            row = await cursor.fetchone()
+            await cursor.close()
+        return row[0] if row else 0
+
+    async def avacuum(self, max_pages: int | None = None, step_pages: int = 256) -> int:
+        """执行 incremental vacuum，每次最多回收 step_pages 页，返回回收的字节数
+
+        仅对 auto_vacuum=INCREMENTAL 的数据库生效；在该设置之前创建的数据库需要执行一次完整的 VACUUM 才能转换。
+        """
+        if await self._pragma("auto_vacuum") != 2:
+            logger.warning(f"{self.pool.db_path} 未开启 auto_vacuum=INCREMENTAL，跳过空间回收")
+            return 0
+
+        page_size = await self._pragma("page_size")
+        reclaimed = 0
+        while (free_pages := await self._pragma("freelist_count")) > 0:
+            pages = min(step_pages, free_pages)
+            if max_pages is not None:
+                pages = min(pages, max_pages - reclaimed // page_size)
+            if pages <= 0:
+                break
+            # 通过 executescript 执行，逐条 execute 时每次只会回收一页
+            await self.pool.executescript(f"PRAGMA incremental_vacuum({int(pages)});")
+            freed = free_pages - await self._pragma("freelist_count")
+            if freed <= 0:
+                break
+            reclaimed += freed * page_size
+            await asyncio.sleep(0)
+        return reclaimed
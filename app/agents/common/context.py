@@ -6,7 +6,9 @@ Description:
 FilePath: context
 """
 
+import copy
 import os
+import threading
 import uuid
 from pathlib import Path
 from typing import Annotated, get_args, get_origin, List, Any, Dict
@@ -20,6 +22,40 @@ logger = logger_manager.get_logger(__name__)
 
 SAVE_DIR = "./saves"
 
+# 进程内的配置文件缓存：path -> ((mtime_ns, inode, size), config)
+_config_cache: dict[str, tuple[tuple[int, int, int], dict]] = {}
+_config_cache_lock = threading.Lock()
+# 每个 Context 类的可配置项元数据：cls -> {field_name: (ConfigurableItem, options)}
+_configurable_items_cache: dict[type, dict] = {}
+
+
+def load_config_file(config_file_path: Path) -> dict:
+    """读取 YAML 配置文件，文件的 mtime / inode / size 未变化时直接使用缓存（返回副本）"""
+    path = str(config_file_path)
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        with _config_cache_lock:
+            _config_cache.pop(path, None)
+        return {}
+
+    signature = (stat.st_mtime_ns, stat.st_ino, stat.st_size)
+    with _config_cache_lock:
+        cached = _config_cache.get(path)
+    if cached is None or cached[0] != signature:
+        with open(path, encoding="utf-8") as f:
+            config = yaml.safe_load(f) or {}
+        with _config_cache_lock:
+            _config_cache[path] = (signature, config)
+        cached = (signature, config)
+    return copy.deepcopy(cached[1])
+
+
+def invalidate_config_file(config_file_path: Path) -> None:
+    with _config_cache_lock:
+        _config_cache.pop(str(config_file_path), None)
+
+
 class ConfigurableItem(BaseModel):
     """表示一个可配置项的模型"""
     type: str
@@ -42,8 +78,11 @@ class BaseContext(BaseModel):
     """
 
     def update(self, data: dict):
-        """更新配置字段"""
+        """更新配置字段，frozen 字段（thread_id / user_id）只能在创建时指定"""
         for key, value in data.items():
+            field = type(self).model_fields.get(key)
+            if field is not None and field.frozen:
+                continue
             if hasattr(self, key):
                 setattr(self, key, value)
 
@@ -73,18 +112,36 @@ class BaseContext(BaseModel):
         description="智能体的驱动模型，建议选择 Agent 能力较强的模型，不建议使用小参数模型。",
     )
 
+    tools: list[str] = Field(
+        default_factory=list,
+        description="智能体可以使用的内置工具名称",
+        json_schema_extra={"name": "工具"},
+    )
+
+    knowledges: list[str] = Field(
+        default_factory=list,
+        description="智能体可以检索的知识库名称",
+        json_schema_extra={"name": "知识库"},
+    )
+
+    mcps: list[str] = Field(
+        default_factory=list,
+        description="智能体可以使用的 MCP 服务器名称",
+        json_schema_extra={"name": "MCP 服务器"},
+    )
+
     @classmethod
     def from_file(cls, module_name: str, input_context: dict = None) -> "BaseContext":
         """Load configuration from a YAML file. 用于持久化配置"""
 
-        # 从文件加载配置
-        context = cls()
-        config_file_path = Path(SAVE_DIR) / "agents" / module_name / "config.yaml"
-        if module_name is not None and os.path.exists(config_file_path):
+        # 从文件加载配置，frozen 的身份字段在创建时传入
+        input_context = input_context or {}
+        context = cls(**{key: input_context[key] for key in ("thread_id", "user_id") if key in input_context})
+        if module_name is not None:
+            config_file_path = Path(SAVE_DIR) / "agents" / module_name / "config.yaml"
             file_config = {}
             try:
-                with open(config_file_path, encoding="utf-8") as f:
-                    file_config = yaml.safe_load(f) or {}
+                file_config = load_config_file(config_file_path)
             except Exception as e:
                 logger.error(f"加载智能体配置文件出错: {e}")
 
@@ -111,6 +168,7 @@ class BaseContext(BaseModel):
             os.makedirs(os.path.dirname(config_file_path), exist_ok=True)
             with open(config_file_path, "w", encoding="utf-8") as f:
                 yaml.dump(configurable_config, f, indent=2, allow_unicode=True)
+            invalidate_config_file(config_file_path)
 
             return True
         except Exception as e:
@@ -119,7 +177,24 @@ class BaseContext(BaseModel):
 
     @classmethod
     def get_configurable_items(cls) -> Dict[str, ConfigurableItem]:
-        """实现一个可配置的参数列表，在 UI 上配置时使用"""
+        """实现一个可配置的参数列表，在 UI 上配置时使用
+
+        字段元数据按类缓存，只有可调用的 options 每次重新计算（如动态的模型列表）。
+        """
+        cached = _configurable_items_cache.get(cls)
+        if cached is None:
+            cached = _configurable_items_cache[cls] = cls._build_configurable_items()
+
+        configurable_items = {}
+        for field_name, (item, options) in cached.items():
+            item = item.model_copy(deep=True)
+            if callable(options):
+                item.options = options()
+            configurable_items[field_name] = item
+        return configurable_items
+
+    @classmethod
+    def _build_configurable_items(cls) -> Dict[str, tuple[ConfigurableItem, Any]]:
         configurable_items = {}
 
         # 获取模型字段信息
@@ -143,10 +218,8 @@ class BaseContext(BaseModel):
             # 提取 Annotated 的元数据
             template_metadata = cls._extract_template_metadata(field_info.annotation)
 
-            # 获取选项
+            # 获取选项（可调用的选项在 get_configurable_items 中每次重新计算）
             options = field_json_schema_extra.get("options", [])
-            if callable(options):
-                options = options()
 
             # 获取默认值
             default_value = field_info.default
@@ -156,14 +229,15 @@ class BaseContext(BaseModel):
                 if field_info.default_factory is not None:
                     default_value = field_info.default_factory()
 
-            configurable_items[field_name] = ConfigurableItem(
+            item = ConfigurableItem(
                 type=type_name,
                 name=field_json_schema_extra.get("name", field_name),
-                options=options,
+                options=[] if callable(options) else options,
                 default=default_value,
                 description=field_json_schema_extra.get("description", ""),
                 template_metadata=template_metadata
             )
+            configurable_items[field_name] = (item, options)
 
         return configurable_items
 
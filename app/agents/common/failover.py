@@ -0,0 +1,256 @@
+"""
+Author: xuyoushun
+Email: xuyoushun@bestpay.com.cn
+Date: 2026/1/29 15:40
+Description:
+
+多端点故障转移与对冲请求的聊天模型
+
+FailoverChatModel 包装若干个等价的模型端点（相同模型部署在不同 base_url / provider）：
+- 路由：跳过处于熔断期的端点，其余按首 token 耗时（TTFT）的 EWMA 排序，没有样本的端点优先尝试
+- 故障转移：在产出第一个 token 之前失败，自动换下一个端点；已经开始输出后失败则直接抛出
+- 对冲：首选端点在 p95 TTFT 内还没有产出 token 时，向下一个端点再发一次请求，先产出 token 的胜出，另一个被取消
+- 连续失败 failure_threshold 次的端点熔断 failure_cooldown 秒
+
+工具等调用参数由第一个端点的 bind_tools 生成后原样传给每个端点，因此各端点需要使用兼容的接口（如都是 OpenAI 兼容接口）。
+
+FilePath: failover
+"""
+
+from __future__ import annotations
+
+import asyncio
+import time
+from collections import deque
+from collections.abc import AsyncIterator, Iterator, Sequence
+from typing import Any
+
+from langchain_core.callbacks import AsyncCallbackManagerForLLMRun, CallbackManagerForLLMRun
+from langchain_core.language_models.chat_models import (
+    BaseChatModel,
+    agenerate_from_stream,
+    generate_from_stream,
+)
+from langchain_core.messages import BaseMessage
+from langchain_core.outputs import ChatGenerationChunk, ChatResult
+from pydantic import Field, PrivateAttr
+
+from app.agents.common.scheduler import model_key
+from app.core.logger import logger_manager
+from app.core.metrics import metrics_manager
+
+logger = logger_manager.get_logger(__name__)
+
+
+class EndpointStats:
+    """单个端点的首 token 耗时与健康状态"""
+
+    def __init__(self, name: str, window: int = 100):
+        self.name = name
+        self.samples: deque[float] = deque(maxlen=window)
+        self.ewma: float | None = None
+        self.failures = 0
+        self.open_until = 0.0
+
+    def healthy(self, now: float) -> bool:
+        return now >= self.open_until
+
+    def p95(self) -> float | None:
+        if len(self.samples) < 10:
+            return None
+        ordered = sorted(self.samples)
+        return ordered[int(0.95 * (len(ordered) - 1))]
+
+    def record_ttft(self, seconds: float) -> None:
+        self.samples.append(seconds)
+        self.ewma = seconds if self.ewma is None else 0.8 * self.ewma + 0.2 * seconds
+        self.failures = 0
+        metrics_manager.observe("llm_endpoint_ttft_seconds", seconds, endpoint=self.name)
+
+    def record_failure(self, threshold: int, cooldown: float) -> None:
+        self.failures += 1
+        metrics_manager.inc("llm_endpoint_failures_total", endpoint=self.name)
+        if self.failures >= threshold:
+            self.open_until = time.monotonic() + cooldown
+            logger.warning(f"模型端点 {self.name} 连续失败 {self.failures} 次，熔断 {cooldown}s")
+
+
+class FailoverChatModel(BaseChatModel):
+    """按健康状况和延迟在多个等价端点之间路由，可选对冲请求"""
+
+    models: list[BaseChatModel]
+    hedge: bool = True
+    hedge_delay: float = Field(default=2.0, description="没有足够样本时的对冲等待时间（秒）")
+    min_hedge_delay: float = 0.2
+    failure_threshold: int = 3
+    failure_cooldown: float = 30.0
+
+    _stats: list[EndpointStats] = PrivateAttr(default_factory=list)
+
+    def model_post_init(self, context: Any) -> None:
+        if not self.models:
+            raise ValueError("FailoverChatModel requires at least one model")
+        self._stats = [EndpointStats(f"{i}:{model_key(model)}") for i, model in enumerate(self.models)]
+
+    @property
+    def _llm_type(self) -> str:
+        return "failover"
+
+    @property
+    def model_name(self) -> str | None:
+        return getattr(self.models[0], "model_name", None) or getattr(self.models[0], "model", None)
+
+    def bind_tools(self, tools: Sequence[Any], **kwargs: Any):
+        # 由第一个端点转换工具格式，调用时原样传给各端点
+        binding = self.models[0].bind_tools(tools, **kwargs)
+        return self.bind(**binding.kwargs)
+
+    # -------------------------------
+    # 路由
+    # -------------------------------
+
+    def _route(self) -> list[int]:
+        now = time.monotonic()
+        healthy = [i for i, stats in enumerate(self._stats) if stats.healthy(now)]
+        if not healthy:  # 全部熔断时按恢复时间依次尝试
+            return sorted(range(len(self._stats)), key=lambda i: self._stats[i].open_until)
+        return sorted(healthy, key=lambda i: self._stats[i].ewma or 0.0)
+
+    def _hedge_after(self, index: int) -> float:
+        p95 = self._stats[index].p95()
+        return max(self.min_hedge_delay, p95 if p95 is not None else self.hedge_delay)
+
+    def endpoint_stats(self) -> list[dict]:
+        return [
+            {
+                "endpoint": stats.name,
+                "ttft_ewma": stats.ewma,
+                "ttft_p95": stats.p95(),
+                "failures": stats.failures,
+                "healthy": stats.healthy(time.monotonic()),
+            }
+            for stats in self._stats
+        ]
+
+    # -------------------------------
+    # 调用
+    # -------------------------------
+
+    def _stream(
+            self,
+            messages: list[BaseMessage],
+            stop: list[str] | None = None,
+            run_manager: CallbackManagerForLLMRun | None = None,
+            **kwargs: Any,
+    ) -> Iterator[ChatGenerationChunk]:
+        """同步调用只做故障转移，不对冲"""
+        last_error: Exception | None = None
+        for index in self._route():
+            stats = self._stats[index]
+            start = time.perf_counter()
+            stream = self.models[index]._stream(messages, stop=stop, **kwargs)
+            try:
+                chunk = next(stream)
+            except Exception as e:
+                stats.record_failure(self.failure_threshold, self.failure_cooldown)
+                last_error = e
+                continue
+            stats.record_ttft(time.perf_counter() - start)
+            yield chunk
+            yield from stream
+            return
+        raise last_error or RuntimeError("No model endpoint available")
+
+    async def _astream(
+            self,
+            messages: list[BaseMessage],
+            stop: list[str] | None = None,
+            run_manager: AsyncCallbackManagerForLLMRun | None = None,
+            **kwargs: Any,
+    ) -> AsyncIterator[ChatGenerationChunk]:
+        order = iter(self._route())
+
+        async def first_chunk(index: int):
+            stream = self.models[index]._astream(messages, stop=stop, **kwargs)
+            start = time.perf_counter()
+            try:
+                chunk = await stream.__anext__()
+            except BaseException:
+                await stream.aclose()
+                raise
+            self._stats[index].record_ttft(time.perf_counter() - start)
+            return stream, chunk
+
+        def start_next() -> int | None:
+            index = next(order, None)
+            if index is not None:
+                pending[asyncio.create_task(first_chunk(index))] = index
+            return index
+
+        pending: dict[asyncio.Task, int] = {}
+        primary = start_next()
+        hedged = not self.hedge or len(self.models) < 2
+        winner = None
+        last_error: BaseException | None = None
+        try:
+            while pending and winner is None:
+                timeout = None if hedged else self._hedge_after(primary)
+                done, _ = await asyncio.wait(pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    hedged = True
+                    if start_next() is not None:
+                        metrics_manager.inc("llm_hedged_requests_total", endpoint=self._stats[primary].name)
+                    continue
+
+                for task in done:
+                    index = pending.pop(task)
+                    try:
+                        result = task.result()
+                    except Exception as e:
+                        last_error = e
+                        self._stats[index].record_failure(self.failure_threshold, self.failure_cooldown)
+                        logger.warning(f"模型端点 {self._stats[index].name} 调用失败，尝试下一个端点: {e}")
+                        if not pending:  # 故障转移，新端点作为首选端点重新计算对冲时间
+                            index = start_next()
+                            primary = primary if index is None else index
+                        continue
+                    if winner is None:
+                        winner = (index, *result)
+                    else:  # 两个请求同时产出 token，丢弃后到的一个
+                        await result[0].aclose()
+        finally:
+            for task in pending:
+                task.cancel()
+            if pending:
+                await asyncio.gather(*pending, return_exceptions=True)
+
+        if winner is None:
+            raise last_error or RuntimeError("No model endpoint available")
+
+        index, stream, chunk = winner
+        if index != primary:
+            metrics_manager.inc("llm_hedge_wins_total", endpoint=self._stats[index].name)
+        try:
+            yield chunk
+            async for chunk in stream:
+                yield chunk
+        finally:
+            await stream.aclose()
+
+    def _generate(
+            self,
+            messages: list[BaseMessage],
+            stop: list[str] | None = None,
+            run_manager: CallbackManagerForLLMRun | None = None,
+            **kwargs: Any,
+    ) -> ChatResult:
+        return generate_from_stream(self._stream(messages, stop=stop, **kwargs))
+
+    async def _agenerate(
+            self,
+            messages: list[BaseMessage],
+            stop: list[str] | None = None,
+            run_manager: AsyncCallbackManagerForLLMRun | None = None,
+            **kwargs: Any,
+    ) -> ChatResult:
+        return await agenerate_from_stream(self._astream(messages, stop=stop, **kwargs))
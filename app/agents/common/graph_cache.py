@@ -0,0 +1,113 @@
+"""
+Author: xuyoushun
+Email: xuyoushun@bestpay.com.cn
+Date: 2026/1/26 10:20
+Description:
+
+编译后 graph 的 LRU 缓存
+
+- 按影响 graph 结构的配置（模型、工具、MCP 等）的哈希区分，不同配置各自缓存一份
+- 同一个 key 同时只会有一个构建任务（single-flight），并发请求共享构建结果；
+  等待方被取消不会中断构建
+- invalidate() 会递增代数，之前发起但尚未完成的构建结果不会写入缓存
+- reload() 清空缓存并立即重建指定 key，并发的多次 reload 合并为一次
+- 构建耗时记录在 agent_graph_build_seconds 指标中
+
+FilePath: graph_cache
+"""
+
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import json
+import time
+from collections import OrderedDict
+from collections.abc import Awaitable, Callable
+from typing import Any, Generic, TypeVar
+
+from app.core.logger import logger_manager
+from app.core.metrics import metrics_manager
+
+logger = logger_manager.get_logger(__name__)
+
+T = TypeVar("T")
+
+
+def graph_cache_key(values: dict[str, Any]) -> str:
+    """根据影响 graph 结构的配置生成缓存 key"""
+    payload = json.dumps(values, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:16]
+
+
+class GraphCache(Generic[T]):
+    """带 single-flight 的异步 LRU 缓存"""
+
+    def __init__(self, name: str, max_size: int = 16):
+        self.name = name
+        self.max_size = max(1, max_size)
+        self._items: OrderedDict[str, T] = OrderedDict()
+        self._building: dict[str, asyncio.Task] = {}
+        self._reloading: asyncio.Task | None = None
+        self._generation = 0
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._items
+
+    async def get_or_build(self, key: str, builder: Callable[[], Awaitable[T]]) -> T:
+        if key in self._items:
+            self._items.move_to_end(key)
+            metrics_manager.inc("agent_graph_cache_hits_total", agent=self.name)
+            return self._items[key]
+
+        task = self._building.get(key)
+        if task is None:
+            metrics_manager.inc("agent_graph_cache_misses_total", agent=self.name)
+            task = asyncio.create_task(self._build(key, builder, self._generation))
+            self._building[key] = task
+        # shield：某个等待方被取消时不影响其他等待方共享的构建任务
+        return await asyncio.shield(task)
+
+    async def _build(self, key: str, builder: Callable[[], Awaitable[T]], generation: int) -> T:
+        start = time.perf_counter()
+        metrics_manager.set("agent_graph_builds_in_flight", len(self._building), agent=self.name)
+        try:
+            item = await builder()
+        except Exception:
+            metrics_manager.inc("agent_graph_build_errors_total", agent=self.name)
+            raise
+        finally:
+            if self._building.get(key) is asyncio.current_task():
+                self._building.pop(key, None)
+            metrics_manager.set("agent_graph_builds_in_flight", len(self._building), agent=self.name)
+
+        elapsed = time.perf_counter() - start
+        metrics_manager.observe("agent_graph_build_seconds", elapsed, agent=self.name)
+        logger.info(f"{self.name} graph 构建完成 (key={key}, 耗时 {elapsed:.2f}s)")
+
+        if generation == self._generation:
+            self._items[key] = item
+            self._items.move_to_end(key)
+            while len(self._items) > self.max_size:
+                evicted, _ = self._items.popitem(last=False)
+                metrics_manager.inc("agent_graph_cache_evictions_total", agent=self.name)
+                logger.debug(f"{self.name} graph 缓存淘汰: {evicted}")
+            metrics_manager.set("agent_graph_cache_size", len(self._items), agent=self.name)
+        return item
+
+    def invalidate(self) -> None:
+        """清空缓存；进行中的构建仍会返回给各自的等待方，但结果不再写入缓存"""
+        self._generation += 1
+        self._items.clear()
+        self._building.clear()
+        metrics_manager.set("agent_graph_cache_size", 0, agent=self.name)
+
+    async def reload(self, key: str, builder: Callable[[], Awaitable[T]]) -> T:
+        """清空缓存并重建 key 对应的 graph；重建进行中时再次 reload 直接等待同一次重建"""
+        if self._reloading is None or self._reloading.done():
+            self.invalidate()
+            self._reloading = asyncio.create_task(self.get_or_build(key, builder))
+        return await asyncio.shield(self._reloading)
@@ -0,0 +1,123 @@
+"""
+Author: xuyoushun
+Email: xuyoushun@bestpay.com.cn
+Date: 2026/1/27 15:40
+Description:
+
+线程历史消息的序列化缓存与分页
+
+- 序列化结果按 (thread_id, checkpoint_id, projection) 缓存，线程没有新的 checkpoint 时重复加载不再逐条 model_dump
+- projection="light" 只保留 id / 角色 / 文本内容 / 工具名，用于列表展示
+- 分页使用消息 id 作为游标：默认返回最新的 limit 条，before / after 返回游标之前 / 之后的消息
+
+FilePath: history
+"""
+
+from __future__ import annotations
+
+import threading
+from collections import OrderedDict
+from typing import Any, Literal, TypeAlias
+
+from app.core.config import settings
+from app.core.metrics import metrics_manager
+
+Projection: TypeAlias = Literal["full", "light"]
+
+
+def _text_content(content: Any) -> str:
+    if isinstance(content, str):
+        return content
+    if isinstance(content, list):
+        return "".join(
+            block if isinstance(block, str) else block.get("text", "")
+            for block in content
+            if isinstance(block, str) or (isinstance(block, dict) and block.get("type") == "text")
+        )
+    return str(content)
+
+
+def serialize_message(msg: Any, projection: Projection = "full") -> dict:
+    """序列化单条消息"""
+    if projection == "light":
+        item = {
+            "id": getattr(msg, "id", None),
+            "type": getattr(msg, "type", None),
+            "content": _text_content(getattr(msg, "content", "")),
+        }
+        if getattr(msg, "tool_calls", None):
+            item["tool_calls"] = [call.get("name") for call in msg.tool_calls]
+        if getattr(msg, "type", None) == "tool":
+            item["name"] = getattr(msg, "name", None)
+        return item
+
+    if hasattr(msg, "model_dump"):
+        return msg.model_dump()
+    return dict(msg.__dict__) if hasattr(msg, "__dict__") else {"content": str(msg)}
+
+
+def paginate(
+        messages: list[dict],
+        limit: int | None = None,
+        before: str | None = None,
+        after: str | None = None,
+) -> tuple[list[dict], bool]:
+    """按消息 id 游标分页，返回 (消息, 是否还有更多)；游标不存在时返回空"""
+    start, end = 0, len(messages)
+    if before is not None or after is not None:
+        positions = {item.get("id"): i for i, item in enumerate(messages)}
+        if before is not None:
+            if before not in positions:
+                return [], False
+            end = positions[before]
+        if after is not None:
+            if after not in positions:
+                return [], False
+            start = positions[after] + 1
+
+    if limit is None or end - start <= limit:
+        return messages[start:end], False
+    if after is not None and before is None:
+        return messages[start:start + limit], True
+    return messages[end - limit:end], True
+
+
+class HistoryCache:
+    """序列化历史消息的 LRU 缓存，缓存的列表为只读，调用方不要修改"""
+
+    def __init__(self, max_size: int = 256):
+        self.max_size = max(1, max_size)
+        self._items: OrderedDict[tuple, list[dict]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_or_serialize(
+            self, thread_id: str, checkpoint_id: str | None, messages: list, projection: Projection = "full"
+    ) -> list[dict]:
+        if checkpoint_id is None:
+            return [serialize_message(msg, projection) for msg in messages]
+
+        key = (thread_id, checkpoint_id, projection)
+        with self._lock:
+            if key in self._items:
+                self._items.move_to_end(key)
+                metrics_manager.inc("agent_history_cache_hits_total")
+                return self._items[key]
+
+        metrics_manager.inc("agent_history_cache_misses_total")
+        serialized = [serialize_message(msg, projection) for msg in messages]
+        with self._lock:
+            self._items[key] = serialized
+            while len(self._items) > self.max_size:
+                self._items.popitem(last=False)
+        return serialized
+
+    def invalidate(self, thread_id: str | None = None) -> None:
+        with self._lock:
+            if thread_id is None:
+                self._items.clear()
+            else:
+                for key in [key for key in self._items if key[0] == thread_id]:
+                    del self._items[key]
+
+
+history_cache = HistoryCache(settings.agent.AGENT_HISTORY_CACHE_SIZE)
@@ -0,0 +1,151 @@
+"""
+Author: xuyoushun
+Email: xuyoushun@bestpay.com.cn
+Date: 2026/1/28 15:20
+Description:
+
+模型调用结果的精确匹配缓存（Redis）
+
+- key 为 (模型, 温度, 系统提示词, 消息, 工具 schema, tool_choice, response_format) 规范化后的 sha256，
+  消息只取角色 / 内容 / 工具调用，不包含每次运行都不同的消息 id
+- 温度不为 0（包括未设置、使用 provider 默认值）的调用不缓存，除非 force=True
+- 结果使用 CompressedSerializer 序列化并压缩，超过 LLM_CACHE_MAX_ENTRY_BYTES 的结果不缓存
+- 每条缓存带 TTL；另用一个 sorted set 记录写入时间，条目数超过 LLM_CACHE_MAX_ENTRIES 时淘汰最早的条目
+- Redis 不可用时只记录警告，调用照常进行
+
+FilePath: llm_cache
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import time
+from typing import Any
+
+from langchain_core.messages import BaseMessage
+
+from app.agents.common.checkpoint.serde import CompressedSerializer
+from app.agents.common.scheduler import model_key
+from app.agents.common.tool_schema import tool_schema_cache
+from app.core.config import settings
+from app.core.logger import logger_manager
+from app.core.redis import redis_manager
+
+logger = logger_manager.get_logger(__name__)
+
+
+def model_temperature(model: Any, model_settings: dict | None = None) -> float | None:
+    """本次调用实际使用的温度，未设置时返回 None"""
+    if model_settings and model_settings.get("temperature") is not None:
+        return model_settings["temperature"]
+    return getattr(model, "temperature", None)
+
+
+def _normalize_message(msg: BaseMessage) -> dict:
+    item = {"type": msg.type, "content": msg.content}
+    if getattr(msg, "tool_calls", None):
+        item["tool_calls"] = [{"name": call["name"], "args": call["args"]} for call in msg.tool_calls]
+    # 不包含 tool_call_id：命中缓存时工具调用使用新的 id，工具结果按 tool_calls 的顺序排列
+    if msg.name:
+        item["name"] = msg.name
+    return item
+
+
+def _normalize_tool(tool: Any) -> Any:
+    try:
+        return tool_schema_cache.get(tool)
+    except Exception:
+        return getattr(tool, "name", repr(tool))
+
+
+def request_cache_key(
+        model: Any,
+        messages: list[BaseMessage],
+        system_prompt: str | None = None,
+        tools: list | None = None,
+        tool_choice: Any = None,
+        response_format: Any = None,
+        model_settings: dict | None = None,
+) -> str:
+    """生成规范化的缓存 key"""
+    payload = {
+        "model": model_key(model),
+        "base_url": str(getattr(model, "openai_api_base", None) or getattr(model, "api_base", None) or ""),
+        "temperature": model_temperature(model, model_settings),
+        "system_prompt": system_prompt,
+        "messages": [_normalize_message(msg) for msg in messages],
+        "tools": sorted(
+            (_normalize_tool(tool) for tool in tools or []),
+            key=lambda tool: json.dumps(tool, sort_keys=True, default=str),
+        ),
+        "tool_choice": tool_choice,
+        "response_format": response_format,
+        "model_settings": {k: v for k, v in (model_settings or {}).items() if k != "temperature"},
+    }
+    raw = json.dumps(payload, sort_keys=True, ensure_ascii=False, default=repr)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class LLMResponseCache:
+    """基于 RedisManager 二进制客户端的模型结果缓存"""
+
+    def __init__(self, prefix: str | None = None, ttl: int | None = None, max_entries: int | None = None,
+                 max_entry_bytes: int | None = None):
+        cfg = settings.llm
+        self.prefix = prefix or cfg.LLM_CACHE_PREFIX
+        self.ttl = ttl or cfg.LLM_CACHE_TTL
+        self.max_entries = max_entries or cfg.LLM_CACHE_MAX_ENTRIES
+        self.max_entry_bytes = max_entry_bytes or cfg.LLM_CACHE_MAX_ENTRY_BYTES
+        self.serde = CompressedSerializer(min_size=512)
+
+    @property
+    def index_key(self) -> str:
+        return f"{self.prefix}:index"
+
+    def _key(self, key: str) -> str:
+        return f"{self.prefix}:entry:{key}"
+
+    def encode(self, value: Any) -> bytes:
+        type_, data = self.serde.dumps_typed(value)
+        return type_.encode("utf-8") + b"\n" + data
+
+    def decode(self, raw: bytes) -> Any:
+        type_, _, data = raw.partition(b"\n")
+        return self.serde.loads_typed((type_.decode("utf-8"), data))
+
+    async def get(self, key: str) -> Any | None:
+        try:
+            client = await redis_manager.get_async_binary_client()
+            raw = await client.get(self._key(key))
+        except Exception as e:
+            logger.warning(f"读取 LLM 缓存失败: {e}")
+            return None
+        return None if raw is None else self.decode(raw)
+
+    async def set(self, key: str, value: Any) -> bool:
+        raw = self.encode(value)
+        if len(raw) > self.max_entry_bytes:
+            return False
+
+        now = time.time()
+        try:
+            client = await redis_manager.get_async_binary_client()
+            async with client.pipeline(transaction=False) as pipe:
+                pipe.set(self._key(key), raw, ex=self.ttl)
+                pipe.zadd(self.index_key, {key: now})
+                pipe.zremrangebyscore(self.index_key, "-inf", now - self.ttl)
+                pipe.zcard(self.index_key)
+                *_, size = await pipe.execute()
+
+            if size > self.max_entries:
+                evicted = await client.zpopmin(self.index_key, size - self.max_entries)
+                if evicted:
+                    await client.delete(*[self._key(member.decode("utf-8")) for member, _ in evicted])
+        except Exception as e:
+            logger.warning(f"写入 LLM 缓存失败: {e}")
+            return False
+        return True
+
+
+llm_response_cache = LLMResponseCache()
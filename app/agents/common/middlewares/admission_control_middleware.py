@@ -0,0 +1,29 @@
+"""
+Author: xuyoushun
+Email: xuyoushun@bestpay.com.cn
+Date: 2026/1/28 11:00
+Description:
+FilePath: admission_control_middleware
+"""
+
+from collections.abc import Callable
+
+from langchain.agents.middleware import AgentMiddleware, ModelRequest, ModelResponse
+
+from app.agents.common.scheduler import model_key, model_scheduler
+from app.core.config import settings
+
+
+class AdmissionControlMiddleware(AgentMiddleware):
+    """模型调用准入控制中间件 - 每次模型调用前向 model_scheduler 申请并发名额
+
+    并发上限按模型自适应调整（AIMD），超出上限的调用按优先级排队，详见 app.agents.common.scheduler
+    """
+
+    async def awrap_model_call(
+        self, request: ModelRequest, handler: Callable[[ModelRequest], ModelResponse]
+    ) -> ModelResponse:
+        if not settings.llm.LLM_SCHEDULER_ENABLED:
+            return await handler(request)
+        async with model_scheduler.slot(model_key(request.model)):
+            return await handler(request)
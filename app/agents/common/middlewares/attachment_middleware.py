@@ -6,32 +6,68 @@ Description:
 
 附件注入中间件 - 使用 LangChain 标准中间件实现
 
+一次运行中模型会被调用多次，附件不变，渲染结果按附件内容的哈希缓存：
+- before_agent 中计算一次附件哈希写入 State（attachments_digest），之后的模型调用直接读取
+- 渲染后的提示词及其估算 token 数保存在进程内 LRU（AGENT_ATTACHMENT_CACHE_SIZE）
+- 超过 AGENT_ATTACHMENT_MAX_TOKENS 时按附件顺序截断，相同附件总是得到相同的结果
+
+AGENT_ATTACHMENT_MODE 控制附件的注入方式：
+- full：注入全部附件内容
+- retrieval：只注入附件目录和与最新用户问题最相关的片段（见 app.agents.common.attachment_index），
+  模型需要完整内容时调用 read_attachment 工具按行读取
+- auto（默认）：全部内容不超过 AGENT_ATTACHMENT_RETRIEVAL_TOKENS 时使用 full，否则使用 retrieval
+
 FilePath: attachment_middleware
 """
 
 from __future__ import annotations
 
+import hashlib
+import json
+import threading
+from collections import OrderedDict
 from collections.abc import Callable, Sequence
-from typing import NotRequired
+from typing import Any, NotRequired
 
 from langchain.agents import AgentState
 from langchain.agents.middleware import AgentMiddleware, ModelRequest, ModelResponse
+from langchain.tools import ToolRuntime, tool
+from langchain_core.messages import HumanMessage
 
+from app.agents.common.attachment_index import attachment_index_cache
+from app.agents.common.prompt import SESSION, VOLATILE, add_prompt_segment, estimate_tokens, truncate_tokens
+from app.core.config import settings
 from app.core.logger import logger_manager
+from app.core.metrics import metrics_manager
 
 logger = logger_manager.get_logger(__name__)
 
+_TRUNCATED = "\n\n……（内容过长，已截断）"
+
+
 class AttachmentState(AgentState):
     """扩展 AgentState 以支持附件"""
 
     attachments: NotRequired[list[dict]]
+    attachments_digest: NotRequired[str]
+
+
+def attachments_digest(attachments: Sequence[dict] | None) -> str:
+    """附件列表的内容哈希"""
+    payload = json.dumps(list(attachments or []), sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
 
 
-def _build_attachment_prompt(attachments: Sequence[dict]) -> str | None:
+def _build_attachment_prompt(attachments: Sequence[dict], max_tokens: int | None = None) -> str | None:
     """Render attachments into a single system prompt block."""
     if not attachments:
         return None
 
+    instructions = (
+        "以下为用户提供的附件内容，请综合这些文件与用户的新问题进行回答。如附件与问题无关，可忽略附件内容：\n\n"
+    )
+    budget = max_tokens - estimate_tokens(instructions) if max_tokens else None
+
     chunks: list[str] = []
     for idx, attachment in enumerate(attachments, 1):
         if attachment.get("status") != "parsed":
@@ -44,17 +80,116 @@ def _build_attachment_prompt(attachments: Sequence[dict]) -> str | None:
         file_name = attachment.get("file_name") or f"附件 {idx}"
         truncated = "（已截断）" if attachment.get("truncated") else ""
         header = f"### 附件 {idx}: {file_name}{truncated}"
-        chunks.append(f"{header}\n\n{markdown}".strip())
+        chunk = f"{header}\n\n{markdown}".strip()
+
+        if budget is not None:
+            # 按附件顺序分配额度，前面的附件优先保留完整内容
+            if budget <= estimate_tokens(header) + estimate_tokens(_TRUNCATED):
+                break
+            if estimate_tokens(chunk) > budget:
+                chunk = truncate_tokens(chunk, budget - estimate_tokens(_TRUNCATED)) + _TRUNCATED
+            budget -= estimate_tokens(chunk) + 1
+
+        chunks.append(chunk)
 
     if not chunks:
         return None
 
-    instructions = (
-        "以下为用户提供的附件内容，请综合这些文件与用户的新问题进行回答。如附件与问题无关，可忽略附件内容：\n\n"
-    )
     return instructions + "\n\n".join(chunks)
 
 
+class AttachmentPromptCache:
+    """附件哈希 -> (渲染后的提示词, 估算 token 数) 的 LRU 缓存"""
+
+    def __init__(self, max_size: int | None = None):
+        self.max_size = max_size
+        self._items: OrderedDict[str, tuple[str | None, int]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_or_render(self, digest: str, attachments: Sequence[dict]) -> tuple[str | None, int]:
+        with self._lock:
+            if digest in self._items:
+                self._items.move_to_end(digest)
+                metrics_manager.inc("agent_attachment_prompt_cache_hits_total")
+                return self._items[digest]
+
+        metrics_manager.inc("agent_attachment_prompt_cache_misses_total")
+        prompt = _build_attachment_prompt(attachments, settings.agent.AGENT_ATTACHMENT_MAX_TOKENS)
+        item = (prompt, estimate_tokens(prompt) if prompt else 0)
+        with self._lock:
+            self._items[digest] = item
+            while len(self._items) > (self.max_size or settings.agent.AGENT_ATTACHMENT_CACHE_SIZE):
+                self._items.popitem(last=False)
+        return item
+
+    def clear(self) -> None:
+        with self._lock:
+            self._items.clear()
+
+
+attachment_prompt_cache = AttachmentPromptCache()
+
+
+def _build_attachment_catalog(attachments: Sequence[dict]) -> str | None:
+    """检索模式下的附件目录，线程内不变"""
+    lines = []
+    for idx, attachment in enumerate(attachments, 1):
+        if attachment.get("status") != "parsed" or not attachment.get("markdown"):
+            continue
+        markdown = attachment["markdown"]
+        file_name = attachment.get("file_name") or f"附件 {idx}"
+        lines.append(
+            f"- 附件 {idx}: {file_name}（{markdown.count(chr(10)) + 1} 行，约 {estimate_tokens(markdown)} tokens）"
+        )
+    if not lines:
+        return None
+    return (
+        "用户提供了以下附件。附件内容较长，每轮只提供与用户问题最相关的片段；"
+        "片段不足以回答时，请调用 read_attachment 工具按行读取附件原文：\n" + "\n".join(lines)
+    )
+
+
+def _build_excerpt_prompt(chunks: list[dict]) -> str | None:
+    if not chunks:
+        return None
+    parts = [
+        f"### 附件 {chunk['attachment']}: {chunk['file_name']}（第 {chunk['line'] + 1} 行起）\n\n{chunk['text']}"
+        for chunk in chunks
+    ]
+    return "以下为附件中与用户当前问题相关的片段：\n\n" + "\n\n".join(parts)
+
+
+def _latest_question(messages: Sequence[Any]) -> str:
+    for msg in reversed(messages):
+        if isinstance(msg, HumanMessage):
+            return msg.text if isinstance(msg.text, str) else msg.text()
+    return ""
+
+
+@tool
+def read_attachment(index: int, runtime: ToolRuntime, offset: int = 0, limit: int = 200) -> str:
+    """读取用户上传的附件原文
+
+    Args:
+        index: 附件序号（从 1 开始，见附件目录）
+        offset: 起始行号（从 0 开始）
+        limit: 最多读取的行数
+    """
+    attachments = runtime.state.get("attachments") or []
+    if not 1 <= index <= len(attachments) or not attachments[index - 1].get("markdown"):
+        return f"附件 {index} 不存在或没有可读取的内容，共 {len(attachments)} 个附件"
+
+    lines = attachments[index - 1]["markdown"].splitlines()
+    limit = max(1, min(limit, 1000))
+    selected = lines[offset:offset + limit]
+    if not selected:
+        return f"附件 {index} 共 {len(lines)} 行，offset={offset} 超出范围"
+    body = "\n".join(f"{offset + i + 1:6d}\t{line}" for i, line in enumerate(selected))
+    remaining = len(lines) - offset - len(selected)
+    suffix = f"\n\n（还有 {remaining} 行，继续读取请使用 offset={offset + len(selected)}）" if remaining > 0 else ""
+    return truncate_tokens(body, settings.agent.AGENT_ATTACHMENT_RETRIEVAL_TOKENS * 2) + suffix
+
+
 class AttachmentMiddleware(AgentMiddleware[AttachmentState]):
     """
     LangChain 标准中间件：从 State 中读取附件并注入到消息中。
@@ -62,12 +197,21 @@ class AttachmentMiddleware(AgentMiddleware[AttachmentState]):
     根据官方文档示例：
     https://docs.langchain.com/oss/python/langchain/middleware
 
-    从 request.state 中读取 attachments，将其转换为 SystemMessage 并注入到消息列表开头。
+    从 request.state 中读取 attachments，作为线程内稳定（SESSION）的提示词片段登记，
+    由 PromptAssemblyMiddleware 放在稳定的系统提示词之后，不影响所有请求共享的缓存前缀。
 
-    NOTE: 缺点是无法命中缓存了
+    NOTE: 需要同时使用 PromptAssemblyMiddleware，否则附件内容不会发送给模型
     """
 
     state_schema = AttachmentState
+    tools = [read_attachment]
+
+    async def abefore_agent(self, state: AttachmentState, runtime: Any) -> dict[str, Any] | None:
+        # 每次运行只计算一次附件哈希
+        digest = attachments_digest(state.get("attachments"))
+        if digest != state.get("attachments_digest"):
+            return {"attachments_digest": digest}
+        return None
 
     async def awrap_model_call(
         self, request: ModelRequest, handler: Callable[[ModelRequest], ModelResponse]
@@ -75,24 +219,49 @@ class AttachmentMiddleware(AgentMiddleware[AttachmentState]):
         # Read from State: get uploaded files metadata
         # logger.debug(f"inject_attachment_context: request.state = {request.state}")
         attachments = request.state.get("attachments", [])
+        retrieval = False
 
         if attachments:
-            # Build attachment context
-            attachment_prompt = _build_attachment_prompt(attachments)
-
-            if attachment_prompt:
-                logger.debug(f"Injecting {len(attachments)} attachments into model request")
+            digest = request.state.get("attachments_digest") or attachments_digest(attachments)
+            attachment_prompt, tokens = attachment_prompt_cache.get_or_render(digest, attachments)
+            mode = settings.agent.AGENT_ATTACHMENT_MODE
+            retrieval = mode == "retrieval" or (
+                mode == "auto" and tokens > settings.agent.AGENT_ATTACHMENT_RETRIEVAL_TOKENS
+            )
 
-                # Inject attachment context at the beginning (as SystemMessage)
-                # 注意：这是 transient update，不会修改 state，只影响本次模型调用
-                messages = [
-                    {"role": "system", "content": attachment_prompt},
-                    *request.messages,
-                ]
-                request = request.override(messages=messages)
+            # 注意：这是 transient update，不会修改 state，只影响本次模型调用
+            if retrieval:
+                request = self._inject_excerpts(request, digest, attachments)
+            elif attachment_prompt:
+                logger.debug(f"Injecting {len(attachments)} attachments (~{tokens} tokens) into model request")
+                metrics_manager.observe("agent_attachment_prompt_tokens", tokens, mode="full")
+                request = add_prompt_segment(request, attachment_prompt, SESSION)
 
+        if not retrieval:  # 附件已完整注入（或没有附件）时不需要读取工具
+            tools = [t for t in request.tools if getattr(t, "name", None) != read_attachment.name]
+            request = request.override(tools=tools)
         return await handler(request)
 
+    @staticmethod
+    def _inject_excerpts(request: ModelRequest, digest: str, attachments: Sequence[dict]) -> ModelRequest:
+        cfg = settings.agent
+        index = attachment_index_cache.get(digest, attachments)
+        chunks = index.search(
+            _latest_question(request.messages), cfg.AGENT_ATTACHMENT_TOP_K, cfg.AGENT_ATTACHMENT_RETRIEVAL_TOKENS
+        )
+        tokens = sum(chunk["tokens"] for chunk in chunks)
+        logger.debug(f"Injecting {len(chunks)}/{len(index.chunks)} attachment chunks (~{tokens} tokens)")
+        metrics_manager.observe("agent_attachment_prompt_tokens", tokens, mode="retrieval")
+
+        # 目录在线程内不变，片段随用户问题变化，分别放在可缓存前缀之后的不同位置
+        catalog = _build_attachment_catalog(attachments)
+        if catalog:
+            request = add_prompt_segment(request, catalog, SESSION)
+        excerpts = _build_excerpt_prompt(chunks)
+        if excerpts:
+            request = add_prompt_segment(request, excerpts, VOLATILE)
+        return request
+
 
 # 创建中间件实例，供其他模块使用
 inject_attachment_context = AttachmentMiddleware()
@@ -6,22 +6,32 @@ Description:
 FilePath: dynamic_tool_middleware
 """
 
+import asyncio
+from collections import OrderedDict
 from collections.abc import Callable
 from typing import Any
 
 from langchain.agents.middleware import AgentMiddleware, ModelRequest, ModelResponse
+from langgraph.prebuilt.tool_node import ToolCallRequest
 
-# from app.services.mcp_service import get_mcp_tools
+from app.agents.common.tool_schema import mcp_generation
 from app.core.logger import logger_manager
 
 logger = logger_manager.get_logger(__name__)
 
+# 筛选结果缓存的配置组合数上限
+_RESOLVED_CACHE_SIZE = 128
+
 
 class DynamicToolMiddleware(AgentMiddleware):
     """动态工具选择中间件 - 支持 MCP 工具的动态加载和注册
 
     注意：所有可能用到的 MCP 工具必须在初始化时预加载并注册到 self.tools
     运行时只是根据配置筛选工具，不能动态添加新工具
+
+    每次模型调用都会筛选工具，筛选结果按过滤掉未注册名称后的 (tools, mcps) 做 LRU 缓存；
+    MCP 工具重新加载（mcp_service 的 generation 变化）时，重新获取预加载服务器的工具、
+    替换 self.tools 中的旧工具并重建索引，工具调用也使用重新加载后的工具执行
     """
 
     def __init__(self, base_tools: list[Any], mcp_servers: list[str] | None = None):
@@ -35,45 +45,107 @@ class DynamicToolMiddleware(AgentMiddleware):
         self.tools: list[Any] = base_tools
         self._all_mcp_tools: dict[str, list[Any]] = {}  # 所有已加载的 MCP 工具
         self._mcp_servers = mcp_servers or []
+        self._tool_index: dict[str, tuple[int, Any]] = {}  # 工具名 -> (注册顺序, 工具)
+        self._indexed_count = -1
+        self._resolved: OrderedDict[tuple, list[Any]] = OrderedDict()
+        self._generation: int | None = None
+        self._reload_lock = asyncio.Lock()
 
-    async def initialize_mcp_tools(self) -> None:
-        """异步初始化：预加载所有可能用到的 MCP 工具"""
-        for mcp_name in self._mcp_servers:
-            if mcp_name not in self._all_mcp_tools:
-                logger.info(f"Pre-loading MCP tools from: {mcp_name}")
-                mcp_tools = await get_mcp_tools(mcp_name)
-                self._all_mcp_tools[mcp_name] = mcp_tools
-                # 将 MCP 工具注册到 middleware.tools
-                self.tools.extend(mcp_tools)
-                logger.info(f"Registered {len(mcp_tools)} tools from {mcp_name}")
+    async def initialize_mcp_tools(self, reload: bool = False) -> None:
+        """异步初始化：预加载所有可能用到的 MCP 工具
 
-    async def awrap_model_call(
-        self, request: ModelRequest, handler: Callable[[ModelRequest], ModelResponse]
-    ) -> ModelResponse:
-        """根据配置动态选择工具（从已注册的工具中筛选）"""
-        # 从 runtime context 获取配置
-        selected_tools = request.runtime.context.tools
-        selected_mcps = request.runtime.context.mcps
+        Args:
+            reload: 是否重新获取已预加载服务器的工具（MCP 工具重新加载后使用）
+        """
+        from app.services.mcp_service import get_mcp_tools
 
-        enabled_tools = []
+        for mcp_name in self._mcp_servers:
+            if mcp_name in self._all_mcp_tools and not reload:
+                continue
+            logger.info(f"Pre-loading MCP tools from: {mcp_name}")
+            mcp_tools = await get_mcp_tools(mcp_name)
+            # 将 MCP 工具注册到 middleware.tools，重新加载时替换该服务器的旧工具
+            stale = {id(tool) for tool in self._all_mcp_tools.get(mcp_name, [])}
+            self.tools[:] = [tool for tool in self.tools if id(tool) not in stale] + list(mcp_tools)
+            self._all_mcp_tools[mcp_name] = mcp_tools
+            logger.info(f"Registered {len(mcp_tools)} tools from {mcp_name}")
+        # 获取工具本身可能更新 generation，加载完成后再记录，并强制重建索引
+        self._generation = mcp_generation()
+        self._indexed_count = -1
+
+    async def _refresh_mcp_tools(self) -> None:
+        """MCP 工具重新加载后（generation 变化）重新获取预加载服务器的工具"""
+        if not self._all_mcp_tools or mcp_generation() == self._generation:
+            return
+        async with self._reload_lock:
+            if mcp_generation() != self._generation:
+                await self.initialize_mcp_tools(reload=True)
+
+    def _ensure_index(self) -> None:
+        """self.tools 有变化时重建工具名索引并清空筛选缓存"""
+        generation = mcp_generation()
+        if self._indexed_count == len(self.tools) and self._generation == generation:
+            return
+        self._tool_index = {}
+        for position, tool in enumerate(self.tools):
+            self._tool_index.setdefault(tool.name, (position, tool))
+        self._indexed_count = len(self.tools)
+        self._generation = generation
+        self._resolved.clear()
+
+    def resolve_tools(self, selected_tools: Any, selected_mcps: Any) -> list[Any]:
+        """根据配置筛选工具（从已注册的工具中筛选），相同配置返回缓存的结果"""
+        selected_tools = selected_tools if isinstance(selected_tools, list) else []
+        selected_mcps = selected_mcps if isinstance(selected_mcps, list) else []
+        self._ensure_index()
+
+        # 缓存 key 只包含已注册的名称，客户端传入的未知名称不会产生新的缓存项
+        key = (
+            tuple(sorted({name for name in selected_tools if name in self._tool_index})),
+            tuple(dict.fromkeys(mcp for mcp in selected_mcps if mcp in self._all_mcp_tools)),
+        )
+        if key in self._resolved:
+            self._resolved.move_to_end(key)
+            return self._resolved[key]
 
-        # 根据配置筛选基础工具
-        if selected_tools and isinstance(selected_tools, list) and len(selected_tools) > 0:
-            enabled_tools = [tool for tool in self.tools if tool.name in selected_tools]
+        # 根据配置筛选基础工具，保持注册顺序
+        found = sorted(self._tool_index[name] for name in key[0])
+        enabled_tools = [tool for _, tool in found]
 
         # 根据配置筛选 MCP 工具（从已注册的工具中选择）
-        if selected_mcps and isinstance(selected_mcps, list) and len(selected_mcps) > 0:
-            for mcp in selected_mcps:
-                if mcp in self._all_mcp_tools:
-                    enabled_tools.extend(self._all_mcp_tools[mcp])
-                else:
-                    logger.warning(f"MCP server '{mcp}' not pre-loaded. Please add it to mcp_servers list.")
-
-        logger.info(
+        for mcp in selected_mcps:
+            if mcp not in self._all_mcp_tools:
+                logger.warning(f"MCP server '{mcp}' not pre-loaded. Please add it to mcp_servers list.")
+        for mcp in key[1]:
+            enabled_tools.extend(self._all_mcp_tools[mcp])
+
+        logger.debug(
             f"Dynamic tool selection: {len(enabled_tools)} tools enabled: {[tool.name for tool in enabled_tools]}, "
             f"selected_tools: {selected_tools}, selected_mcps: {selected_mcps}"
         )
+        self._resolved[key] = enabled_tools
+        while len(self._resolved) > _RESOLVED_CACHE_SIZE:
+            self._resolved.popitem(last=False)
+        return enabled_tools
+
+    async def awrap_model_call(
+        self, request: ModelRequest, handler: Callable[[ModelRequest], ModelResponse]
+    ) -> ModelResponse:
+        """根据配置动态选择工具"""
+        await self._refresh_mcp_tools()
+        # 从 runtime context 获取配置
+        context = request.runtime.context
+        enabled_tools = self.resolve_tools(context.tools, context.mcps)
 
         # 更新 request 中的工具列表
-        request = request.override(tools=enabled_tools)
-        return await handler(request)
\ No newline at end of file
+        request = request.override(tools=list(enabled_tools))
+        return await handler(request)
+
+    async def awrap_tool_call(
+        self, request: ToolCallRequest, handler: Callable[[ToolCallRequest], Any]
+    ) -> Any:
+        """使用当前注册的工具执行（ToolNode 中仍是构建图时的工具对象）"""
+        entry = self._tool_index.get(request.tool_call["name"])
+        if entry is not None and entry[1] is not request.tool:
+            request = request.override(tool=entry[1])
+        return await handler(request)
@@ -0,0 +1,268 @@
+"""
+Author: xuyoushun
+Email: xuyoushun@bestpay.com.cn
+Date: 2026/2/3 10:40
+Description:
+
+流式提前执行工具调用
+
+默认情况下模型生成完整条 AIMessage 后 tools 节点才开始执行工具。开启 AGENT_TOOL_EAGER_DISPATCH 后，
+模型调用期间挂载一个回调，跟踪流式输出的 tool_call_chunks，某个工具调用的参数 JSON 完整后立即在后台执行，
+工具耗时与模型继续生成其余内容的时间重叠：
+- 只提前执行声明了 metadata={"eager": True}、没有注入参数（state、runtime、store 等）且不是 return_direct 的工具
+- 提前执行的调用通过 ParallelToolMiddleware.dispatch 启动，与同批次的调用共用并发名额，同样受超时约束
+- 模型调用结束后与最终的 AIMessage 核对，名称或参数不一致、模型调用失败时取消已启动的工具
+- tools 节点执行到对应的工具调用时直接取用后台结果，结果仍按 tool_calls 的顺序返回；
+  参数校验失败或后台任务被取消时回退为正常执行
+
+NOTE: 工具会在模型调用结束前开始执行，只应对没有副作用的工具开启
+
+FilePath: eager_tool_middleware
+"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import time
+from collections.abc import AsyncIterator, Callable, Iterator
+from typing import TYPE_CHECKING, Any
+from uuid import UUID
+
+from langchain.agents.middleware import AgentMiddleware, ModelRequest, ModelResponse, ToolCallRequest
+from langchain_core.callbacks import AsyncCallbackHandler, BaseCallbackManager
+from langchain_core.messages import AIMessage
+from langchain_core.runnables.config import ensure_config, var_child_runnable_config
+from langchain_core.tools import BaseTool
+from pydantic import ValidationError
+
+from app.core.config import settings
+from app.core.logger import logger_manager
+from app.core.metrics import metrics_manager
+
+if TYPE_CHECKING:
+    from app.agents.common.middlewares.parallel_tool_middleware import ParallelToolMiddleware
+
+logger = logger_manager.get_logger(__name__)
+
+# 未被 tools 节点取用的后台结果（如模型调用后被中断）保留的时间
+_STALE_SECONDS = 600
+
+# 参数校验失败，工具没有执行，由 tools 节点按正常流程返回错误信息
+_INVALID_ARGS = object()
+
+
+class _Dispatched:
+    """提前执行的工具调用"""
+
+    def __init__(self, call: dict, key: tuple, task: asyncio.Task):
+        self.call = call
+        self.key = key
+        self.task = task
+        self.started = time.monotonic()
+
+
+class _EagerDispatcher(AsyncCallbackHandler):
+    """拼接流式输出中的 tool_call_chunks，参数完整后立即启动工具
+
+    实现 tap_output_aiter / tap_output_iter 使模型在非流式调用（ainvoke）时同样走流式接口
+    """
+
+    def __init__(self, tools: dict[str, BaseTool], config: dict, parallel: ParallelToolMiddleware | None):
+        self.tools = tools
+        self.config = config
+        self.parallel = parallel
+        self.closed = False
+        self._buffers: dict[tuple[UUID, int], dict] = {}
+        self.dispatched: dict[str, _Dispatched] = {}
+
+    async def on_llm_new_token(self, token: str, *, chunk: Any = None, run_id: UUID, **kwargs: Any) -> None:
+        message = getattr(chunk, "message", None)
+        for tool_chunk in getattr(message, "tool_call_chunks", None) or []:
+            if tool_chunk.get("index") is None:  # 无法拼接，交给 tools 节点正常执行
+                continue
+            buffer = self._buffers.setdefault(
+                (run_id, tool_chunk["index"]), {"id": None, "name": "", "args": "", "done": False}
+            )
+            if tool_chunk.get("id"):
+                buffer["id"] = tool_chunk["id"]
+            buffer["name"] += tool_chunk.get("name") or ""
+            buffer["args"] += tool_chunk.get("args") or ""
+            self._dispatch(run_id, buffer)
+
+    def _batch_key(self, run_id: UUID) -> tuple:
+        """与 ParallelToolMiddleware 相同的批次：(thread_id, 本次输出中第一个工具调用的 id)"""
+        first = min(
+            (index for (rid, index), buffer in self._buffers.items() if rid == run_id and buffer["id"]), default=None
+        )
+        thread_id = (self.config.get("configurable") or {}).get("thread_id")
+        return thread_id, self._buffers[(run_id, first)]["id"]
+
+    def _dispatch(self, run_id: UUID, buffer: dict) -> None:
+        if self.closed or buffer["done"] or not buffer["id"] or buffer["name"] not in self.tools:
+            return
+        try:
+            args = json.loads(buffer["args"])
+        except ValueError:  # 参数还没有生成完
+            return
+        if not isinstance(args, dict):
+            return
+
+        buffer["done"] = True
+        call = {"name": buffer["name"], "args": args, "id": buffer["id"], "type": "tool_call"}
+        tool, key = self.tools[call["name"]], self._batch_key(run_id)
+
+        async def run() -> Any:
+            try:
+                return await tool.ainvoke(call, self.config)
+            except ValidationError:
+                return _INVALID_ARGS
+
+        if self.parallel is not None:
+            task = self.parallel.dispatch(key, call, tool, run)
+        else:
+            task = asyncio.create_task(run())
+        self.dispatched[call["id"]] = _Dispatched(call, key, task)
+        logger.debug(f"提前执行工具 {call['name']}（{call['id']}）")
+
+    def tap_output_aiter(self, run_id: UUID, output: AsyncIterator) -> AsyncIterator:
+        return output
+
+    def tap_output_iter(self, run_id: UUID, output: Iterator) -> Iterator:
+        return output
+
+
+def _has_injected_args(tool: BaseTool) -> bool:
+    """工具参数中有不由模型生成的注入参数（tool_call_schema 中没有的字段）"""
+    try:
+        return set(tool.get_input_schema().model_fields) != set(tool.tool_call_schema.model_fields)
+    except Exception:
+        return True
+
+
+class EagerToolDispatchMiddleware(AgentMiddleware):
+    """流式提前执行工具调用中间件
+
+    需要紧跟在 ParallelToolMiddleware 之后、ToolSchemaMiddleware 之前：
+    request.tools 在 ToolSchemaMiddleware 之内已被替换为 schema，这里需要读取工具对象的 metadata
+    """
+
+    def __init__(self, enabled: bool | None = None, parallel: ParallelToolMiddleware | None = None):
+        """初始化中间件
+
+        Args:
+            enabled: 是否开启，默认取 AGENT_TOOL_EAGER_DISPATCH
+            parallel: 同一个智能体的 ParallelToolMiddleware，提前执行的调用占用它的并发名额并受其超时约束
+        """
+        super().__init__()
+        self.enabled = enabled
+        self.parallel = parallel
+        self._eligible: dict[int, tuple[BaseTool, bool]] = {}
+        self._pending: dict[str, _Dispatched] = {}
+
+    def _is_eligible(self, tool: Any) -> bool:
+        if not isinstance(tool, BaseTool):
+            return False
+        item = self._eligible.get(id(tool))
+        if item is None or item[0] is not tool:
+            eligible = (
+                (tool.metadata or {}).get("eager") is True
+                and not tool.return_direct
+                and not _has_injected_args(tool)
+            )
+            item = self._eligible[id(tool)] = (tool, eligible)
+        return item[1]
+
+    def _discard(self, item: _Dispatched) -> None:
+        item.task.cancel()
+        if self.parallel is not None:
+            self.parallel.forget(item.call["id"])
+        metrics_manager.inc("agent_tool_eager_dispatch_total", tool=item.call["name"], result="discarded")
+
+    def _sweep(self) -> None:
+        """丢弃长时间未被 tools 节点取用的后台结果"""
+        now = time.monotonic()
+        for call_id, item in list(self._pending.items()):
+            if now - item.started > _STALE_SECONDS:
+                del self._pending[call_id]
+                self._discard(item)
+
+    async def awrap_model_call(
+        self, request: ModelRequest, handler: Callable[[ModelRequest], ModelResponse]
+    ) -> ModelResponse:
+        enabled = self.enabled if self.enabled is not None else settings.agent.AGENT_TOOL_EAGER_DISPATCH
+        tools = {tool.name: tool for tool in request.tools if self._is_eligible(tool)} if enabled else {}
+        if not tools:
+            return await handler(request)
+
+        self._sweep()
+        config = ensure_config()
+        tool_config = {key: value for key, value in config.items() if key not in ("run_id", "run_name")}
+        dispatcher = _EagerDispatcher(tools, tool_config, self.parallel)
+
+        # 回调只挂在本次模型调用上，不传给子运行
+        callbacks = config.get("callbacks")
+        if isinstance(callbacks, BaseCallbackManager):
+            callbacks = callbacks.copy()
+            callbacks.add_handler(dispatcher, inherit=False)
+        else:
+            callbacks = [*(callbacks or []), dispatcher]
+        token = var_child_runnable_config.set({**config, "callbacks": callbacks})
+        try:
+            response = await handler(request)
+        except BaseException:
+            dispatcher.closed = True
+            for item in dispatcher.dispatched.values():
+                self._discard(item)
+            raise
+        finally:
+            var_child_runnable_config.reset(token)
+        dispatcher.closed = True
+
+        # 与最终的 AIMessage 核对
+        messages = getattr(response, "result", None) or [response]
+        final_calls = {
+            call["id"]: call
+            for message in messages if isinstance(message, AIMessage)
+            for call in message.tool_calls
+        }
+        for call_id, item in dispatcher.dispatched.items():
+            final = final_calls.get(call_id)
+            if final is not None and final["name"] == item.call["name"] and final["args"] == item.call["args"]:
+                self._pending[call_id] = item
+            else:
+                self._discard(item)
+        return response
+
+    async def awrap_tool_call(
+        self, request: ToolCallRequest, handler: Callable[[ToolCallRequest], Any]
+    ) -> Any:
+        item = self._pending.pop(request.tool_call["id"], None)
+        if item is None:
+            return await handler(request)
+
+        call = item.call
+        if request.tool_call["name"] != call["name"] or request.tool_call["args"] != call["args"]:
+            # 工具调用在模型调用之后被修改（如人工审核）
+            self._discard(item)
+            return await self._fallback(item, request, handler)
+
+        metrics_manager.observe("agent_tool_eager_head_start_seconds", time.monotonic() - item.started, tool=call["name"])
+        try:
+            result = await item.task
+        except asyncio.CancelledError:
+            current = asyncio.current_task()
+            if current is not None and current.cancelling():
+                raise
+            result = _INVALID_ARGS  # 后台任务被取消（如同批次的其他调用失败）
+        if result is _INVALID_ARGS:
+            metrics_manager.inc("agent_tool_eager_dispatch_total", tool=call["name"], result="fallback")
+            return await self._fallback(item, request, handler)
+        metrics_manager.inc("agent_tool_eager_dispatch_total", tool=call["name"], result="used")
+        return result
+
+    async def _fallback(self, item: _Dispatched, request: ToolCallRequest, handler: Callable) -> Any:
+        """正常执行工具调用，ParallelToolMiddleware 已跳过该调用，这里重新占用名额"""
+        if self.parallel is None:
+            return await handler(request)
+        return await self.parallel.execute(item.key, request.tool_call, request.tool, lambda: handler(request))
@@ -0,0 +1,152 @@
+"""
+Author: xuyoushun
+Email: xuyoushun@bestpay.com.cn
+Date: 2026/1/28 15:50
+Description:
+FilePath: llm_cache_middleware
+"""
+
+import json
+import uuid
+from collections.abc import AsyncIterator, Callable
+from typing import Any
+
+from langchain.agents.middleware import AgentMiddleware, ModelRequest, ModelResponse
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage, ToolMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+from app.agents.common.llm_cache import llm_response_cache, model_temperature, request_cache_key
+from app.core.config import settings
+from app.core.metrics import metrics_manager
+
+# 回放缓存结果时每个 chunk 的字符数
+_REPLAY_CHUNK_CHARS = 16
+
+
+class _CachedReplayModel(BaseChatModel):
+    """把缓存的 AIMessage 按 chunk 重新输出
+
+    通过 ainvoke 调用时继承当前运行的回调，stream_mode="messages" 的调用方与真实模型调用一样逐段收到内容；
+    工具调用使用 tool_call_ids 中的新 id，同一线程中重复的问题不会在历史中产生重复的 tool_call_id。
+    不包含 usage_metadata：命中缓存没有消耗 token
+    """
+
+    message: AIMessage
+    tool_call_ids: dict[str, str] = {}
+
+    @property
+    def _llm_type(self) -> str:
+        return "llm-cache-replay"
+
+    def _chunks(self) -> list[AIMessageChunk]:
+        message = self.message
+        response_metadata = {**message.response_metadata, "cache": "hit"}
+        content = message.content
+        if isinstance(content, str):
+            pieces = [content[i:i + _REPLAY_CHUNK_CHARS] for i in range(0, len(content), _REPLAY_CHUNK_CHARS)]
+        else:
+            pieces = [content]
+        chunks = [AIMessageChunk(content=piece) for piece in pieces]
+        chunks.append(AIMessageChunk(
+            content="",
+            additional_kwargs=message.additional_kwargs,
+            response_metadata=response_metadata,
+            tool_call_chunks=[
+                {
+                    "name": call["name"],
+                    "args": json.dumps(call["args"], ensure_ascii=False),
+                    "id": self.tool_call_ids.get(call["id"], call["id"]),
+                    "index": index,
+                    "type": "tool_call_chunk",
+                }
+                for index, call in enumerate(message.tool_calls)
+            ],
+        ))
+        return chunks
+
+    def _combined(self) -> AIMessage:
+        chunks = self._chunks()
+        combined = chunks[0]
+        for chunk in chunks[1:]:
+            combined += chunk
+        return AIMessage(**combined.model_dump(exclude={"type", "tool_call_chunks"}))
+
+    def _generate(self, messages: list[BaseMessage], stop=None, run_manager=None, **kwargs: Any) -> ChatResult:
+        return ChatResult(generations=[ChatGeneration(message=self._combined())])
+
+    async def _agenerate(self, messages: list[BaseMessage], stop=None, run_manager=None, **kwargs: Any) -> ChatResult:
+        return self._generate(messages)
+
+    async def _astream(
+        self, messages: list[BaseMessage], stop=None, run_manager=None, **kwargs: Any
+    ) -> AsyncIterator[ChatGenerationChunk]:
+        for chunk in self._chunks():
+            yield ChatGenerationChunk(message=chunk)
+
+
+class LLMCacheMiddleware(AgentMiddleware):
+    """模型调用结果缓存中间件 - 相同请求直接返回缓存的结果（由 LLM_CACHE_ENABLED 开启）
+
+    命中时按 chunk 回放缓存的 AIMessage（response_metadata 中 cache="hit"），
+    stream_mode="messages" 的调用方与未命中时一样逐段收到内容；回放不经过内层中间件，不占用模型并发名额。
+    """
+
+    def __init__(self, agent: str = "default", force: bool = False):
+        """初始化中间件
+
+        Args:
+            agent: 指标中的智能体名称
+            force: 温度不为 0 时也缓存
+        """
+        super().__init__()
+        self.agent = agent
+        self.force = force
+
+    def _cacheable(self, request: ModelRequest) -> bool:
+        if not settings.llm.LLM_CACHE_ENABLED:
+            return False
+        if self.force:
+            return True
+        return model_temperature(request.model, getattr(request, "model_settings", None)) == 0
+
+    async def awrap_model_call(
+        self, request: ModelRequest, handler: Callable[[ModelRequest], ModelResponse]
+    ) -> ModelResponse:
+        if not self._cacheable(request):
+            metrics_manager.inc("llm_cache_bypass_total", agent=self.agent)
+            return await handler(request)
+
+        key = request_cache_key(
+            request.model,
+            request.messages,
+            system_prompt=request.system_prompt,
+            tools=request.tools,
+            tool_choice=request.tool_choice,
+            response_format=request.response_format,
+            model_settings=getattr(request, "model_settings", None),
+        )
+        cached = await llm_response_cache.get(key)
+        if cached is not None:
+            metrics_manager.inc("llm_cache_hits_total", agent=self.agent)
+            # 回放生成新的消息 id 和工具调用 id，避免同一线程中重复的问题覆盖或重复之前的回答
+            tool_call_ids = {
+                call["id"]: f"call_{uuid.uuid4().hex[:24]}"
+                for msg in cached["result"] if isinstance(msg, AIMessage)
+                for call in msg.tool_calls
+            }
+            result = []
+            for msg in cached["result"]:
+                if isinstance(msg, AIMessage):
+                    msg = await _CachedReplayModel(message=msg, tool_call_ids=tool_call_ids).ainvoke(request.messages)
+                elif isinstance(msg, ToolMessage):  # 结构化输出的工具消息
+                    msg = msg.model_copy(update={"id": None, "tool_call_id": tool_call_ids.get(msg.tool_call_id, msg.tool_call_id)})
+                result.append(msg)
+            return ModelResponse(result=result, structured_response=cached["structured_response"])
+
+        metrics_manager.inc("llm_cache_misses_total", agent=self.agent)
+        response = await handler(request)
+        await llm_response_cache.set(
+            key, {"result": response.result, "structured_response": response.structured_response}
+        )
+        return response
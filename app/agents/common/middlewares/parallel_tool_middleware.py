@@ -0,0 +1,173 @@
+"""
+Author: xuyoushun
+Email: xuyoushun@bestpay.com.cn
+Date: 2026/2/2 15:20
+Description:
+FilePath: parallel_tool_middleware
+"""
+
+from __future__ import annotations
+
+import asyncio
+import time
+from collections.abc import Awaitable, Callable
+from typing import Any
+
+from langchain.agents.middleware import AgentMiddleware, ToolCallRequest
+from langchain_core.messages import AIMessage, ToolMessage
+from langgraph.errors import GraphBubbleUp
+
+from app.core.config import settings
+from app.core.logger import logger_manager
+from app.core.metrics import metrics_manager
+
+logger = logger_manager.get_logger(__name__)
+
+
+class _ToolBatch:
+    """同一条 AIMessage 发起的一组工具调用"""
+
+    def __init__(self, max_concurrency: int):
+        self.semaphore = asyncio.Semaphore(max_concurrency)
+        self.tasks: set[asyncio.Task] = set()
+        self.failed: str | None = None
+
+
+def _batch_key(request: ToolCallRequest) -> tuple:
+    """(thread_id, 第一个工具调用的 id)，提前执行时模型还没有生成完整的 AIMessage，因此不使用消息 id"""
+    config = getattr(request.runtime, "config", None) or {}
+    thread_id = (config.get("configurable") or {}).get("thread_id")
+    messages = request.state.get("messages", []) if isinstance(request.state, dict) else []
+    last = messages[-1] if messages else None
+    if isinstance(last, AIMessage) and last.tool_calls:
+        return thread_id, last.tool_calls[0].get("id")
+    return thread_id, request.tool_call.get("id")
+
+
+class ParallelToolMiddleware(AgentMiddleware):
+    """并行工具调用中间件 - 并发上限、单个工具的超时、致命错误时取消同批次的其他调用，并记录每个工具的耗时
+
+    create_agent 对同一条 AIMessage 中的多个工具调用已经并发执行（每个调用一个任务），
+    这里在此基础上限制同一批次的并发数（嵌套的子智能体各自计算，不会互相占用名额而死锁）：
+    - 超时：tool.metadata["timeout"] > 构造参数 timeouts[工具名] > AGENT_TOOL_TIMEOUT，0 或 None 表示不限制；
+      超时返回 status="error" 的 ToolMessage，由模型决定是否重试
+    - 工具抛出未被 ToolNode 处理的异常时视为致命错误，同批次仍在执行或排队的调用被取消
+    - 耗时写入指标 agent_tool_duration_seconds 和 ToolMessage.response_metadata["duration_ms"]
+    - EagerToolDispatchMiddleware 通过 dispatch 提前执行的调用同样占用名额、受超时约束，
+      tools 节点处理这些调用时不再重复占用名额
+    """
+
+    def __init__(
+            self,
+            max_concurrency: int | None = None,
+            default_timeout: float | None = None,
+            timeouts: dict[str, float | None] | None = None,
+    ):
+        """初始化中间件
+
+        Args:
+            max_concurrency: 同一批次最多同时执行的工具数，默认取 AGENT_TOOL_MAX_CONCURRENCY
+            default_timeout: 默认超时（秒），默认取 AGENT_TOOL_TIMEOUT
+            timeouts: 按工具名覆盖默认超时，如 {"task": None} 不限制子智能体
+        """
+        super().__init__()
+        self.max_concurrency = max_concurrency
+        self.default_timeout = default_timeout
+        self.timeouts = timeouts or {}
+        self._batches: dict[tuple, _ToolBatch] = {}
+        self._dispatched: set[str] = set()
+
+    def _timeout(self, name: str, tool: Any) -> float | None:
+        metadata = getattr(tool, "metadata", None) or {}
+        if "timeout" in metadata:
+            timeout = metadata["timeout"]
+        elif name in self.timeouts:
+            timeout = self.timeouts[name]
+        elif self.default_timeout is not None:
+            timeout = self.default_timeout
+        else:
+            timeout = settings.agent.AGENT_TOOL_TIMEOUT
+        return timeout or None
+
+    def _error_message(self, call: dict, content: str) -> ToolMessage:
+        return ToolMessage(content=content, tool_call_id=call["id"], name=call["name"], status="error")
+
+    def dispatch(self, key: tuple, call: dict, tool: Any, run: Callable[[], Awaitable[Any]]) -> asyncio.Task:
+        """在 tools 节点之前执行工具调用（EagerToolDispatchMiddleware），与同批次的调用共用并发名额和超时设置
+
+        Args:
+            key: 批次，(thread_id, 第一个工具调用的 id)
+            call: 工具调用
+            tool: 工具，用于读取超时设置
+            run: 执行工具的协程函数
+        """
+        self._dispatched.add(call["id"])
+        return asyncio.create_task(self.execute(key, call, tool, run))
+
+    def forget(self, call_id: str) -> None:
+        """提前执行的调用被丢弃，tools 节点需要重新占用名额执行"""
+        self._dispatched.discard(call_id)
+
+    async def awrap_tool_call(
+        self, request: ToolCallRequest, handler: Callable[[ToolCallRequest], Any]
+    ) -> Any:
+        call_id = request.tool_call["id"]
+        if call_id in self._dispatched:  # 已在名额和超时约束下提前执行，内层中间件直接取用结果
+            self._dispatched.discard(call_id)
+            return await handler(request)
+        return await self.execute(_batch_key(request), request.tool_call, request.tool, lambda: handler(request))
+
+    async def execute(self, key: tuple, call: dict, tool: Any, run: Callable[[], Awaitable[Any]]) -> Any:
+        """占用批次 key 的并发名额，在超时限制内执行 run"""
+        batch = self._batches.get(key)
+        if batch is None:
+            batch = self._batches[key] = _ToolBatch(self.max_concurrency or settings.agent.AGENT_TOOL_MAX_CONCURRENCY)
+        task = asyncio.current_task()
+        batch.tasks.add(task)
+
+        name = call["name"]
+        start = time.perf_counter()
+        status = "success"
+        result = None
+        try:
+            async with batch.semaphore:
+                if batch.failed:  # 排队期间同批次已有致命错误
+                    status = "cancelled"
+                    return self._error_message(call, f"工具 {batch.failed} 执行失败，本次调用已取消")
+
+                timeout = self._timeout(name, tool)
+                deadline = asyncio.timeout(timeout)
+                try:
+                    async with deadline:
+                        result = await run()
+                except TimeoutError:
+                    if not deadline.expired():
+                        raise
+                    status = "timeout"
+                    logger.warning(f"工具 {name} 执行超时（{timeout}s）")
+                    return self._error_message(call, f"工具 {name} 执行超时（{timeout}s），请调整参数后重试或换用其他方式")
+
+                if isinstance(result, ToolMessage) and result.status == "error":
+                    status = "error"
+                return result
+        except (GraphBubbleUp, asyncio.CancelledError):  # 中断（human-in-the-loop）和取消直接向上传递
+            status = "cancelled" if status == "success" else status
+            raise
+        except Exception:
+            status = "error"
+            batch.failed = name
+            siblings = [other for other in batch.tasks if other is not task and not other.done()]
+            if siblings:
+                logger.warning(f"工具 {name} 执行失败，取消同批次的 {len(siblings)} 个工具调用")
+            for other in siblings:
+                other.cancel()
+            raise
+        finally:
+            batch.tasks.discard(task)
+            if not batch.tasks:
+                self._batches.pop(key, None)
+            elapsed = time.perf_counter() - start
+            metrics_manager.observe("agent_tool_duration_seconds", elapsed, tool=name, status=status)
+            if isinstance(result, ToolMessage):
+                result.response_metadata["duration_ms"] = round(elapsed * 1000)
+            logger.debug(f"工具 {name} 耗时 {elapsed:.3f}s ({status})")
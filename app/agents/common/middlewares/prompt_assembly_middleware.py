@@ -0,0 +1,75 @@
+"""
+Author: xuyoushun
+Email: xuyoushun@bestpay.com.cn
+Date: 2026/1/30 14:50
+Description:
+FilePath: prompt_assembly_middleware
+"""
+
+import hashlib
+from collections import OrderedDict
+from collections.abc import Callable
+
+from langchain.agents.middleware import AgentMiddleware, ModelRequest, ModelResponse
+from langchain_core.messages import SystemMessage
+from langgraph.config import get_config
+
+from app.agents.common.prompt import PROMPT_SEGMENTS_KEY, STABLE, assemble_prompt, system_segments
+from app.core.logger import logger_manager
+from app.core.metrics import metrics_manager
+
+logger = logger_manager.get_logger(__name__)
+
+# 记录稳定前缀哈希的线程数上限
+_TRACKED_THREADS = 1024
+
+
+def _thread_id() -> str | None:
+    try:
+        return (get_config().get("configurable") or {}).get("thread_id")
+    except RuntimeError:  # 不在 graph 运行中
+        return None
+
+
+class PromptAssemblyMiddleware(AgentMiddleware):
+    """系统提示词组装中间件 - 去重并按 稳定 -> 线程内稳定 -> 易变 排列提示词片段，提高服务商前缀缓存命中率
+
+    需要放在修改系统提示词的中间件之后（更内层）、LLMCacheMiddleware 之前，详见 app.agents.common.prompt
+    """
+
+    def __init__(self, agent: str = "default"):
+        """初始化中间件
+
+        Args:
+            agent: 指标中的智能体名称
+        """
+        super().__init__()
+        self.agent = agent
+        # 按线程记录上一次的稳定前缀，同一线程内前缀变化时服务商缓存失效
+        self._last_prefix: OrderedDict[str, str] = OrderedDict()
+
+    async def awrap_model_call(
+        self, request: ModelRequest, handler: Callable[[ModelRequest], ModelResponse]
+    ) -> ModelResponse:
+        content = request.system_message.content if request.system_message is not None else None
+        segments = [(STABLE, text) for text in system_segments(content)]
+        extra = request.state.get(PROMPT_SEGMENTS_KEY) or []
+        prompt, prefix_len = assemble_prompt([*segments, *extra])
+
+        # 同一线程内稳定前缀变化说明有中间件在提示词中写入了易变内容，服务商缓存会失效
+        thread_id = _thread_id()
+        if thread_id is not None:
+            prefix_hash = hashlib.sha256(prompt[:prefix_len].encode("utf-8")).hexdigest()
+            last = self._last_prefix.pop(thread_id, None)
+            if last is not None and last != prefix_hash:
+                metrics_manager.inc("llm_prompt_prefix_changes_total", agent=self.agent)
+            self._last_prefix[thread_id] = prefix_hash
+            while len(self._last_prefix) > _TRACKED_THREADS:
+                self._last_prefix.popitem(last=False)
+        metrics_manager.observe("llm_prompt_cacheable_prefix_chars", prefix_len, agent=self.agent)
+        metrics_manager.observe("llm_prompt_system_chars", len(prompt), agent=self.agent)
+        logger.debug(f"{self.agent} 系统提示词 {len(prompt)} 字符，可缓存前缀 {prefix_len} 字符")
+
+        if extra:
+            request = request.override(state={k: v for k, v in request.state.items() if k != PROMPT_SEGMENTS_KEY})
+        return await handler(request.override(system_message=SystemMessage(content=prompt) if prompt else None))
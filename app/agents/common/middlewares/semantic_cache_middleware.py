@@ -0,0 +1,89 @@
+"""
+Author: xuyoushun
+Email: xuyoushun@bestpay.com.cn
+Date: 2026/1/29 11:20
+Description:
+FilePath: semantic_cache_middleware
+"""
+
+from collections.abc import Callable
+from pathlib import Path
+from typing import Any
+
+from langchain.agents.middleware import AgentMiddleware, ModelRequest, ModelResponse
+from langchain_core.messages import AIMessage
+
+from app.agents.common.semantic_cache import SemanticCache, semantic_cache_manager
+from app.core.config import settings
+from app.core.logger import logger_manager
+from app.core.metrics import metrics_manager
+
+logger = logger_manager.get_logger(__name__)
+
+
+def _tool_name(tool: Any) -> str:
+    if isinstance(tool, dict):  # 已转换为 provider schema 的工具
+        return tool.get("name") or (tool.get("function") or {}).get("name", "")
+    return getattr(tool, "name", "")
+
+
+def _partition(request: ModelRequest) -> str:
+    """按系统提示词、模型、工具和知识库划分缓存，配置不同的请求互不复用回答"""
+    model = request.model
+    context = getattr(request.runtime, "context", None)
+    return SemanticCache.partition_key(
+        request.system_prompt,
+        model=getattr(model, "model_name", None) or getattr(model, "model", None) or type(model).__name__,
+        tools=[_tool_name(tool) for tool in request.tools],
+        knowledges=getattr(context, "knowledges", None) or (),
+    )
+
+
+class SemanticCacheMiddleware(AgentMiddleware):
+    """语义缓存中间件 - 与之前问题足够相似的新问题直接返回之前的最终回答
+
+    由 SEMANTIC_CACHE_ENABLED 开启，且需要配置 SEMANTIC_CACHE_EMBEDDING。
+    只处理线程中的第一个问题：后续问题往往依赖上下文（"那 X 呢？"），相似不代表答案相同
+    """
+
+    def __init__(self, agent: str, persist_dir: str | Path | None = None):
+        """初始化中间件
+
+        Args:
+            agent: 智能体名称，缓存按智能体分开
+            persist_dir: 缓存持久化目录（可选）
+        """
+        super().__init__()
+        self.agent = agent
+        self.persist_dir = persist_dir
+        if settings.llm.SEMANTIC_CACHE_ENABLED and not settings.llm.SEMANTIC_CACHE_EMBEDDING:
+            logger.warning("已开启 SEMANTIC_CACHE_ENABLED 但未配置 SEMANTIC_CACHE_EMBEDDING，语义缓存不生效")
+
+    async def awrap_model_call(
+        self, request: ModelRequest, handler: Callable[[ModelRequest], ModelResponse]
+    ) -> ModelResponse:
+        humans = [msg for msg in request.messages if msg.type == "human"]
+        cfg = settings.llm
+        if not (cfg.SEMANTIC_CACHE_ENABLED and cfg.SEMANTIC_CACHE_EMBEDDING) or len(humans) != 1:
+            return await handler(request)
+
+        cache = semantic_cache_manager.get(self.agent, self.persist_dir)
+        question = humans[0].text
+        partition = _partition(request)
+
+        # 问题刚提出（还没有工具调用）时查询缓存
+        if request.messages[-1] is humans[0]:
+            found = await cache.lookup(partition, question)
+            if found is not None:
+                answer, score = found
+                metrics_manager.inc("semantic_cache_hits_total", agent=self.agent)
+                return ModelResponse(
+                    result=[AIMessage(content=answer, response_metadata={"cache": "semantic_hit", "similarity": score})]
+                )
+            metrics_manager.inc("semantic_cache_misses_total", agent=self.agent)
+
+        response = await handler(request)
+        final = response.result[-1] if response.result else None
+        if isinstance(final, AIMessage) and not final.tool_calls and final.text:
+            await cache.store(partition, question, final.text)
+        return response
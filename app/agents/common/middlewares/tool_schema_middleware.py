@@ -0,0 +1,28 @@
+"""
+Author: xuyoushun
+Email: xuyoushun@bestpay.com.cn
+Date: 2026/2/2 10:40
+Description:
+FilePath: tool_schema_middleware
+"""
+
+from collections.abc import Callable
+
+from langchain.agents.middleware import AgentMiddleware, ModelRequest, ModelResponse
+
+from app.agents.common.tool_schema import tool_schema_cache
+
+
+class ToolSchemaMiddleware(AgentMiddleware):
+    """工具 schema 缓存中间件 - 把 request.tools 替换为缓存的 OpenAI 格式 schema，bind_tools 时不再重新生成
+
+    需要放在按名称筛选工具的中间件（DynamicToolMiddleware、AttachmentMiddleware 等）之后（更内层）。
+    工具调用仍由 ToolNode 按名称执行，不受影响。
+    """
+
+    async def awrap_model_call(
+        self, request: ModelRequest, handler: Callable[[ModelRequest], ModelResponse]
+    ) -> ModelResponse:
+        if request.tools:
+            request = request.override(tools=tool_schema_cache.convert(request.tools))
+        return await handler(request)
@@ -3,22 +3,183 @@ Author: xuyoushun
 Email: xuyoushun@bestpay.com.cn
 Date: 2026/1/13 17:32
 Description:
+
+聊天模型加载
+
+load_chat_model 通过 ChatModelRegistry 复用模型实例：
+- 相同的 (provider, model, base_url, api_key, kwargs) 返回同一个实例（LRU，按 LLM_MODEL_CACHE_SIZE 限制数量）
+- OpenAI 兼容的 provider 按 base_url 共享 httpx 连接池，复用 keep-alive / TLS 连接，安装了 h2 时启用 HTTP/2
+- load_failover_chat_model 把多个等价端点包装为 FailoverChatModel（故障转移 + 对冲请求），同样按配置复用
+- load_configured_chat_model 按名称加载 LLM_MODELS 中配置的模型（智能体的 context.model），
+  配置了多个 base_urls 时走 load_failover_chat_model；未配置的名称使用 OPENAI_* 配置
+
 FilePath: model
 """
 
+import hashlib
+import importlib.util
+import json
+import threading
 import traceback
-from typing import Literal,TypeAlias
+from collections import OrderedDict
+from typing import Any, Literal, TypeAlias
 
+import httpx
 from langchain.chat_models import BaseChatModel
 from pydantic import SecretStr
 
+from app.core.config import settings
 from app.core.logger import logger_manager
+from app.core.metrics import metrics_manager
 
 logger = logger_manager.get_logger(__name__)
 
 
 ProviderType: TypeAlias = Literal["openai", "genai", "dashscope", "deepseek", "zhipuai"]
 
+# 使用 OpenAI SDK 的 provider，可以注入共享的 httpx 客户端
+_HTTPX_PROVIDERS = ("openai", "dashscope", "deepseek")
+
+
+def _model_key(provider: str, model: str, base_url: str, api_key: str, kwargs: dict) -> str:
+    payload = json.dumps(
+        {
+            "provider": provider,
+            "model": model,
+            "base_url": base_url,
+            "api_key": hashlib.sha256((api_key or "").encode("utf-8")).hexdigest(),
+            "kwargs": kwargs,
+        },
+        sort_keys=True,
+        default=repr,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def _pool_connections(client: httpx.Client | httpx.AsyncClient) -> dict[str, int]:
+    """读取 httpcore 连接池状态（内部属性，读取失败时返回空）"""
+    try:
+        connections = client._transport._pool.connections
+    except AttributeError:
+        return {}
+    return {
+        "connections": len(connections),
+        "idle": sum(1 for conn in connections if conn.is_idle()),
+    }
+
+
+class ChatModelRegistry:
+    """聊天模型实例和 HTTP 连接池的进程内注册表"""
+
+    def __init__(self):
+        self._models: OrderedDict[str, BaseChatModel] = OrderedDict()
+        self._clients: dict[str, tuple[httpx.Client, httpx.AsyncClient]] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def http2(self) -> bool:
+        return settings.llm.LLM_HTTP2 and importlib.util.find_spec("h2") is not None
+
+    def _http_clients(self, base_url: str | None) -> tuple[httpx.Client, httpx.AsyncClient]:
+        key = base_url or ""
+        if key not in self._clients:
+            cfg = settings.llm
+            limits = httpx.Limits(
+                max_connections=cfg.LLM_HTTP_MAX_CONNECTIONS,
+                max_keepalive_connections=cfg.LLM_HTTP_MAX_KEEPALIVE_CONNECTIONS,
+                keepalive_expiry=cfg.LLM_HTTP_KEEPALIVE_EXPIRY,
+            )
+            timeout = httpx.Timeout(cfg.LLM_HTTP_TIMEOUT, connect=cfg.LLM_HTTP_CONNECT_TIMEOUT)
+            self._clients[key] = (
+                httpx.Client(limits=limits, timeout=timeout, http2=self.http2),
+                httpx.AsyncClient(limits=limits, timeout=timeout, http2=self.http2),
+            )
+            logger.info(f"创建 LLM HTTP 连接池: {key or 'default'} (http2={self.http2})")
+        return self._clients[key]
+
+    def get(self, provider: ProviderType, model: str, base_url: str, api_key: str, **kwargs) -> BaseChatModel:
+        key = _model_key(provider, model, base_url, api_key, kwargs)
+        with self._lock:
+            if key in self._models:
+                self._models.move_to_end(key)
+                metrics_manager.inc("llm_model_registry_hits_total", provider=provider)
+                return self._models[key]
+
+            metrics_manager.inc("llm_model_registry_misses_total", provider=provider)
+            if provider in _HTTPX_PROVIDERS and "http_client" not in kwargs and "http_async_client" not in kwargs:
+                http_client, http_async_client = self._http_clients(base_url)
+                kwargs = {**kwargs, "http_client": http_client, "http_async_client": http_async_client}
+
+            chat_model = _create_chat_model(provider, model, base_url, api_key, **kwargs)
+            self._put(key, chat_model)
+            return chat_model
+
+    def get_failover(self, endpoints: list[dict], hedge: bool | None = None) -> BaseChatModel:
+        """多个等价端点组成的 FailoverChatModel，端点统计随实例保留"""
+        from app.agents.common.failover import FailoverChatModel
+
+        cfg = settings.llm
+        hedge = cfg.LLM_HEDGE_ENABLED if hedge is None else hedge
+        endpoint_keys = [
+            _model_key(e["provider"], e["model"], e.get("base_url"), e.get("api_key"),
+                       {k: v for k, v in e.items() if k not in ("provider", "model", "base_url", "api_key")})
+            for e in endpoints
+        ]
+        key = _model_key("failover", "", "", "", {"endpoints": endpoint_keys, "hedge": hedge})
+        with self._lock:
+            if key in self._models:
+                self._models.move_to_end(key)
+                return self._models[key]
+
+        chat_model = FailoverChatModel(
+            models=[self.get(**endpoint) for endpoint in endpoints],
+            hedge=hedge,
+            hedge_delay=cfg.LLM_HEDGE_DELAY,
+            min_hedge_delay=cfg.LLM_HEDGE_MIN_DELAY,
+            failure_threshold=cfg.LLM_ENDPOINT_FAILURE_THRESHOLD,
+            failure_cooldown=cfg.LLM_ENDPOINT_FAILURE_COOLDOWN,
+        )
+        with self._lock:
+            self._put(key, chat_model)
+        return chat_model
+
+    def _put(self, key: str, chat_model: BaseChatModel) -> None:
+        self._models[key] = chat_model
+        while len(self._models) > settings.llm.LLM_MODEL_CACHE_SIZE:
+            self._models.popitem(last=False)
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            return {
+                "models": len(self._models),
+                "http2": self.http2,
+                "failover": {
+                    key[:8]: chat_model.endpoint_stats()
+                    for key, chat_model in self._models.items()
+                    if hasattr(chat_model, "endpoint_stats")
+                },
+                "pools": {
+                    base_url or "default": {
+                        "sync": _pool_connections(client),
+                        "async": _pool_connections(async_client),
+                    }
+                    for base_url, (client, async_client) in self._clients.items()
+                },
+            }
+
+    async def aclose(self) -> None:
+        """关闭所有共享的 HTTP 连接池"""
+        with self._lock:
+            clients, self._clients = self._clients, {}
+            self._models.clear()
+        for client, async_client in clients.values():
+            client.close()
+            await async_client.aclose()
+
+
+model_registry = ChatModelRegistry()
+
+
 def load_chat_model(
         provider: ProviderType,
         model: str,
@@ -27,8 +188,52 @@ def load_chat_model(
         **kwargs,
 ) -> BaseChatModel:
     """
+    加载聊天模型，相同配置复用同一个实例及其 HTTP 连接池
+    """
+    return model_registry.get(provider, model, base_url, api_key, **kwargs)
+
+
+def load_failover_chat_model(endpoints: list[dict], hedge: bool | None = None) -> BaseChatModel:
+    """
+    加载由多个等价端点组成的聊天模型，按健康状况和延迟路由，可选对冲请求
+
+    Args:
+        endpoints: 端点列表，每项为 load_chat_model 的参数，如 {"provider", "model", "base_url", "api_key"}
+        hedge: 是否对冲，默认取 LLM_HEDGE_ENABLED
+    """
+    if len(endpoints) == 1:
+        return load_chat_model(**endpoints[0])
+    return model_registry.get_failover(endpoints, hedge)
+
 
+def load_configured_chat_model(name: str | None = None) -> BaseChatModel:
     """
+    按名称加载模型，例如智能体上下文中的 context.model
+
+    LLM_MODELS 的配置项形如 {"provider", "model", "api_key", "base_urls": [...], "hedge"}，
+    base_urls 为同一模型的多个等价端点（也可以只写 base_url），其余字段作为模型参数；
+    未配置的名称按 OpenAI 兼容模型加载，使用 OPENAI_API_BASE / OPENAI_API_KEY，名称为空时使用 OPENAI_API_MODEL
+    """
+    cfg = settings.llm
+    entry = cfg.LLM_MODELS.get(name) if name else None
+    if entry is None:
+        return load_chat_model("openai", name or cfg.OPENAI_API_MODEL, cfg.OPENAI_API_BASE, cfg.OPENAI_API_KEY)
+
+    entry = dict(entry)
+    base_urls = entry.pop("base_urls", None) or [entry.pop("base_url", None)]
+    entry.pop("base_url", None)
+    hedge = entry.pop("hedge", None)
+    entry.setdefault("model", name)
+    return load_failover_chat_model([{**entry, "base_url": base_url} for base_url in base_urls], hedge)
+
+
+def _create_chat_model(
+        provider: ProviderType,
+        model: str,
+        base_url: str,
+        api_key: str,
+        **kwargs,
+) -> BaseChatModel:
     if provider in ["dashscope", "deepseek"]:
         from langchain_deepseek import ChatDeepSeek
 
@@ -76,4 +281,4 @@ def load_chat_model(
         except Exception as e:
             raise ValueError(
                 f"Model provider {provider} load failed, {e} \n {traceback.format_exc()}"
-            )
\ No newline at end of file
+            )
@@ -0,0 +1,111 @@
+"""
+Author: xuyoushun
+Email: xuyoushun@bestpay.com.cn
+Date: 2026/1/30 14:20
+Description:
+
+系统提示词组装
+
+模型服务商的 prompt cache / KV cache 只能复用请求中完全相同的前缀，因此系统提示词按稳定程度排列：
+- STABLE：智能体的角色提示词和各中间件追加的工具说明，对同一个智能体的所有请求都相同
+- SESSION：同一线程内基本不变的内容，如附件
+- VOLATILE：每次调用都可能变化的内容
+
+中间件通过 add_prompt_segment 登记 SESSION / VOLATILE 片段（只影响本次模型调用），
+由最内层的 PromptAssemblyMiddleware 统一去重、排序后写入系统消息，并上报可缓存前缀的长度。
+
+FilePath: prompt
+"""
+
+from __future__ import annotations
+
+from collections.abc import Iterable
+from typing import Any
+
+from langchain.agents.middleware import ModelRequest
+
+STABLE, SESSION, VOLATILE = 0, 1, 2
+
+# 本次模型调用登记的提示词片段，保存在 request.state 的副本中，不会写回 State
+PROMPT_SEGMENTS_KEY = "_prompt_segments"
+
+_SEPARATOR = "\n\n"
+
+
+def _normalize(text: str) -> str:
+    return " ".join(text.split())
+
+
+def dedupe_segments(texts: Iterable[str]) -> list[str]:
+    """去掉空片段，以及与之前片段相同或已被之前片段包含的片段，保持原有顺序"""
+    kept: list[str] = []
+    normalized: list[str] = []
+    for text in texts:
+        text = (text or "").strip()
+        norm = _normalize(text)
+        if not norm or any(norm in prev for prev in normalized):
+            continue
+        kept.append(text)
+        normalized.append(norm)
+    return kept
+
+
+def join_prompt(*texts: str) -> str:
+    """拼接多段提示词，重复的片段只保留一份"""
+    return _SEPARATOR.join(dedupe_segments(texts))
+
+
+def system_segments(content: Any) -> list[str]:
+    """把系统消息的内容拆分为文本片段（中间件追加的每个 text block 为一段）"""
+    if content is None:
+        return []
+    if isinstance(content, str):
+        return [content]
+    return [
+        block if isinstance(block, str) else block.get("text", "")
+        for block in content
+        if isinstance(block, str) or (isinstance(block, dict) and block.get("type") == "text")
+    ]
+
+
+def add_prompt_segment(request: ModelRequest, text: str, stability: int = SESSION) -> ModelRequest:
+    """为本次模型调用登记一段提示词，由 PromptAssemblyMiddleware 放到系统提示词中对应的位置"""
+    segments = [*(request.state.get(PROMPT_SEGMENTS_KEY) or []), (stability, text)]
+    return request.override(state={**request.state, PROMPT_SEGMENTS_KEY: segments})
+
+
+def assemble_prompt(segments: Iterable[tuple[int, str]]) -> tuple[str, int]:
+    """
+    按 STABLE -> SESSION -> VOLATILE 的顺序拼接去重后的片段
+
+    Returns:
+        (系统提示词, 所有请求共享的稳定前缀长度（字符数）)
+    """
+    # 先按稳定程度排序再去重，重复片段保留在更靠前（更稳定）的位置
+    ordered = sorted(segments, key=lambda item: item[0])
+    texts = dedupe_segments(text for _, text in ordered)
+    stable = dedupe_segments(text for stability, text in ordered if stability == STABLE)
+
+    # 稳定片段排在最前面，前缀长度即稳定部分的长度
+    return _SEPARATOR.join(texts), len(_SEPARATOR.join(stable))
+
+
+def estimate_tokens(text: str) -> int:
+    """估算 token 数：ASCII 字符约 4 个一个 token，中文等其他字符约 1 个一个 token"""
+    ascii_chars = len(text.encode("ascii", "ignore"))
+    return len(text) - ascii_chars + (ascii_chars + 3) // 4
+
+
+def truncate_tokens(text: str, max_tokens: int) -> str:
+    """截断到估算 token 数不超过 max_tokens 的最长前缀，尽量在换行处断开"""
+    if estimate_tokens(text) <= max_tokens:
+        return text
+    low, high = 0, len(text)
+    while low < high:  # 二分查找满足限制的最长前缀
+        mid = (low + high + 1) // 2
+        if estimate_tokens(text[:mid]) <= max_tokens:
+            low = mid
+        else:
+            high = mid - 1
+    cut = text.rfind("\n", 0, low)
+    return text[: cut if cut > low // 2 else low].rstrip()
@@ -0,0 +1,208 @@
+"""
+Author: xuyoushun
+Email: xuyoushun@bestpay.com.cn
+Date: 2026/1/28 10:10
+Description:
+
+LLM 调用的准入控制与自适应并发
+
+每个 (模型类, 模型名) 一个 AdaptiveLimiter：
+- 并发上限按 AIMD 调整：调用成功且耗时低于 LLM_TARGET_LATENCY 时每轮 +1，
+  遇到 429 时减半，耗时超标时乘以 0.9；冷却时间内只降一次，避免一批 429 把上限打到最低
+- 超过上限的调用进入有界优先级队列，交互式请求（interactive）优先于后台任务（background）；
+  队列已满或等待超时直接拒绝（AdmissionRejected），而不是让所有请求同时重试
+- 排队耗时、在途数量、当前上限、拒绝次数记录在 metrics_manager 中
+
+运行优先级通过 run_priority（ContextVar）传递，BaseAgent 在每次运行开始时设置。
+
+FilePath: scheduler
+"""
+
+from __future__ import annotations
+
+import asyncio
+import heapq
+import itertools
+import time
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from typing import Any, Literal, TypeAlias
+
+from app.core.config import settings
+from app.core.logger import logger_manager
+from app.core.metrics import metrics_manager
+
+logger = logger_manager.get_logger(__name__)
+
+Priority: TypeAlias = Literal["interactive", "background"]
+
+_PRIORITY_ORDER = {"interactive": 0, "background": 1}
+
+run_priority: ContextVar[Priority] = ContextVar("run_priority", default="interactive")
+
+
+class AdmissionRejected(Exception):
+    """LLM 调用队列已满或排队超时"""
+
+
+def is_rate_limited(error: BaseException) -> bool:
+    """判断异常是否为 provider 返回的 429"""
+    status = getattr(error, "status_code", None)
+    if status is None:
+        status = getattr(getattr(error, "response", None), "status_code", None)
+    return status == 429 or "RateLimit" in type(error).__name__
+
+
+def model_key(model: Any) -> str:
+    """模型的限流 key：模型类 + 模型名"""
+    name = getattr(model, "model_name", None) or getattr(model, "model", None) or ""
+    return f"{type(model).__name__}:{name}"
+
+
+class AdaptiveLimiter:
+    """AIMD 并发限制器 + 有界优先级等待队列"""
+
+    def __init__(
+            self,
+            key: str,
+            initial: int = 8,
+            min_limit: int = 1,
+            max_limit: int = 64,
+            target_latency: float = 60.0,
+            max_queue: int = 256,
+            queue_timeout: float = 120.0,
+            cooldown: float = 1.0,
+    ):
+        self.key = key
+        self.min_limit = max(1, min_limit)
+        self.max_limit = max(self.min_limit, max_limit)
+        self.limit = float(min(max(initial, self.min_limit), self.max_limit))
+        self.target_latency = target_latency
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.cooldown = cooldown
+        self.in_flight = 0
+        self._waiters: list[tuple[int, int, asyncio.Future]] = []
+        self._seq = itertools.count()
+        self._last_decrease = 0.0
+
+    @property
+    def queued(self) -> int:
+        return sum(1 for _, _, fut in self._waiters if not fut.done())
+
+    def _gauges(self) -> None:
+        metrics_manager.set("llm_in_flight", self.in_flight, model=self.key)
+        metrics_manager.set("llm_concurrency_limit", int(self.limit), model=self.key)
+        metrics_manager.set("llm_queue_depth", self.queued, model=self.key)
+
+    async def acquire(self, priority: Priority = "interactive") -> None:
+        if not self.queued and self.in_flight < int(self.limit):
+            self.in_flight += 1
+            metrics_manager.observe("llm_queue_wait_seconds", 0.0, model=self.key, priority=priority)
+            self._gauges()
+            return
+
+        if self.queued >= self.max_queue:
+            metrics_manager.inc("llm_admission_rejected_total", model=self.key, reason="queue_full")
+            raise AdmissionRejected(f"LLM queue for {self.key} is full ({self.max_queue})")
+
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (_PRIORITY_ORDER.get(priority, 1), next(self._seq), future))
+        self._gauges()
+        start = time.perf_counter()
+        try:
+            await asyncio.wait_for(future, timeout=self.queue_timeout)
+        except asyncio.TimeoutError:
+            metrics_manager.inc("llm_admission_rejected_total", model=self.key, reason="timeout")
+            raise AdmissionRejected(f"Waited more than {self.queue_timeout}s for {self.key}") from None
+        except asyncio.CancelledError:
+            # 在被唤醒的同时取消：名额已经分配，需要归还
+            if future.done() and not future.cancelled():
+                self.release()
+            raise
+        finally:
+            metrics_manager.observe(
+                "llm_queue_wait_seconds", time.perf_counter() - start, model=self.key, priority=priority
+            )
+            self._gauges()
+
+    def release(self) -> None:
+        self.in_flight -= 1
+        self._wake()
+        self._gauges()
+
+    def _wake(self) -> None:
+        while self._waiters and self.in_flight < int(self.limit):
+            _, _, future = heapq.heappop(self._waiters)
+            if future.done():  # 已超时或取消
+                continue
+            self.in_flight += 1
+            future.set_result(None)
+
+    def on_success(self, latency: float) -> None:
+        if latency > self.target_latency:
+            self._decrease(0.9, "latency")
+        elif self.limit < self.max_limit:
+            self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+            self._wake()
+
+    def on_rate_limited(self) -> None:
+        metrics_manager.inc("llm_rate_limited_total", model=self.key)
+        self._decrease(0.5, "429")
+
+    def _decrease(self, factor: float, reason: str) -> None:
+        now = time.monotonic()
+        if now - self._last_decrease < self.cooldown:
+            return
+        self._last_decrease = now
+        limit = max(float(self.min_limit), self.limit * factor)
+        if int(limit) != int(self.limit):
+            logger.warning(f"{self.key} 并发上限 {int(self.limit)} -> {int(limit)} ({reason})")
+        self.limit = limit
+
+    def stats(self) -> dict:
+        return {"limit": int(self.limit), "in_flight": self.in_flight, "queued": self.queued}
+
+
+class ModelScheduler:
+    """按模型维护 AdaptiveLimiter"""
+
+    def __init__(self):
+        self._limiters: dict[str, AdaptiveLimiter] = {}
+
+    def get_limiter(self, key: str) -> AdaptiveLimiter:
+        if key not in self._limiters:
+            cfg = settings.llm
+            self._limiters[key] = AdaptiveLimiter(
+                key,
+                initial=cfg.LLM_CONCURRENCY_INITIAL,
+                min_limit=cfg.LLM_CONCURRENCY_MIN,
+                max_limit=cfg.LLM_CONCURRENCY_MAX,
+                target_latency=cfg.LLM_TARGET_LATENCY,
+                max_queue=cfg.LLM_QUEUE_MAX_SIZE,
+                queue_timeout=cfg.LLM_QUEUE_TIMEOUT,
+            )
+        return self._limiters[key]
+
+    @asynccontextmanager
+    async def slot(self, key: str, priority: Priority | None = None):
+        """占用一个并发名额，根据调用结果调整上限"""
+        limiter = self.get_limiter(key)
+        await limiter.acquire(priority or run_priority.get())
+        start = time.perf_counter()
+        try:
+            yield
+        except Exception as e:
+            if is_rate_limited(e):
+                limiter.on_rate_limited()
+            raise
+        else:
+            limiter.on_success(time.perf_counter() - start)
+        finally:
+            limiter.release()
+
+    def stats(self) -> dict[str, dict]:
+        return {key: limiter.stats() for key, limiter in self._limiters.items()}
+
+
+model_scheduler = ModelScheduler()
@@ -0,0 +1,250 @@
+"""
+Author: xuyoushun
+Email: xuyoushun@bestpay.com.cn
+Date: 2026/1/29 10:30
+Description:
+
+语义缓存：相似问题直接返回之前的回答
+
+- 对用户问题做 embedding，在进程内的 NumPy 索引中做余弦相似度检索，超过阈值即命中
+- 索引按智能体以及 (系统提示词, 模型, 工具, 知识库) 的哈希分区，配置不同的回答互不复用
+- 每个分区最多 SEMANTIC_CACHE_MAX_ENTRIES 条，超出时淘汰最久未命中的条目；超过 TTL 的条目不再返回
+- 每写入 SEMANTIC_CACHE_PERSIST_EVERY 条（在线程中执行）以及应用关闭时保存到智能体工作目录，启动后按需加载
+- 需要通过 SEMANTIC_CACHE_EMBEDDING 配置真实的 embedding 模型（init_embeddings 的 id，
+  例如 "openai:text-embedding-3-small"），未配置时不启用缓存
+
+FilePath: semantic_cache
+"""
+
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any
+
+import numpy as np
+
+from app.core.config import settings
+from app.core.logger import logger_manager
+
+logger = logger_manager.get_logger(__name__)
+
+
+def load_embedder(name: str | None = None) -> Any:
+    name = name or settings.llm.SEMANTIC_CACHE_EMBEDDING
+    if not name:
+        raise ValueError("语义缓存需要配置 SEMANTIC_CACHE_EMBEDDING")
+    from langchain.embeddings import init_embeddings
+
+    return init_embeddings(name)
+
+
+def _normalize(vec: Any) -> np.ndarray:
+    vec = np.asarray(vec, dtype=np.float32)
+    norm = float(np.linalg.norm(vec))
+    return vec / norm if norm else vec
+
+
+class SemanticIndex:
+    """单个分区的向量索引，向量已归一化，点积即余弦相似度"""
+
+    def __init__(self, dim: int | None = None):
+        self.vectors = np.zeros((0, dim or 0), dtype=np.float32)
+        self.created = np.zeros(0, dtype=np.float64)
+        self.used = np.zeros(0, dtype=np.float64)
+        self.questions: list[str] = []
+        self.answers: list[str] = []
+
+    def __len__(self) -> int:
+        return len(self.answers)
+
+    def search(self, vec: np.ndarray, ttl: float, now: float) -> tuple[int, float] | None:
+        if not len(self) or self.vectors.shape[1] != vec.shape[0]:
+            return None
+        scores = self.vectors @ vec
+        scores[now - self.created > ttl] = -np.inf
+        idx = int(np.argmax(scores))
+        if not np.isfinite(scores[idx]):
+            return None
+        return idx, float(scores[idx])
+
+    def add(self, vec: np.ndarray, question: str, answer: str, now: float, max_entries: int, ttl: float) -> None:
+        if self.vectors.shape[1] != vec.shape[0]:  # embedding 模型变化，旧索引作废
+            self._remove(np.arange(len(self)))
+            self.vectors = np.zeros((0, vec.shape[0]), dtype=np.float32)
+        self._remove(np.flatnonzero(now - self.created > ttl))
+        if len(self) >= max_entries:
+            self._remove(np.argsort(self.used)[: len(self) - max_entries + 1])
+
+        self.vectors = np.vstack([self.vectors, vec[None, :]])
+        self.created = np.append(self.created, now)
+        self.used = np.append(self.used, now)
+        self.questions.append(question)
+        self.answers.append(answer)
+
+    def _remove(self, indices: np.ndarray) -> None:
+        if not len(indices):
+            return
+        keep = np.ones(len(self), dtype=bool)
+        keep[indices] = False
+        self.vectors, self.created, self.used = self.vectors[keep], self.created[keep], self.used[keep]
+        self.questions = [q for q, k in zip(self.questions, keep) if k]
+        self.answers = [a for a, k in zip(self.answers, keep) if k]
+
+    def snapshot(self) -> SemanticIndex:
+        """复制一份用于保存，保存期间索引可以继续读写"""
+        index = SemanticIndex()
+        index.vectors, index.created, index.used = self.vectors, self.created, self.used.copy()
+        index.questions, index.answers = list(self.questions), list(self.answers)
+        return index
+
+    def save(self, path: Path) -> None:
+        meta = json.dumps({"questions": self.questions, "answers": self.answers}, ensure_ascii=False)
+        tmp = path.with_suffix(".tmp.npz")
+        np.savez_compressed(tmp, vectors=self.vectors, created=self.created, used=self.used, meta=np.array(meta))
+        tmp.replace(path)
+
+    @classmethod
+    def load(cls, path: Path) -> SemanticIndex:
+        index = cls()
+        with np.load(path, allow_pickle=False) as data:
+            index.vectors = data["vectors"]
+            index.created = data["created"]
+            index.used = data["used"]
+            meta = json.loads(str(data["meta"]))
+        index.questions, index.answers = meta["questions"], meta["answers"]
+        return index
+
+
+class SemanticCache:
+    """一个智能体的语义缓存"""
+
+    def __init__(
+            self,
+            name: str,
+            embedder: Any = None,
+            threshold: float | None = None,
+            max_entries: int | None = None,
+            ttl: float | None = None,
+            persist_dir: str | Path | None = None,
+            persist_every: int | None = None,
+    ):
+        cfg = settings.llm
+        self.name = name
+        self.embedder = embedder or load_embedder()
+        self.threshold = threshold if threshold is not None else cfg.SEMANTIC_CACHE_THRESHOLD
+        self.max_entries = max_entries or cfg.SEMANTIC_CACHE_MAX_ENTRIES
+        self.ttl = ttl or cfg.SEMANTIC_CACHE_TTL
+        self.persist_dir = Path(persist_dir) if persist_dir else None
+        self.persist_every = persist_every or cfg.SEMANTIC_CACHE_PERSIST_EVERY
+
+        self._partitions: dict[str, SemanticIndex] = {}
+        self._dirty: set[str] = set()
+        self._writes = 0
+        self._embeddings: OrderedDict[str, np.ndarray] = OrderedDict()
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+
+    @staticmethod
+    def partition_key(
+            system_prompt: str | None,
+            model: str | None = None,
+            tools: list[str] | tuple[str, ...] = (),
+            knowledges: list[str] | tuple[str, ...] = (),
+    ) -> str:
+        """影响回答的配置的哈希：系统提示词、模型、工具和知识库"""
+        payload = json.dumps(
+            [system_prompt or "", model or "", sorted(tools), sorted(knowledges)], ensure_ascii=False
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:16]
+
+    def _partition(self, key: str) -> SemanticIndex:
+        if key not in self._partitions:
+            path = self.persist_dir / f"{key}.npz" if self.persist_dir else None
+            if path and path.exists():
+                try:
+                    self._partitions[key] = SemanticIndex.load(path)
+                except Exception as e:
+                    logger.warning(f"加载语义缓存 {path} 失败: {e}")
+            self._partitions.setdefault(key, SemanticIndex())
+        return self._partitions[key]
+
+    async def _embed(self, text: str) -> np.ndarray:
+        """问题的 embedding，同一个问题查询和写入时只计算一次"""
+        if text in self._embeddings:
+            self._embeddings.move_to_end(text)
+            return self._embeddings[text]
+        if hasattr(self.embedder, "aembed_query"):
+            vec = await self.embedder.aembed_query(text)
+        else:
+            vec = self.embedder.embed_query(text)
+        vec = _normalize(vec)
+        self._embeddings[text] = vec
+        while len(self._embeddings) > 256:
+            self._embeddings.popitem(last=False)
+        return vec
+
+    async def lookup(self, partition: str, question: str) -> tuple[str, float] | None:
+        """在 partition（partition_key 的结果）中查询，返回 (回答, 相似度)，未命中返回 None"""
+        vec = await self._embed(question)
+        now = time.time()
+        with self._lock:
+            index = self._partition(partition)
+            found = index.search(vec, self.ttl, now)
+            if found is None or found[1] < self.threshold:
+                return None
+            idx, score = found
+            index.used[idx] = now
+            return index.answers[idx], score
+
+    async def store(self, partition: str, question: str, answer: str) -> None:
+        vec = await self._embed(question)
+        with self._lock:
+            self._partition(partition).add(vec, question, answer, time.time(), self.max_entries, self.ttl)
+            self._dirty.add(partition)
+            self._writes += 1
+            persist = self._writes % self.persist_every == 0
+        if persist:
+            # 压缩写盘较慢，不在事件循环中执行
+            await asyncio.to_thread(self.flush)
+
+    def flush(self) -> None:
+        """把有变化的分区写入磁盘，只在复制分区时持有索引锁"""
+        if self.persist_dir is None:
+            return
+        with self._flush_lock:
+            with self._lock:
+                dirty, self._dirty = self._dirty, set()
+                snapshots = {key: self._partitions[key].snapshot() for key in dirty}
+            self.persist_dir.mkdir(parents=True, exist_ok=True)
+            for key, index in snapshots.items():
+                try:
+                    index.save(self.persist_dir / f"{key}.npz")
+                except Exception as e:
+                    logger.warning(f"保存语义缓存 {self.name}/{key} 失败: {e}")
+                    with self._lock:
+                        self._dirty.add(key)
+
+
+class SemanticCacheManager:
+    """按智能体管理语义缓存"""
+
+    def __init__(self):
+        self._caches: dict[str, SemanticCache] = {}
+
+    def get(self, name: str, persist_dir: str | Path | None = None) -> SemanticCache:
+        if name not in self._caches:
+            self._caches[name] = SemanticCache(name, persist_dir=persist_dir)
+        return self._caches[name]
+
+    def flush_all(self) -> None:
+        for cache in self._caches.values():
+            cache.flush()
+
+
+semantic_cache_manager = SemanticCacheManager()
@@ -5,6 +5,6 @@ Date: 2026/1/15 18:30
 Description:
 FilePath: __init__.py
 """
-from .calculator import calc_agent, calc_agent_tool
+from .calculator import calc_agent_tool, get_calc_agent
 
-__all__ = ["calc_agent", "calc_agent_tool"]
\ No newline at end of file
+__all__ = ["get_calc_agent", "calc_agent_tool"]
\ No newline at end of file
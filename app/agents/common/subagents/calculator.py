@@ -9,30 +9,38 @@ from langchain.agents import create_agent
 from langchain.tools import tool
 
 # from src import config
-from app.agents.common import load_chat_model
+from app.agents.common import load_configured_chat_model
+from app.agents.common.middlewares.admission_control_middleware import AdmissionControlMiddleware
+from app.agents.common.middlewares.llm_cache_middleware import LLMCacheMiddleware
+from app.agents.common.middlewares.tool_schema_middleware import ToolSchemaMiddleware
 from app.agents.common.tools import calculator
 from app.core.config import settings
 
+_calculator_agent = None
 
 
-
-calculator_agent = create_agent(
-    model=load_chat_model(
-        provider="openai",
-        model=settings.llm.OPENAI_API_MODEL,
-        base_url=settings.llm.OPENAI_API_BASE,
-        api_key=settings.llm.OPENAI_API_KEY,
-
-    ),
-    tools=[calculator],
-    system_prompt="你可以使用计算器工具，处理各种数学计算任务。最终仅返回计算结果，不需要任何额外的解释。",
-)
+def get_calc_agent():
+    """第一次调用时才创建计算子智能体，避免导入模块时就初始化模型"""
+    global _calculator_agent
+    if _calculator_agent is None:
+        _calculator_agent = create_agent(
+            model=load_configured_chat_model(settings.llm.OPENAI_API_MODEL),
+            tools=[calculator],
+            # 计算结果与温度无关，强制缓存
+            middleware=[
+                ToolSchemaMiddleware(),
+                LLMCacheMiddleware(agent="calc_agent", force=True),
+                AdmissionControlMiddleware(),
+            ],
+            system_prompt="你可以使用计算器工具，处理各种数学计算任务。最终仅返回计算结果，不需要任何额外的解释。",
+        )
+    return _calculator_agent
 
 
 @tool(name_or_callable="calc_agent_tool", description="进行计算任务，输入是数学表达式或描述，输出计算结果。")
-async def calculator_agent_tool(description: str) -> str:
+async def calc_agent_tool(description: str) -> str:
     """
     CalcAgent 工具 - 使用子智能体 CalcAgent 进行计算任务
     """
-    response = await calculator_agent.ainvoke({"messages": [("user", description)]})
-    return response["messages"][-1].content
\ No newline at end of file
+    response = await get_calc_agent().ainvoke({"messages": [("user", description)]})
+    return response["messages"][-1].content
@@ -0,0 +1,97 @@
+"""
+Author: xuyoushun
+Email: xuyoushun@bestpay.com.cn
+Date: 2026/2/2 10:10
+Description:
+
+工具 schema 缓存
+
+create_agent 每次模型调用都会执行 model.bind_tools，把所有工具重新转换为 OpenAI 格式的 JSON schema
+（包括 pydantic 的 model_json_schema 生成）。工具对象在运行之间不会变化，因此转换结果按工具对象缓存：
+- key 为工具对象的 id，同时记录 (name, description, args_schema) 作为版本，工具被修改或 id 被复用时重新转换
+- 进程内 LRU（AGENT_TOOL_SCHEMA_CACHE_SIZE），所有智能体和运行共享
+- mcp_service 的 generation 变化（MCP 工具重新加载）时清空
+
+OpenAI 格式的 dict 会被各 provider 的 bind_tools 原样使用或直接转换为自己的格式，不再重新生成 schema。
+
+FilePath: tool_schema
+"""
+
+from __future__ import annotations
+
+import sys
+import threading
+import weakref
+from collections import OrderedDict
+from typing import Any
+
+from langchain_core.utils.function_calling import convert_to_openai_tool
+
+from app.core.config import settings
+from app.core.metrics import metrics_manager
+
+
+def mcp_generation() -> int:
+    """mcp_service 的 MCP 工具 generation；mcp_service 未加载时不会有 MCP 工具，返回 0（也避免循环引用）"""
+    module = sys.modules.get("app.services.mcp_service")
+    return module.get_mcp_generation() if module is not None else 0
+
+
+def _tool_version(tool: Any) -> tuple:
+    return (
+        getattr(tool, "name", None),
+        getattr(tool, "description", None),
+        id(getattr(tool, "args_schema", None)),
+    )
+
+
+class ToolSchemaCache:
+    """工具对象 -> OpenAI 格式 tool schema 的 LRU 缓存"""
+
+    def __init__(self, max_size: int | None = None):
+        self.max_size = max_size
+        self._items: OrderedDict[int, tuple[Any, tuple, dict]] = OrderedDict()
+        self._generation: int | None = None
+        self._lock = threading.Lock()
+
+    def _check_generation(self) -> None:
+        generation = mcp_generation()
+        if generation != self._generation:
+            self._items.clear()
+            self._generation = generation
+
+    def get(self, tool: Any) -> dict:
+        """返回工具的 OpenAI 格式 schema，dict 形式的工具（如 provider 内置工具）原样返回"""
+        if isinstance(tool, dict):
+            return tool
+
+        key, version = id(tool), _tool_version(tool)
+        with self._lock:
+            self._check_generation()
+            item = self._items.get(key)
+            if item is not None and item[0]() is tool and item[1] == version:
+                self._items.move_to_end(key)
+                metrics_manager.inc("agent_tool_schema_cache_hits_total")
+                return item[2]
+
+        metrics_manager.inc("agent_tool_schema_cache_misses_total")
+        schema = convert_to_openai_tool(tool)
+        try:
+            ref = weakref.ref(tool)
+        except TypeError:  # 不支持弱引用的对象不缓存
+            return schema
+        with self._lock:
+            self._items[key] = (ref, version, schema)
+            while len(self._items) > (self.max_size or settings.agent.AGENT_TOOL_SCHEMA_CACHE_SIZE):
+                self._items.popitem(last=False)
+        return schema
+
+    def convert(self, tools: list[Any]) -> list[dict]:
+        return [self.get(tool) for tool in tools]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._items.clear()
+
+
+tool_schema_cache = ToolSchemaCache()
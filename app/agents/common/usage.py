@@ -0,0 +1,158 @@
+"""
+Author: xuyoushun
+Email: xuyoushun@bestpay.com.cn
+Date: 2026/1/30 10:20
+Description:
+
+模型调用用量统计
+
+- UsageCallbackHandler 挂在每次运行的 RunnableConfig 上（子智能体、摘要等内部模型调用同样会触发），
+  在 on_llm_end 中读取 usage_metadata（stream_usage=True 时流式输出的最后一个 chunk 带有用量）
+- 用量按 (日期, 用户, 智能体, 模型) 累加到 Redis hash 中，所有 hash 的 key 记录在 {prefix}:keys 集合里
+- usage_flush_task 定期调用 drain_usage 读取计数写入 MySQL，成功后 ack_usage 再从 Redis 中减去已写入的部分，
+  期间新增的计数不会丢失（写库成功但减计数失败时会在下次重复计入）
+
+FilePath: usage
+"""
+
+from __future__ import annotations
+
+import time
+from datetime import date, datetime
+from typing import Any
+from uuid import UUID
+
+from langchain_core.callbacks import AsyncCallbackHandler
+from langchain_core.outputs import LLMResult
+
+from app.core.config import settings
+from app.core.logger import logger_manager
+from app.core.metrics import metrics_manager
+from app.core.redis import redis_manager
+
+logger = logger_manager.get_logger(__name__)
+
+COUNTERS = ("calls", "prompt_tokens", "completion_tokens", "cached_tokens", "latency_ms")
+DIMENSIONS = ("usage_date", "user_id", "agent_id", "model")
+
+
+def _index_key() -> str:
+    return f"{settings.llm.LLM_USAGE_REDIS_PREFIX}:keys"
+
+
+def usage_key(day: str, user_id: str, agent_id: str, model: str) -> str:
+    return f"{settings.llm.LLM_USAGE_REDIS_PREFIX}:{day}:{user_id}:{agent_id}:{model}"
+
+
+def extract_usage(response: LLMResult) -> list[tuple[str, dict]]:
+    """从模型输出中提取 (模型名, 用量)"""
+    llm_output = response.llm_output or {}
+    usages = []
+    for generations in response.generations:
+        for generation in generations:
+            msg = getattr(generation, "message", None)
+            usage = getattr(msg, "usage_metadata", None)
+            if not usage:
+                continue
+            model = (
+                msg.response_metadata.get("model_name")
+                or llm_output.get("model_name")
+                or llm_output.get("model")
+                or "unknown"
+            )
+            usages.append((model, {
+                "prompt_tokens": usage.get("input_tokens", 0),
+                "completion_tokens": usage.get("output_tokens", 0),
+                "cached_tokens": (usage.get("input_token_details") or {}).get("cache_read", 0),
+            }))
+    return usages
+
+
+async def record_usage(user_id: str, agent_id: str, model: str, usage: dict, latency: float) -> None:
+    """把一次模型调用的用量累加到 Redis"""
+    day = date.today().isoformat()
+    key = usage_key(day, user_id, agent_id, model)
+    try:
+        client = await redis_manager.get_async_client()
+        async with client.pipeline(transaction=False) as pipe:
+            pipe.hincrby(key, "calls", 1)
+            for field in ("prompt_tokens", "completion_tokens", "cached_tokens"):
+                if usage.get(field):
+                    pipe.hincrby(key, field, int(usage[field]))
+            pipe.hincrby(key, "latency_ms", int(latency * 1000))
+            pipe.hset(key, mapping={
+                "usage_date": day,
+                "user_id": user_id,
+                "agent_id": agent_id,
+                "model": model,
+            })
+            pipe.expire(key, settings.llm.LLM_USAGE_KEY_TTL_DAYS * 86400)
+            pipe.sadd(_index_key(), key)
+            await pipe.execute()
+    except Exception as e:
+        logger.warning(f"记录模型用量失败: {e}")
+
+
+class UsageCallbackHandler(AsyncCallbackHandler):
+    """统计一次运行中所有模型调用的用量和耗时"""
+
+    def __init__(self, user_id: str | None, agent_id: str):
+        self.user_id = str(user_id or "anonymous")
+        self.agent_id = agent_id
+        self._starts: dict[UUID, float] = {}
+
+    async def on_chat_model_start(self, serialized: dict, messages: list, *, run_id: UUID, **kwargs: Any) -> None:
+        self._starts[run_id] = time.perf_counter()
+
+    async def on_llm_start(self, serialized: dict, prompts: list[str], *, run_id: UUID, **kwargs: Any) -> None:
+        self._starts[run_id] = time.perf_counter()
+
+    async def on_llm_error(self, error: BaseException, *, run_id: UUID, **kwargs: Any) -> None:
+        self._starts.pop(run_id, None)
+
+    async def on_llm_end(self, response: LLMResult, *, run_id: UUID, **kwargs: Any) -> None:
+        start = self._starts.pop(run_id, None)
+        latency = time.perf_counter() - start if start is not None else 0.0
+        for model, usage in extract_usage(response):
+            metrics_manager.inc("llm_tokens_total", usage["prompt_tokens"], agent=self.agent_id, kind="prompt")
+            metrics_manager.inc("llm_tokens_total", usage["completion_tokens"], agent=self.agent_id, kind="completion")
+            await record_usage(self.user_id, self.agent_id, model, usage, latency)
+
+
+# -------------------------------
+# 同步方法 - 供 Celery 任务使用
+# -------------------------------
+
+
+def drain_usage(client) -> list[dict]:
+    """读取所有待写入的用量计数（不修改 Redis），顺带清理已过期或已清零的旧 key"""
+    today = date.today().isoformat()
+    rows = []
+    for key in client.smembers(_index_key()):
+        data = client.hgetall(key)
+        if not data:
+            client.srem(_index_key(), key)
+            continue
+        counters = {field: int(data.get(field, 0)) for field in COUNTERS}
+        if not any(counters.values()):
+            if data.get("usage_date", today) < today:  # 之前日期的计数已全部写入
+                client.delete(key)
+                client.srem(_index_key(), key)
+            continue
+        rows.append({
+            "key": key,
+            "usage_date": datetime.strptime(data["usage_date"], "%Y-%m-%d").date(),
+            **{field: data[field] for field in DIMENSIONS[1:]},
+            **counters,
+        })
+    return rows
+
+
+def ack_usage(client, rows: list[dict]) -> None:
+    """从 Redis 计数中减去已经写入数据库的部分"""
+    pipe = client.pipeline(transaction=False)
+    for row in rows:
+        for field in COUNTERS:
+            if row[field]:
+                pipe.hincrby(row["key"], field, -row[field])
+    pipe.execute()
@@ -9,11 +9,19 @@ from deepagents.middleware.filesystem import FilesystemMiddleware
 from deepagents.middleware.patch_tool_calls import PatchToolCallsMiddleware
 from deepagents.middleware.subagents import SubAgentMiddleware, SubAgent
 from langchain.agents import create_agent
-from langchain.agents.middleware import SummarizationMiddleware, TodoListMiddleware, dynamic_prompt, ModelRequest
+from langchain.agents.middleware import SummarizationMiddleware, TodoListMiddleware, wrap_model_call, ModelRequest
+from langchain_core.messages import SystemMessage
 
 from app.agents.common.base import BaseAgent
+from app.agents.common.middlewares.admission_control_middleware import AdmissionControlMiddleware
 from app.agents.common.middlewares.attachment_middleware import inject_attachment_context
-from app.agents.common.models import load_chat_model
+from app.agents.common.middlewares.eager_tool_middleware import EagerToolDispatchMiddleware
+from app.agents.common.middlewares.llm_cache_middleware import LLMCacheMiddleware
+from app.agents.common.middlewares.parallel_tool_middleware import ParallelToolMiddleware
+from app.agents.common.middlewares.prompt_assembly_middleware import PromptAssemblyMiddleware
+from app.agents.common.middlewares.tool_schema_middleware import ToolSchemaMiddleware
+from app.agents.common.models import load_configured_chat_model
+from app.agents.common.prompt import SESSION, add_prompt_segment
 
 from app.agents.deep_agent.context import DeepContext, DEEP_PROMPT
 
@@ -56,10 +64,16 @@ def _get_critique_sub_agent() -> SubAgent:
         )
     )
 
-@dynamic_prompt
-def context_aware_prompt(request: ModelRequest) -> str:
-    """从 runtime context 动态生成系统提示词"""
-    return DEEP_PROMPT + "\n\n\n" + request.runtime.context.system_prompt
+@wrap_model_call
+async def context_aware_prompt(request: ModelRequest, handler):
+    """系统提示词：DEEP_PROMPT 作为稳定前缀，与之不同的 context.system_prompt 作为线程级片段登记在其后"""
+    request = request.override(system_message=SystemMessage(content=DEEP_PROMPT))
+    system_prompt = (request.runtime.context.system_prompt or "").strip()
+    if system_prompt.startswith(DEEP_PROMPT.strip()):  # 默认值或在 DEEP_PROMPT 后追加的内容
+        system_prompt = system_prompt[len(DEEP_PROMPT.strip()):].strip()
+    if system_prompt:
+        request = add_prompt_segment(request, system_prompt, SESSION)
+    return await handler(request)
 
 
 class DeepAgent(BaseAgent):
@@ -68,6 +82,8 @@ class DeepAgent(BaseAgent):
         "具备规划、深度分析和子智能体协作能力的智能体，可以处理复杂的多步骤任务"
     )
     context_schema = DeepContext
+    # 构建 graph 时不使用 tools / knowledges / mcps，只按模型区分
+    graph_fields = ("model", "subagents_model")
     capabilities = [
         "file_upload",
         "todo",
@@ -76,7 +92,6 @@ class DeepAgent(BaseAgent):
 
     def __init__(self, **kwargs):
         super().__init__(**kwargs)
-        self.graph = None
         self.checkpointer = None
 
     @staticmethod
@@ -95,16 +110,10 @@ class DeepAgent(BaseAgent):
         )
         return tools
 
-    async def get_graph(self, **kwargs):
+    async def build_graph(self, context: DeepContext):
         """构建 Deep Agent 的图"""
-        if self.graph:
-            return self.graph
-
-        # 获取上下文配置
-        context = self.context_schema.from_file(module_name=self.module_name)
-
-        model = load_chat_model(context.model)
-        sub_model = load_chat_model(context.subagents_model)
+        model = load_configured_chat_model(context.model)
+        sub_model = load_configured_chat_model(context.subagents_model)
         tools = await self.get_tools()
 
         # Build subagents with search tools
@@ -112,10 +121,11 @@ class DeepAgent(BaseAgent):
         critique_sub_agent = _get_critique_sub_agent()
 
         # 使用 create_deep_agent 创建深度智能体
+        parallel = ParallelToolMiddleware(timeouts={"task": None})
         graph = create_agent(
             model=model,
             tools=tools,
-            system_prompt=context.system_prompt,
+            system_prompt=DEEP_PROMPT,  # 实际由 context_aware_prompt 生成
             middleware=[
                 context_aware_prompt,  # 动态系统提示词
                 inject_attachment_context,  # 附件上下文注入
@@ -135,6 +145,9 @@ class DeepAgent(BaseAgent):
                             trim_tokens_to_summarize=None,
                         ),
                         PatchToolCallsMiddleware(),
+                        ToolSchemaMiddleware(),
+                        AdmissionControlMiddleware(),  # 子智能体的模型调用同样排队
+                        ParallelToolMiddleware(),
                     ],
                     general_purpose_agent=True,
                 ),
@@ -145,9 +158,16 @@ class DeepAgent(BaseAgent):
                     trim_tokens_to_summarize=None,
                 ),
                 PatchToolCallsMiddleware(),
+                # 以下中间件放在最内层，缓存 key 包含其他中间件修改后的提示词和工具
+                PromptAssemblyMiddleware(agent=self.id),  # 提示词去重和排序（附件等易变内容放在稳定前缀之后）
+                parallel,  # 工具并发上限和超时（子智能体不限时）
+                # 模型流式输出期间提前执行工具（AGENT_TOOL_EAGER_DISPATCH），需要在 ToolSchemaMiddleware 之前读取工具 metadata
+                EagerToolDispatchMiddleware(parallel=parallel),
+                ToolSchemaMiddleware(),  # 复用缓存的工具 schema
+                LLMCacheMiddleware(agent=self.id),  # 模型结果缓存（命中时不占用并发名额）
+                AdmissionControlMiddleware(),  # 模型调用准入控制
             ],
             checkpointer=await self._get_checkpointer(),
         )
 
-        self.graph = graph
         return graph
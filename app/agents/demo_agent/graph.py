@@ -8,30 +8,41 @@ FilePath: graph
 
 from langchain.agents import create_agent
 
-from app.agents.common import BaseAgent, load_chat_model
+from app.agents.common import BaseAgent, BaseContext, load_configured_chat_model
+from app.agents.common.middlewares.admission_control_middleware import AdmissionControlMiddleware
+from app.agents.common.middlewares.eager_tool_middleware import EagerToolDispatchMiddleware
+from app.agents.common.middlewares.llm_cache_middleware import LLMCacheMiddleware
+from app.agents.common.middlewares.parallel_tool_middleware import ParallelToolMiddleware
+from app.agents.common.middlewares.semantic_cache_middleware import SemanticCacheMiddleware
+from app.agents.common.middlewares.tool_schema_middleware import ToolSchemaMiddleware
 from app.agents.common.tools import get_tools_from_context
 
 
 class MiniAgent(BaseAgent):
     name = "智能体 Demo"
     description = "一个基于内置工具的智能体示例"
+    # 系统提示词在编译时写入 graph
+    graph_fields = BaseAgent.graph_fields + ("system_prompt",)
 
     def __init__(self, **kwargs):
         super().__init__(**kwargs)
 
-    async def get_graph(self, **kwargs):
-        if self.graph:
-            return self.graph
-
-        context = self.context_schema.from_file(module_name=self.module_name)
-
+    async def build_graph(self, context: BaseContext):
         # 创建 MiniAgent
-        graph = create_agent(
-            model=load_chat_model(context.model),
+        parallel = ParallelToolMiddleware()
+        return create_agent(
+            model=load_configured_chat_model(context.model),
             system_prompt=context.system_prompt,
             tools=await get_tools_from_context(context),
+            # 缓存命中时不占用模型并发名额
+            middleware=[
+                SemanticCacheMiddleware(agent=self.id, persist_dir=self.workdir / "semantic_cache"),
+                parallel,
+                # 需要读取工具对象的 metadata，放在 ToolSchemaMiddleware 之前
+                EagerToolDispatchMiddleware(parallel=parallel),
+                ToolSchemaMiddleware(),
+                LLMCacheMiddleware(agent=self.id),
+                AdmissionControlMiddleware(),
+            ],
             checkpointer=await self._get_checkpointer(),
         )
-
-        self.graph = graph
-        return graph
@@ -4,6 +4,7 @@ from celery import Celery
 from celery.schedules import crontab
 from app.core.config.settings import settings
 import asyncio
+from datetime import timedelta
 from functools import wraps
 from app.core.database.mysql import mysql_manager
 from app.core.logger import logger_manager
@@ -129,6 +130,24 @@ celery_app.conf.beat_schedule = {
         'options': {
             'expires': 3600,  # Task expiration time: 1 hour
         }
+    },
+    'checkpoint-retention-daily': {
+        'task': 'checkpoint_retention_task',
+        'schedule': crontab(hour=4, minute=0),  # Execute daily at 4:00 AM, after the database backup
+        'args': (),
+        'kwargs': {},  # Retention limits come from CHECKPOINT_RETENTION_* settings
+        'options': {
+            'expires': 3600,  # Task expiration time: 1 hour
+        }
+    },
+    'usage-flush': {
+        'task': 'usage_flush_task',
+        'schedule': timedelta(minutes=settings.llm.LLM_USAGE_FLUSH_MINUTES),  # Move usage counters to MySQL
+        'args': (),
+        'kwargs': {},
+        'options': {
+            'expires': settings.llm.LLM_USAGE_FLUSH_MINUTES * 60,  # Skip if the next run is already due
+        }
     }
 }
 
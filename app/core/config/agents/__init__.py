@@ -8,4 +8,6 @@ FilePath: __init__.py
 
 from .tavily import TavilySettings
 from .llm import LlmSettings
-__all__ = ["TavilySettings", "LlmSettings"]
\ No newline at end of file
+from .checkpoint import CheckpointSettings
+from .agent import AgentSettings
+__all__ = ["TavilySettings", "LlmSettings", "CheckpointSettings", "AgentSettings"]
\ No newline at end of file
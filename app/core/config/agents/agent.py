@@ -0,0 +1,91 @@
+"""
+Author: xuyoushun
+Email: xuyoushun@bestpay.com.cn
+Date: 2026/1/26 10:05
+Description:
+FilePath: agent
+"""
+
+from typing import Literal
+
+from pydantic import Field
+
+from app.core.config.base import EnvBaseSettings
+
+
+class AgentSettings(EnvBaseSettings):
+    """Agent runtime configuration"""
+
+    AGENT_GRAPH_CACHE_SIZE: int = Field(
+        default=16,
+        description="Maximum number of compiled graphs cached per agent (one per distinct model / tools / mcps config)",
+    )
+    AGENT_WARMUP: bool = Field(
+        default=False,
+        description="Import and instantiate all agents in the background after startup",
+    )
+    AGENT_WARMUP_BUILD_GRAPH: bool = Field(
+        default=False,
+        description="Also build the default graph of each agent during warm-up",
+    )
+    AGENT_STREAM_FLUSH_MS: int = Field(
+        default=50,
+        description="Maximum delay in milliseconds before coalesced stream chunks are sent to the client",
+    )
+    AGENT_STREAM_FLUSH_TOKENS: int = Field(
+        default=32,
+        description="Number of streamed chunks that forces a flush before AGENT_STREAM_FLUSH_MS elapses",
+    )
+    AGENT_STREAM_QUEUE_SIZE: int = Field(
+        default=256,
+        description="Bounded queue between the graph and a streaming response; a full queue pauses the graph",
+    )
+    AGENT_HISTORY_CACHE_SIZE: int = Field(
+        default=256,
+        description="Number of serialized thread histories (one per thread checkpoint and projection) kept in memory",
+    )
+    AGENT_ATTACHMENT_CACHE_SIZE: int = Field(
+        default=64,
+        description="Number of rendered attachment prompts (one per distinct attachments list) kept in memory",
+    )
+    AGENT_ATTACHMENT_MAX_TOKENS: int = Field(
+        default=64000,
+        description="Estimated token cap of the attachment prompt; later attachments are truncated first",
+    )
+    AGENT_ATTACHMENT_MODE: Literal["full", "retrieval", "auto"] = Field(
+        default="auto",
+        description="full: inline whole attachments; retrieval: inline only chunks relevant to the latest question; "
+                    "auto: retrieval when the attachments exceed AGENT_ATTACHMENT_RETRIEVAL_TOKENS",
+    )
+    AGENT_ATTACHMENT_RETRIEVAL_TOKENS: int = Field(
+        default=4000,
+        description="Estimated token budget of attachment chunks injected per model call in retrieval mode",
+    )
+    AGENT_ATTACHMENT_TOP_K: int = Field(
+        default=8,
+        description="Maximum number of attachment chunks injected per model call in retrieval mode",
+    )
+    AGENT_ATTACHMENT_CHUNK_TOKENS: int = Field(
+        default=400,
+        description="Estimated size of attachment chunks indexed for retrieval",
+    )
+    AGENT_TOOL_SCHEMA_CACHE_SIZE: int = Field(
+        default=2048,
+        description="Number of converted tool schemas (one per tool object) kept in memory",
+    )
+    AGENT_TOOL_MAX_CONCURRENCY: int = Field(
+        default=8,
+        description="Maximum number of tool calls from one model turn executed concurrently",
+    )
+    AGENT_TOOL_TIMEOUT: float = Field(
+        default=300,
+        description="Default per-tool-call deadline in seconds (0 to disable); overridable per tool",
+    )
+    AGENT_TOOL_EAGER_DISPATCH: bool = Field(
+        default=False,
+        description="Start calls to tools with metadata={\"eager\": True} as soon as their arguments are streamed, before the model turn completes",
+    )
+    AGENT_CLIENT_CONFIG_FIELDS: list[str] = Field(
+        default=["model", "tools", "knowledges", "mcps"],
+        description="Context fields a chat request may override; everything else (e.g. system_prompt) is server-side only",
+    )
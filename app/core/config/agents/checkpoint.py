@@ -0,0 +1,88 @@
+"""
+Author: xuyoushun
+Email: xuyoushun@bestpay.com.cn
+Date: 2026/1/20 10:12
+Description:
+FilePath: checkpoint
+"""
+
+from typing import Literal
+
+from pydantic import Field
+
+from app.core.config.base import EnvBaseSettings
+
+
+class CheckpointSettings(EnvBaseSettings):
+    """Agent checkpointer configuration"""
+
+    CHECKPOINT_BACKEND: Literal["sqlite", "mysql", "redis"] = Field(
+        default="sqlite",
+        description="Checkpoint storage backend. mysql / redis are shared by all workers and hosts",
+    )
+    CHECKPOINT_DELTA_SNAPSHOT_INTERVAL: int = Field(
+        default=20,
+        description="Store only changed channels per checkpoint with a full snapshot every N steps (0 to disable)",
+    )
+    CHECKPOINT_COMPRESSION: bool = Field(
+        default=True,
+        description="Compress checkpoint blobs with zstd (zlib if zstandard is not installed)",
+    )
+    CHECKPOINT_COMPRESSION_LEVEL: int = Field(
+        default=3,
+        description="Compression level for checkpoint blobs",
+    )
+    CHECKPOINT_ZSTD_DICT_SAMPLES: int = Field(
+        default=256,
+        description="Train a per-agent zstd dictionary after this many samples, sqlite backend only (0 to disable)",
+    )
+    CHECKPOINT_FLUSH_INTERVAL_SECONDS: float = Field(
+        default=1.0,
+        description="Write-behind flush interval for mysql / redis checkpointers",
+    )
+    CHECKPOINT_FLUSH_MAX_ROWS: int = Field(
+        default=500,
+        description="Flush write-behind buffer immediately once this many rows are pending",
+    )
+    CHECKPOINT_REDIS_PREFIX: str = Field(
+        default="checkpoint",
+        description="Key prefix for the redis checkpointer",
+    )
+    CHECKPOINT_REDIS_TTL: int = Field(
+        default=7 * 24 * 3600,
+        description="Idle TTL in seconds for checkpoints stored in redis (0 to disable)",
+    )
+
+    CHECKPOINT_RETENTION_KEEP_LAST: int = Field(
+        default=20,
+        description="Checkpoints kept per thread by the retention task (interrupt points are always kept)",
+    )
+    CHECKPOINT_RETENTION_IDLE_DAYS: float = Field(
+        default=30,
+        description="Threads idle longer than this many days are deleted by the retention task (0 to disable)",
+    )
+    CHECKPOINT_RETENTION_BATCH_SIZE: int = Field(
+        default=100,
+        description="Threads processed per batch by the retention task",
+    )
+    CHECKPOINT_RETENTION_BATCH_PAUSE_SECONDS: float = Field(
+        default=0.05,
+        description="Pause between retention batches so online requests can acquire the write lock",
+    )
+
+    CHECKPOINT_SQLITE_POOL_SIZE: int = Field(
+        default=4,
+        description="Maximum number of pooled SQLite connections per checkpoint database",
+    )
+    CHECKPOINT_SQLITE_BUSY_TIMEOUT_MS: int = Field(
+        default=5000,
+        description="SQLite busy_timeout in milliseconds for checkpoint connections",
+    )
+    CHECKPOINT_SQLITE_CACHE_SIZE_KB: int = Field(
+        default=16384,
+        description="SQLite page cache size per connection in KiB",
+    )
+    CHECKPOINT_SQLITE_MMAP_SIZE: int = Field(
+        default=268435456,
+        description="SQLite mmap_size in bytes for checkpoint connections (0 to disable)",
+    )
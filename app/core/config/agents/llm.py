@@ -6,7 +6,7 @@ Description:
 FilePath: llm
 """
 
-from typing import Optional
+from typing import Any, Optional
 
 from pydantic import Field
 
@@ -26,4 +26,145 @@ class LlmSettings(EnvBaseSettings):
     OPENAI_API_MODEL: Optional[str] = Field(
         default="gpt-4-0613",
         description="OpenAI API model",
-    )
\ No newline at end of file
+    )
+    LLM_MODELS: dict[str, dict[str, Any]] = Field(
+        default_factory=dict,
+        description='Named models for load_configured_chat_model, e.g. {"gpt-4o": {"provider": "openai", '
+                    '"api_key": "...", "base_urls": ["https://a/v1", "https://b/v1"]}}; several base_urls fail over',
+    )
+    LLM_MODEL_CACHE_SIZE: int = Field(
+        default=64,
+        description="Maximum number of chat model instances reused by load_chat_model",
+    )
+    LLM_HTTP2: bool = Field(
+        default=True,
+        description="Use HTTP/2 for provider connections when the h2 package is installed",
+    )
+    LLM_HTTP_MAX_CONNECTIONS: int = Field(
+        default=100,
+        description="Maximum connections per provider base_url",
+    )
+    LLM_HTTP_MAX_KEEPALIVE_CONNECTIONS: int = Field(
+        default=20,
+        description="Maximum idle keep-alive connections per provider base_url",
+    )
+    LLM_HTTP_KEEPALIVE_EXPIRY: float = Field(
+        default=120.0,
+        description="Seconds an idle provider connection is kept alive",
+    )
+    LLM_HTTP_TIMEOUT: float = Field(
+        default=600.0,
+        description="Read / write timeout in seconds for provider requests",
+    )
+    LLM_HTTP_CONNECT_TIMEOUT: float = Field(
+        default=10.0,
+        description="Connect timeout in seconds for provider requests",
+    )
+    LLM_SCHEDULER_ENABLED: bool = Field(
+        default=True,
+        description="Limit concurrent model calls per model with an adaptive (AIMD) limit",
+    )
+    LLM_CONCURRENCY_INITIAL: int = Field(
+        default=8,
+        description="Initial concurrent model calls allowed per model",
+    )
+    LLM_CONCURRENCY_MIN: int = Field(
+        default=1,
+        description="Lower bound of the adaptive concurrency limit",
+    )
+    LLM_CONCURRENCY_MAX: int = Field(
+        default=64,
+        description="Upper bound of the adaptive concurrency limit",
+    )
+    LLM_TARGET_LATENCY: float = Field(
+        default=60.0,
+        description="Model calls slower than this many seconds shrink the concurrency limit",
+    )
+    LLM_QUEUE_MAX_SIZE: int = Field(
+        default=256,
+        description="Maximum model calls waiting for a slot per model; further calls are rejected",
+    )
+    LLM_QUEUE_TIMEOUT: float = Field(
+        default=120.0,
+        description="Seconds a model call may wait for a slot before it is rejected",
+    )
+    LLM_CACHE_ENABLED: bool = Field(
+        default=False,
+        description="Cache model responses in Redis keyed by model, messages and tool schemas",
+    )
+    LLM_CACHE_PREFIX: str = Field(
+        default="llm_cache",
+        description="Redis key prefix of cached model responses",
+    )
+    LLM_CACHE_TTL: int = Field(
+        default=86400,
+        description="Seconds a cached model response is kept",
+    )
+    LLM_CACHE_MAX_ENTRIES: int = Field(
+        default=10000,
+        description="Maximum cached responses; the oldest entries are evicted first",
+    )
+    LLM_CACHE_MAX_ENTRY_BYTES: int = Field(
+        default=262144,
+        description="Responses larger than this (compressed) are not cached",
+    )
+    SEMANTIC_CACHE_ENABLED: bool = Field(
+        default=False,
+        description="Answer near-duplicate first questions from a local semantic cache",
+    )
+    SEMANTIC_CACHE_EMBEDDING: str = Field(
+        default="",
+        description='init_embeddings id for the semantic cache, e.g. "openai:text-embedding-3-small"; the cache stays off until set',
+    )
+    SEMANTIC_CACHE_THRESHOLD: float = Field(
+        default=0.92,
+        description="Minimum cosine similarity for a semantic cache hit",
+    )
+    SEMANTIC_CACHE_MAX_ENTRIES: int = Field(
+        default=5000,
+        description="Maximum cached answers per agent and system prompt; least recently hit are evicted",
+    )
+    SEMANTIC_CACHE_TTL: int = Field(
+        default=604800,
+        description="Seconds a semantic cache entry can be returned",
+    )
+    SEMANTIC_CACHE_PERSIST_EVERY: int = Field(
+        default=20,
+        description="Save the semantic cache to disk after this many new entries (and on shutdown)",
+    )
+    LLM_HEDGE_ENABLED: bool = Field(
+        default=True,
+        description="Send a second request to another endpoint when the first has no token within its p95 time-to-first-token",
+    )
+    LLM_HEDGE_DELAY: float = Field(
+        default=2.0,
+        description="Hedge delay in seconds before an endpoint has enough latency samples",
+    )
+    LLM_HEDGE_MIN_DELAY: float = Field(
+        default=0.2,
+        description="Lower bound of the hedge delay in seconds",
+    )
+    LLM_ENDPOINT_FAILURE_THRESHOLD: int = Field(
+        default=3,
+        description="Consecutive failures after which an endpoint is skipped",
+    )
+    LLM_ENDPOINT_FAILURE_COOLDOWN: float = Field(
+        default=30.0,
+        description="Seconds a failing endpoint is skipped",
+    )
+    LLM_USAGE_ENABLED: bool = Field(
+        default=True,
+        description="Record token usage per user, agent, model and day",
+    )
+    LLM_USAGE_REDIS_PREFIX: str = Field(
+        default="usage",
+        description="Redis key prefix of usage counters",
+    )
+    LLM_USAGE_KEY_TTL_DAYS: int = Field(
+        default=3,
+        description="Days usage counters are kept in Redis if they are never flushed",
+    )
+    LLM_USAGE_FLUSH_MINUTES: int = Field(
+        default=5,
+        description="Interval in minutes at which usage counters are flushed to MySQL",
+    )
@@ -9,6 +9,8 @@ from app.core.config.modules.redis import RedisSettings
 from app.core.config.modules.celery import CelerySettings
 from app.core.config.agents.tavily import TavilySettings
 from app.core.config.agents.llm import LlmSettings
+from app.core.config.agents.checkpoint import CheckpointSettings
+from app.core.config.agents.agent import AgentSettings
 
 class Settings:
     """Global configuration class
@@ -49,6 +51,14 @@ class Settings:
     def llm(self) -> LlmSettings:
         return LlmSettings()
 
+    @cached_property
+    def checkpoint(self) -> CheckpointSettings:
+        return CheckpointSettings()
+
+    @cached_property
+    def agent(self) -> AgentSettings:
+        return AgentSettings()
+
 
 # Create a global settings instance
 settings = Settings()
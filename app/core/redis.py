@@ -13,6 +13,7 @@ class RedisManager:
     def __init__(self):
         self.logger = logger_manager.get_logger(__name__)
         self.async_client: AsyncRedis | None = None
+        self.async_binary_client: AsyncRedis | None = None
         self.sync_client: SyncRedis | None = None
         self.config = settings.redis
     
@@ -65,6 +66,20 @@ class RedisManager:
             await self.initialize_async()
         return self.async_client
     
+    async def get_async_binary_client(self) -> AsyncRedis:
+        """Async client without response decoding - for binary payloads (checkpoints, caches)"""
+        if not self.async_binary_client:
+            self.async_binary_client = async_from_url(
+                self.config.REDIS_CONNECTION_URL,
+                decode_responses=False,
+                max_connections=self.config.REDIS_POOL_SIZE,
+                socket_timeout=self.config.REDIS_SOCKET_TIMEOUT,
+                retry_on_timeout=True,
+                health_check_interval=30,
+            )
+            self.logger.info("✅ Redis async binary client initialized.")
+        return self.async_binary_client
+
     async def get_async(self, key: str) -> str | None:
         client = await self.get_async_client()
         return await client.get(key)
@@ -141,6 +156,14 @@ class RedisManager:
             except Exception:
                 self.logger.exception("❌ Failed to close Redis async client.")
         
+        if self.async_binary_client:
+            try:
+                await self.async_binary_client.close()
+                self.async_binary_client = None
+                self.logger.info("✅ Redis async binary client closed.")
+            except Exception:
+                self.logger.exception("❌ Failed to close Redis async binary client.")
+
         if self.sync_client:
             try:
                 self.sync_client.close()
@@ -3,14 +3,16 @@
 import os
 
 import uvicorn
-from fastapi import FastAPI, HTTPException, Request
+from fastapi import Depends, FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.openapi.utils import get_openapi
 from fastapi.responses import JSONResponse
 from fastapi.staticfiles import StaticFiles
 
 from app.core.config.settings import settings
+from app.core.deps import get_current_superuser
 from app.core.logger import logger_manager
+from app.core.metrics import metrics_manager
 from app.middleware.lifespan import lifespan
 from app.routers import v1_router
 
@@ -92,6 +94,22 @@ async def health_check():
     return {"status": "healthy"}
 
 
+# Metrics endpoint (superuser only: exposes LLM endpoints and their health)
+@app.get("/metrics", tags=["Health"], dependencies=[Depends(get_current_superuser)])
+async def metrics():
+    """In-process runtime metrics (graph cache, checkpointer, LLM calls), superuser only"""
+    from app.agents.common.checkpoint import checkpointer_manager
+    from app.agents.common.models import model_registry
+    from app.agents.common.scheduler import model_scheduler
+
+    return {
+        **metrics_manager.snapshot(),
+        "checkpoint_pools": checkpointer_manager.stats(),
+        "llm_pools": model_registry.stats(),
+        "llm_scheduler": model_scheduler.stats(),
+    }
+
+
 # OpenAPI documentation
 def custom_openapi():
     """Custom OpenAPI documentation"""
@@ -5,11 +5,15 @@ Date: 2026/1/12 10:13
 Description:
 FilePath: lifespan
 """
+import asyncio
 import os
+import sys
 from contextlib import asynccontextmanager
 
 from fastapi import FastAPI
 
+from app.agents import agent_manager
+from app.core.config import settings
 from app.core.database import db_manager
 from app.core.logger import logger_manager
 from app.core.redis import redis_manager
@@ -45,8 +49,57 @@ async def lifespan(_app: FastAPI):
         logger.error(f"❌ Redis connection failed: {e}")
         logger.warning("⚠️ Application will start without Redis connections")
 
+    # Shared checkpointer backend must be reachable, otherwise conversation history would not be persisted
+    if settings.checkpoint.CHECKPOINT_BACKEND != "sqlite":
+        from app.agents.common.checkpoint import checkpointer_manager
+
+        await checkpointer_manager.initialize()
+        logger.info("🎉 Checkpointer initialized successfully")
+
+    # Warm up agents in the background so /health is served immediately
+    warmup_task = None
+    if settings.agent.AGENT_WARMUP:
+        warmup_task = asyncio.create_task(
+            agent_manager.warm_up(build_graph=settings.agent.AGENT_WARMUP_BUILD_GRAPH)
+        )
+        logger.info("🚀 Agent warm-up started in background")
+
     yield
 
+    if warmup_task and not warmup_task.done():
+        warmup_task.cancel()
+
+    # Agent runtime modules are imported on first use; only shut down the ones that were loaded
+    # Flush pending checkpoint writes and close checkpointer pools
+    if "app.agents.common.checkpoint" in sys.modules:
+        from app.agents.common.checkpoint import checkpointer_manager
+
+        try:
+            await checkpointer_manager.close()
+            logger.info("🎉 Checkpointer pools closed successfully")
+        except Exception as e:
+            logger.error(f"❌ Checkpointer pools closed failed: {e}")
+
+    # Persist semantic caches
+    if "app.agents.common.semantic_cache" in sys.modules:
+        from app.agents.common.semantic_cache import semantic_cache_manager
+
+        try:
+            semantic_cache_manager.flush_all()
+            logger.info("🎉 Semantic caches saved successfully")
+        except Exception as e:
+            logger.error(f"❌ Semantic caches saved failed: {e}")
+
+    # Close shared LLM HTTP connection pools
+    if "app.agents.common.models" in sys.modules:
+        from app.agents.common.models import model_registry
+
+        try:
+            await model_registry.aclose()
+            logger.info("🎉 LLM connection pools closed successfully")
+        except Exception as e:
+            logger.error(f"❌ LLM connection pools closed failed: {e}")
+
     # Close database connection
     try:
         await db_manager.close()
@@ -0,0 +1,44 @@
+"""
+Author: xuyoushun
+Email: xuyoushun@bestpay.com.cn
+Date: 2026/1/21 15:10
+Description:
+
+MySQLSaver 使用的 checkpoint 表，由 alembic 迁移创建（见 alembic/env.py 的 target_metadata）
+
+表以 (thread_id, checkpoint_ns, checkpoint_id[, task_id, idx]) 为复合主键，不需要 BaseModel 的自增 id 和审计字段，
+因此直接定义为 Table 并使用独立的 MetaData；checkpointer 导入时也不依赖 ORM 模型。
+
+FilePath: checkpoint
+"""
+from sqlalchemy import Column, Integer, LargeBinary, MetaData, String, Table
+from sqlalchemy.dialects.mysql import LONGBLOB
+
+checkpoint_metadata = MetaData()
+
+checkpoints_table = Table(
+    "agent_checkpoints",
+    checkpoint_metadata,
+    Column("thread_id", String(128), primary_key=True, comment="线程ID"),
+    Column("checkpoint_ns", String(128), primary_key=True, default="", comment="命名空间（子图）"),
+    Column("checkpoint_id", String(64), primary_key=True, comment="checkpoint ID（uuid6，按时间递增）"),
+    Column("parent_checkpoint_id", String(64), nullable=True, comment="上一个 checkpoint ID"),
+    Column("type", String(32), nullable=True, comment="序列化类型"),
+    Column("checkpoint", LargeBinary().with_variant(LONGBLOB, "mysql"), nullable=True, comment="checkpoint 数据"),
+    Column("metadata", LargeBinary().with_variant(LONGBLOB, "mysql"), nullable=True, comment="checkpoint 元数据"),
+    mysql_charset="utf8mb4",
+)
+
+writes_table = Table(
+    "agent_checkpoint_writes",
+    checkpoint_metadata,
+    Column("thread_id", String(128), primary_key=True, comment="线程ID"),
+    Column("checkpoint_ns", String(128), primary_key=True, default="", comment="命名空间（子图）"),
+    Column("checkpoint_id", String(64), primary_key=True, comment="checkpoint ID"),
+    Column("task_id", String(64), primary_key=True, comment="任务ID"),
+    Column("idx", Integer, primary_key=True, autoincrement=False, comment="写入序号"),
+    Column("channel", String(255), nullable=False, comment="channel 名称"),
+    Column("type", String(32), nullable=True, comment="序列化类型"),
+    Column("value", LargeBinary().with_variant(LONGBLOB, "mysql"), nullable=True, comment="写入数据"),
+    mysql_charset="utf8mb4",
+)
@@ -0,0 +1,38 @@
+"""
+Author: xuyoushun
+Email: xuyoushun@bestpay.com.cn
+Date: 2026/1/30 10:05
+Description:
+FilePath: usage
+"""
+from datetime import date
+
+from sqlalchemy import BigInteger, Date, Integer, String, UniqueConstraint
+from sqlalchemy.orm import Mapped, mapped_column
+
+from app.models.base import BaseModel
+
+
+class AgentUsage(BaseModel):
+    """Daily token usage per user, agent and model
+
+    Rows are written by usage_flush_task from the Redis counters filled by UsageCallbackHandler.
+    """
+
+    __tablename__ = "agent_usage"
+    __table_args__ = (
+        UniqueConstraint("usage_date", "user_id", "agent_id", "model", name="uq_agent_usage_dims"),
+    )
+
+    # 统计维度
+    usage_date: Mapped[date] = mapped_column(Date, index=True, comment="统计日期")
+    user_id: Mapped[str] = mapped_column(String(64), index=True, comment="用户ID")
+    agent_id: Mapped[str] = mapped_column(String(100), index=True, comment="智能体ID")
+    model: Mapped[str] = mapped_column(String(200), comment="模型名称")
+
+    # 累计值
+    calls: Mapped[int] = mapped_column(Integer, default=0, comment="模型调用次数")
+    prompt_tokens: Mapped[int] = mapped_column(BigInteger, default=0, comment="输入 token 数")
+    completion_tokens: Mapped[int] = mapped_column(BigInteger, default=0, comment="输出 token 数")
+    cached_tokens: Mapped[int] = mapped_column(BigInteger, default=0, comment="命中 provider 缓存的输入 token 数")
+    latency_ms: Mapped[int] = mapped_column(BigInteger, default=0, comment="模型调用总耗时（毫秒）")
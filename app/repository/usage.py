@@ -0,0 +1,91 @@
+"""Agent token usage CRUD operations"""
+
+from datetime import date, datetime, UTC
+from typing import Optional, List
+
+from sqlalchemy import func, select
+from sqlalchemy.dialects.mysql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from app.models.usage import AgentUsage
+
+USAGE_COUNTERS = ("calls", "prompt_tokens", "completion_tokens", "cached_tokens", "latency_ms")
+USAGE_DIMENSIONS = ("usage_date", "user_id", "agent_id", "model")
+
+
+class UsageCRUD:
+    """Agent usage CRUD operations class"""
+
+    @staticmethod
+    def upsert_many(db: Session, rows: List[dict]) -> int:
+        """Add counters to the daily rows, creating them when missing (sync, used by Celery)"""
+        if not rows:
+            return 0
+        now = datetime.now(UTC)
+        values = [
+            {
+                **{field: row[field] for field in USAGE_DIMENSIONS + USAGE_COUNTERS},
+                "created_by": 0,
+                "created_at": now,
+                "updated_at": now,
+                "is_deleted": False,
+            }
+            for row in rows
+        ]
+        statement = insert(AgentUsage).values(values)
+        statement = statement.on_duplicate_key_update(
+            updated_at=statement.inserted.updated_at,
+            **{
+                field: getattr(AgentUsage, field) + getattr(statement.inserted, field)
+                for field in USAGE_COUNTERS
+            },
+        )
+        db.execute(statement)
+        return len(values)
+
+    @staticmethod
+    async def summary(
+        db: AsyncSession,
+        user_id: Optional[str] = None,
+        agent_id: Optional[str] = None,
+        model: Optional[str] = None,
+        start: Optional[date] = None,
+        end: Optional[date] = None,
+        group_by: Optional[List[str]] = None,
+        limit: int = 1000,
+    ) -> List[dict]:
+        """Sum usage over a date range, grouped by the given dimensions"""
+        group_by = [field for field in (group_by or []) if field in USAGE_DIMENSIONS]
+        columns = [getattr(AgentUsage, field) for field in group_by]
+        totals = [func.sum(getattr(AgentUsage, field)).label(field) for field in USAGE_COUNTERS]
+        statement = select(*columns, *totals).where(AgentUsage.is_deleted == False)
+
+        if user_id is not None:
+            statement = statement.where(AgentUsage.user_id == user_id)
+        if agent_id is not None:
+            statement = statement.where(AgentUsage.agent_id == agent_id)
+        if model is not None:
+            statement = statement.where(AgentUsage.model == model)
+        if start is not None:
+            statement = statement.where(AgentUsage.usage_date >= start)
+        if end is not None:
+            statement = statement.where(AgentUsage.usage_date <= end)
+
+        if columns:
+            statement = statement.group_by(*columns)
+        statement = statement.order_by(
+            (func.sum(AgentUsage.prompt_tokens) + func.sum(AgentUsage.completion_tokens)).desc()
+        ).limit(limit)
+
+        result = await db.execute(statement)
+        return [
+            {
+                **{field: row._mapping[field] for field in group_by},
+                **{field: int(row._mapping[field] or 0) for field in USAGE_COUNTERS},
+            }
+            for row in result.all()
+        ]
+
+
+usage_crud = UsageCRUD()
@@ -2,8 +2,12 @@ from fastapi import APIRouter
 from app.routers.v1 import (
     auth_router,
     user_router,
+    agent_router,
+    usage_router,
 )
 v1_router = APIRouter(prefix="/v1")
 
 v1_router.include_router(auth_router)
-v1_router.include_router(user_router)
\ No newline at end of file
+v1_router.include_router(user_router)
+v1_router.include_router(agent_router)
+v1_router.include_router(usage_router)
\ No newline at end of file
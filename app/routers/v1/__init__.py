@@ -2,7 +2,9 @@
 
 from .auth import router as auth_router
 from .users import router as user_router
+from .agents import router as agent_router
+from .usage import router as usage_router
 
 # Export all routers
-__all__ = ['auth_router', 'user_router']
+__all__ = ['auth_router', 'user_router', 'agent_router', 'usage_router']
 
@@ -0,0 +1,149 @@
+import uuid
+from collections.abc import AsyncIterator
+from typing import List, Literal, Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi.responses import StreamingResponse
+from langchain_core.messages import HumanMessage
+
+from app.agents import agent_manager
+from app.core.config import settings
+from app.core.deps import get_current_user
+from app.core.logger import logger_manager
+from app.models.user import User
+from app.schemas.agent import AgentChatRequest, AgentInfo, HistoryPage, StreamFormat
+from app.services.agent_stream import StreamCoalescer, encode_ndjson, encode_sse
+
+logger = logger_manager.get_logger(__name__)
+
+router = APIRouter(prefix="/agents", tags=["Agents"])
+
+_MEDIA_TYPES = {
+    StreamFormat.SSE: "text/event-stream",
+    StreamFormat.NDJSON: "application/x-ndjson",
+}
+
+
+@router.get("", response_model=List[AgentInfo])
+async def list_agents(current_user: User = Depends(get_current_user)):
+    """
+    List registered agents without importing them
+
+    Args:
+        current_user: current login user
+
+    Returns:
+        agent list
+    """
+    return agent_manager.list_agents()
+
+
+async def _get_agent_or_404(agent_id: str):
+    if agent_id not in agent_manager.get_agent_ids():
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Agent {agent_id} not found"
+        )
+    return await agent_manager.aget_agent(agent_id)
+
+
+@router.get("/{agent_id}/threads/{thread_id}/history", response_model=HistoryPage)
+async def get_thread_history(
+    agent_id: str,
+    thread_id: str,
+    limit: Optional[int] = Query(50, ge=1, le=1000),
+    before: Optional[str] = Query(None, description="Return messages before this message id"),
+    after: Optional[str] = Query(None, description="Return messages after this message id"),
+    projection: Literal["full", "light"] = Query("full"),
+    current_user: User = Depends(get_current_user),
+):
+    """
+    Get a page of thread history, latest messages first by default
+
+    Args:
+        agent_id: agent id
+        thread_id: thread id
+        limit: page size
+        before: message id cursor
+        after: message id cursor
+        projection: full messages or role / content / tool names only
+        current_user: current login user
+
+    Returns:
+        history page
+
+    Raises:
+        HTTPException: agent not found, or thread not found for the current user
+    """
+    agent = await _get_agent_or_404(agent_id)
+    page = await agent.get_history_page(
+        str(current_user.id), thread_id, limit=limit, before=before, after=after, projection=projection
+    )
+    if page is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Thread {thread_id} not found"
+        )
+    return page
+
+
+@router.post("/{agent_id}/chat/stream")
+async def stream_chat(
+    agent_id: str,
+    request: AgentChatRequest,
+    format: StreamFormat = Query(StreamFormat.SSE),
+    current_user: User = Depends(get_current_user),
+):
+    """
+    Stream agent output as coalesced delta events (SSE or NDJSON)
+
+    Args:
+        agent_id: agent id
+        request: chat request
+        format: wire format, sse or ndjson
+        current_user: current login user
+
+    Returns:
+        streaming response
+
+    Raises:
+        HTTPException: agent not found, or config overrides a field that is not allowed
+    """
+    agent = await _get_agent_or_404(agent_id)
+    try:
+        overrides = agent.client_context(request.config)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+    # checkpoints are namespaced per user (see BaseAgent._run_config), so a client can only continue its own threads
+    thread_id = request.thread_id or str(uuid.uuid4())
+    input_context = {
+        **overrides,
+        "thread_id": thread_id,
+        "user_id": str(current_user.id),
+        "attachments": request.attachments,
+    }
+    encode = encode_sse if format == StreamFormat.SSE else encode_ndjson
+    cfg = settings.agent
+    coalescer = StreamCoalescer(
+        flush_ms=cfg.AGENT_STREAM_FLUSH_MS,
+        flush_tokens=cfg.AGENT_STREAM_FLUSH_TOKENS,
+        queue_size=cfg.AGENT_STREAM_QUEUE_SIZE,
+    )
+
+    async def event_stream() -> AsyncIterator[str]:
+        source = agent.stream_messages([HumanMessage(content=request.query)], input_context=input_context)
+        try:
+            async for events in coalescer.stream(source):
+                yield "".join(encode(event) for event in events)
+        except Exception as e:
+            logger.error(f"Agent {agent_id} stream failed (thread={thread_id}): {e}")
+            yield encode({"type": "error", "thread_id": thread_id, "message": str(e)})
+            return
+        yield encode({"type": "end", "thread_id": thread_id})
+
+    return StreamingResponse(
+        event_stream(),
+        media_type=_MEDIA_TYPES[format],
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
@@ -0,0 +1,94 @@
+from datetime import date
+from typing import List, Literal, Optional
+
+from fastapi import APIRouter, Depends, Query
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.database import get_db
+from app.core.deps import get_current_user, get_current_superuser
+from app.models.user import User
+from app.repository.usage import usage_crud
+from app.schemas.usage import UsageSummary
+
+router = APIRouter(prefix="/usage", tags=["Usage"])
+
+GroupBy = Literal["usage_date", "user_id", "agent_id", "model"]
+
+
+@router.get("/me", response_model=List[UsageSummary])
+async def get_my_usage(
+    start: Optional[date] = Query(None, description="First day (inclusive)"),
+    end: Optional[date] = Query(None, description="Last day (inclusive)"),
+    agent_id: Optional[str] = Query(None),
+    model: Optional[str] = Query(None),
+    group_by: List[GroupBy] = Query(["agent_id", "model"]),
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Get token usage of the current user
+
+    Counters are flushed from Redis periodically, the latest few minutes may be missing.
+
+    Args:
+        start: first day
+        end: last day
+        agent_id: only this agent
+        model: only this model
+        group_by: dimensions to group by
+        current_user: current login user
+        db: Database session
+
+    Returns:
+        usage grouped by the requested dimensions, largest first
+    """
+    return await usage_crud.summary(
+        db,
+        user_id=str(current_user.id),
+        agent_id=agent_id,
+        model=model,
+        start=start,
+        end=end,
+        group_by=group_by,
+    )
+
+
+@router.get("", response_model=List[UsageSummary])
+async def get_usage(
+    start: Optional[date] = Query(None, description="First day (inclusive)"),
+    end: Optional[date] = Query(None, description="Last day (inclusive)"),
+    user_id: Optional[str] = Query(None),
+    agent_id: Optional[str] = Query(None),
+    model: Optional[str] = Query(None),
+    group_by: List[GroupBy] = Query(["user_id", "agent_id"]),
+    limit: int = Query(100, ge=1, le=1000),
+    current_user: User = Depends(get_current_superuser),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Get token usage of all users (superuser only)
+
+    Args:
+        start: first day
+        end: last day
+        user_id: only this user
+        agent_id: only this agent
+        model: only this model
+        group_by: dimensions to group by
+        limit: maximum number of groups
+        current_user: current superuser
+        db: Database session
+
+    Returns:
+        usage grouped by the requested dimensions, largest first
+    """
+    return await usage_crud.summary(
+        db,
+        user_id=user_id,
+        agent_id=agent_id,
+        model=model,
+        start=start,
+        end=end,
+        group_by=group_by,
+        limit=limit,
+    )
@@ -0,0 +1,45 @@
+"""Agent related Pydantic Schemas"""
+
+from enum import Enum
+from typing import Any, Optional
+from pydantic import BaseModel, ConfigDict, Field
+
+
+class StreamFormat(str, Enum):
+    """Wire format of a streaming response"""
+    SSE = "sse"
+    NDJSON = "ndjson"
+
+
+class AgentChatRequest(BaseModel):
+    """Agent chat request Schema"""
+    query: str = Field(..., min_length=1)
+    thread_id: Optional[str] = None
+    config: dict[str, Any] = Field(default_factory=dict, description="Context overrides, limited to AGENT_CLIENT_CONFIG_FIELDS")
+    attachments: list[dict[str, Any]] = Field(default_factory=list)
+
+    model_config = ConfigDict(
+        json_schema_extra={
+            "example": {
+                "query": "What is 12 * 34?",
+                "thread_id": "b4c1f0c2-5a3e-4a8e-9d0a-3f1a2b3c4d5e",
+                "config": {"tools": ["calculator"]},
+            }
+        }
+    )
+
+
+class AgentInfo(BaseModel):
+    """Agent list item Schema"""
+    id: str
+    name: str
+    description: str = ""
+    loaded: bool = False
+
+
+class HistoryPage(BaseModel):
+    """Thread history page Schema"""
+    messages: list[dict[str, Any]]
+    has_more: bool = False
+    total: int = 0
+    checkpoint_id: Optional[str] = None
@@ -0,0 +1,18 @@
+"""Agent token usage related Pydantic Schemas"""
+
+from datetime import date
+from typing import Optional
+from pydantic import BaseModel, Field
+
+
+class UsageSummary(BaseModel):
+    """Aggregated usage of one group; dimensions not grouped by are None"""
+    usage_date: Optional[date] = None
+    user_id: Optional[str] = None
+    agent_id: Optional[str] = None
+    model: Optional[str] = None
+    calls: int = Field(0, description="Number of model calls")
+    prompt_tokens: int = Field(0, description="Input tokens")
+    completion_tokens: int = Field(0, description="Output tokens")
+    cached_tokens: int = Field(0, description="Input tokens served from the provider cache")
+    latency_ms: int = Field(0, description="Total model latency in milliseconds")
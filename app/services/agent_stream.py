@@ -0,0 +1,202 @@
+"""
+Author: xuyoushun
+Email: xuyoushun@bestpay.com.cn
+Date: 2026/1/27 10:15
+Description:
+    Agent Stream - Coalescing and wire encoding for streamed agent output.
+
+    BaseAgent.stream_messages yields one (AIMessageChunk, metadata) pair per token. Instead of
+    serializing full message objects, chunks are turned into compact delta-only events and
+    flushed every AGENT_STREAM_FLUSH_MS milliseconds or AGENT_STREAM_FLUSH_TOKENS chunks:
+    - delta: {"type", "id", "node", "text"}; consecutive text of one message is merged
+    - tool_call: {"type", "id", "index", "tool_call_id", "name", "args"}; args fragments merged per index
+    - message: {"type", "id", "node", "role", "content", "name", "tool_call_id"}; non-streamed messages
+    - end / error: terminal events emitted by the router
+
+    The graph runs in a producer task writing into a bounded queue. When the client reads
+    slowly the queue fills up and the graph is paused (backpressure); every flush drains all
+    queued chunks at once, so slow clients receive fewer, larger events.
+
+FilePath: agent_stream
+"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import time
+from collections.abc import AsyncIterator
+from typing import Any
+
+from app.core.logger import logger_manager
+
+logger = logger_manager.get_logger(__name__)
+
+_DONE = object()
+
+
+def _text_of(content: Any) -> str:
+    """Extract the text part of a message content (plain string or list of content blocks)"""
+    if isinstance(content, str):
+        return content
+    if isinstance(content, list):
+        return "".join(
+            block if isinstance(block, str) else block.get("text", "")
+            for block in content
+            if isinstance(block, str) or (isinstance(block, dict) and block.get("type") == "text")
+        )
+    return ""
+
+
+def encode_sse(event: dict) -> str:
+    return f"event: {event['type']}\ndata: {json.dumps(event, ensure_ascii=False, separators=(',', ':'))}\n\n"
+
+
+def encode_ndjson(event: dict) -> str:
+    return json.dumps(event, ensure_ascii=False, separators=(",", ":")) + "\n"
+
+
+class StreamCoalescer:
+    """Turns a (message, metadata) stream into coalesced delta events"""
+
+    def __init__(self, flush_ms: int = 50, flush_tokens: int = 32, queue_size: int = 256):
+        self.flush_interval = flush_ms / 1000
+        self.flush_tokens = max(1, flush_tokens)
+        self.queue_size = queue_size
+        self._events: list[dict] = []
+        self._pending_tokens = 0
+
+    # -------------------------------
+    # Coalescing
+    # -------------------------------
+
+    def _append_text(self, msg_id: str | None, node: str | None, text: str) -> None:
+        last = self._events[-1] if self._events else None
+        if last and last["type"] == "delta" and last["id"] == msg_id:
+            last["text"] += text
+        else:
+            self._events.append({"type": "delta", "id": msg_id, "node": node, "text": text})
+
+    def _append_tool_call(self, msg_id: str | None, chunk: dict) -> None:
+        index = chunk.get("index")
+        for event in reversed(self._events):
+            if event["type"] == "tool_call" and event["id"] == msg_id and event["index"] == index:
+                event["args"] += chunk.get("args") or ""
+                event["name"] = event["name"] or chunk.get("name")
+                return
+            if event["type"] != "tool_call":
+                break
+        self._events.append(
+            {
+                "type": "tool_call",
+                "id": msg_id,
+                "index": index,
+                "tool_call_id": chunk.get("id"),
+                "name": chunk.get("name"),
+                "args": chunk.get("args") or "",
+            }
+        )
+
+    def add(self, msg: Any, metadata: dict | None) -> None:
+        """Add one streamed message to the pending batch"""
+        node = (metadata or {}).get("langgraph_node")
+        msg_id = getattr(msg, "id", None)
+        msg_type = getattr(msg, "type", None)
+
+        if msg_type == "AIMessageChunk":
+            text = _text_of(msg.content)
+            if text:
+                self._append_text(msg_id, node, text)
+            for chunk in getattr(msg, "tool_call_chunks", None) or []:
+                self._append_tool_call(msg_id, chunk)
+            self._pending_tokens += 1
+            return
+
+        # Non-streamed messages (tool results, complete AI messages) are sent once as a whole
+        event = {
+            "type": "message",
+            "id": msg_id,
+            "node": node,
+            "role": msg_type,
+            "content": _text_of(getattr(msg, "content", "")),
+        }
+        if getattr(msg, "name", None):
+            event["name"] = msg.name
+        if getattr(msg, "tool_call_id", None):
+            event["tool_call_id"] = msg.tool_call_id
+        self._events.append(event)
+        self._pending_tokens += self.flush_tokens
+
+    def should_flush(self) -> bool:
+        return self._pending_tokens >= self.flush_tokens
+
+    def drain(self) -> list[dict]:
+        events, self._events = self._events, []
+        self._pending_tokens = 0
+        return events
+
+    # -------------------------------
+    # Backpressure and timed flushing
+    # -------------------------------
+
+    async def stream(self, source: AsyncIterator[tuple[Any, dict]]) -> AsyncIterator[list[dict]]:
+        """Consume source and yield batches of events; the producer is cancelled when the consumer stops"""
+        queue: asyncio.Queue = asyncio.Queue(maxsize=self.queue_size)
+
+        async def produce():
+            try:
+                async for item in source:
+                    await queue.put(item)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Agent stream failed: {e}")
+                await queue.put(e)
+                return
+            finally:
+                if hasattr(source, "aclose"):
+                    await source.aclose()
+            await queue.put(_DONE)
+
+        producer = asyncio.create_task(produce())
+        deadline = time.monotonic() + self.flush_interval
+        try:
+            while True:
+                timeout = max(0.0, deadline - time.monotonic())
+                try:
+                    item = await asyncio.wait_for(queue.get(), timeout=timeout if self._events else None)
+                except asyncio.TimeoutError:
+                    item = None
+
+                # Merge everything that is already queued into this batch
+                items = [] if item is None else [item]
+                while items and items[-1] is not _DONE and not isinstance(items[-1], Exception):
+                    try:
+                        items.append(queue.get_nowait())
+                    except asyncio.QueueEmpty:
+                        break
+
+                finished, error = False, None
+                for entry in items:
+                    if entry is _DONE:
+                        finished = True
+                    elif isinstance(entry, Exception):
+                        error = entry
+                    else:
+                        msg, metadata = entry
+                        self.add(msg, metadata)
+
+                now = time.monotonic()
+                if self._events and (finished or error or self.should_flush() or now >= deadline):
+                    yield self.drain()
+                    deadline = now + self.flush_interval
+                elif not self._events:
+                    deadline = now + self.flush_interval
+
+                if error is not None:
+                    raise error
+                if finished:
+                    return
+        finally:
+            if not producer.done():
+                producer.cancel()
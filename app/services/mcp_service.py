@@ -42,6 +42,9 @@ _mcp_tools_cache: dict[str, list[Callable[..., Any]]] = {}
 # MCP tools statistics (for reporting enabled/disabled counts)
 _mcp_tools_stats: dict[str, dict[str, int]] = {}
 
+# Bumped whenever cached MCP tools may have changed; consumers memoizing tool lists compare it
+_mcp_generation = 0
+
 # MCP Server configurations (Runtime cache, loaded from DB)
 MCP_SERVERS: dict[str, dict[str, Any]] = {}
 
@@ -69,6 +72,16 @@ _DEFAULT_MCP_SERVERS = {
 # =============================================================================
 
 
+def _bump_mcp_generation() -> None:
+    global _mcp_generation
+    _mcp_generation += 1
+
+
+def get_mcp_generation() -> int:
+    """Get the MCP tools generation, which changes every time MCP tools are reloaded or invalidated."""
+    return _mcp_generation
+
+
 async def load_mcp_servers_from_db() -> None:
     """Load all enabled MCP server configurations from database to MCP_SERVERS cache."""
     global MCP_SERVERS
@@ -85,6 +98,7 @@ async def load_mcp_servers_from_db() -> None:
                 MCP_SERVERS.clear()
                 for server in servers:
                     MCP_SERVERS[server.name] = server.to_mcp_config()
+                _bump_mcp_generation()
 
             logger.info(f"Loaded {len(MCP_SERVERS)} MCP servers from database: {list(MCP_SERVERS.keys())}")
     except Exception as e:
@@ -110,6 +124,7 @@ async def sync_mcp_server_to_cache(name: str, config: dict[str, Any] | None) ->
 
         # Clear tools cache for this server
         _mcp_tools_cache.pop(name, None)
+        _bump_mcp_generation()
 
 
 async def init_mcp_servers() -> None:
@@ -277,6 +292,7 @@ async def get_mcp_tools(
             # Update Cache (Store the FULL list)
             if cache:
                 _mcp_tools_cache[server_name] = all_processed_tools
+                _bump_mcp_generation()
 
                 # Update Stats
                 # Stats should reflect the GLOBAL configuration state
@@ -334,6 +350,7 @@ def clear_mcp_cache() -> None:
     global _mcp_tools_cache, _mcp_tools_stats
     _mcp_tools_cache = {}
     _mcp_tools_stats = {}
+    _bump_mcp_generation()
 
 
 def clear_mcp_server_tools_cache(server_name: str) -> None:
@@ -341,6 +358,7 @@ def clear_mcp_server_tools_cache(server_name: str) -> None:
     global _mcp_tools_cache, _mcp_tools_stats
     _mcp_tools_cache.pop(server_name, None)
     _mcp_tools_stats.pop(server_name, None)
+    _bump_mcp_generation()
     logger.info(f"Cleared tools cache for MCP server '{server_name}'")
 
 
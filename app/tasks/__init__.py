@@ -12,9 +12,13 @@ Usage:
     task_result = result.get()"""
 
 from .backup_database_task import backup_database_task
+from .checkpoint_retention_task import checkpoint_retention_task
+from .usage_flush_task import usage_flush_task
 
 # Export all tasks
 __all__ = [
-    "backup_database_task"
+    "backup_database_task",
+    "checkpoint_retention_task",
+    "usage_flush_task",
 ]
 
@@ -0,0 +1,115 @@
+"""Agent checkpoint retention task - prune old checkpoints and reclaim space"""
+
+import asyncio
+import time
+from pathlib import Path
+from typing import Optional
+
+from app.agents.common.base import SAVE_DIR
+from app.agents.common.checkpoint import CheckpointerManager
+from app.core.celery import celery_app, with_db_init
+from app.core.config.settings import settings
+from app.core.logger import logger_manager
+
+logger = logger_manager.get_logger(__name__)
+
+
+def _checkpoint_targets() -> list[Path]:
+    """List checkpoint databases to process
+
+    sqlite keeps one database per agent workdir; mysql / redis share a single store,
+    so a single (unused) path is returned for them.
+    """
+    if settings.checkpoint.CHECKPOINT_BACKEND != "sqlite":
+        return [Path(SAVE_DIR)]
+    return sorted((Path(SAVE_DIR) / "agents").glob("*/aio_history.db"))
+
+
+async def _prune_checkpoints(
+    keep_last: int,
+    idle_ttl: Optional[float],
+    batch_size: int,
+    max_vacuum_pages: Optional[int],
+) -> dict:
+    # Use a dedicated manager so connections are bound to this task's event loop
+    manager = CheckpointerManager()
+    results = {}
+    try:
+        for path in _checkpoint_targets():
+            saver = await manager.get_checkpointer(path)
+            stats = await saver.aprune(
+                keep_last=keep_last,
+                idle_ttl=idle_ttl,
+                batch_size=batch_size,
+                pause=settings.checkpoint.CHECKPOINT_RETENTION_BATCH_PAUSE_SECONDS,
+            )
+            stats["reclaimed_bytes"] = await saver.avacuum(max_pages=max_vacuum_pages)
+            results[str(path)] = stats
+            logger.info(f"Checkpoint retention finished for {path}: {stats}")
+    finally:
+        await manager.close()
+    return results
+
+
+@celery_app.task(
+    name="checkpoint_retention_task",
+    bind=True,
+    max_retries=1,
+    default_retry_delay=600,
+    time_limit=3600,  # 1 hour hard timeout
+    soft_time_limit=3300,  # 55 minutes soft timeout
+)
+@with_db_init
+def checkpoint_retention_task(
+    self,
+    keep_last: Optional[int] = None,
+    idle_days: Optional[float] = None,
+    batch_size: Optional[int] = None,
+    max_vacuum_pages: Optional[int] = None,
+) -> dict:
+    """Prune agent checkpoints and reclaim storage
+
+    Args:
+        keep_last: Checkpoints kept per thread (interrupt points are always kept), defaults to settings
+        idle_days: Threads idle longer than this are deleted (0 to disable), defaults to settings
+        batch_size: Threads processed per batch, defaults to settings
+        max_vacuum_pages: Upper bound of pages reclaimed by incremental vacuum per database (None for all)
+
+    Returns:
+        dict: Per-database prune statistics and total reclaimed bytes
+    """
+    cfg = settings.checkpoint
+    keep_last = keep_last if keep_last is not None else cfg.CHECKPOINT_RETENTION_KEEP_LAST
+    idle_days = idle_days if idle_days is not None else cfg.CHECKPOINT_RETENTION_IDLE_DAYS
+    batch_size = batch_size or cfg.CHECKPOINT_RETENTION_BATCH_SIZE
+    idle_ttl = idle_days * 86400 if idle_days and idle_days > 0 else None
+
+    started = time.monotonic()
+    try:
+        logger.info(
+            f"Starting checkpoint retention: keep_last={keep_last}, idle_days={idle_days}, batch_size={batch_size}"
+        )
+        loop = asyncio.get_event_loop()
+        results = loop.run_until_complete(_prune_checkpoints(keep_last, idle_ttl, batch_size, max_vacuum_pages))
+        reclaimed = sum(stats["reclaimed_bytes"] for stats in results.values())
+        return {
+            'success': True,
+            'databases': results,
+            'checkpoints_deleted': sum(stats["checkpoints_deleted"] for stats in results.values()),
+            'threads_deleted': sum(stats["threads_deleted"] for stats in results.values()),
+            'reclaimed_mb': round(reclaimed / 1024 / 1024, 2),
+            'duration_seconds': round(time.monotonic() - started, 2),
+            'message': 'Checkpoint retention successful',
+        }
+
+    except Exception as e:
+        logger.error(f"Checkpoint retention failed: {e}", exc_info=True)
+
+        if self.request.retries < self.max_retries:
+            raise self.retry(exc=e)
+
+        return {
+            'success': False,
+            'error': str(e),
+            'message': 'Checkpoint retention failed',
+        }
@@ -0,0 +1,67 @@
+"""Agent usage flush task - move token usage counters from Redis to MySQL"""
+
+import time
+
+from app.agents.common.usage import ack_usage, drain_usage
+from app.core.celery import celery_app, with_db_init
+from app.core.database.mysql import mysql_manager
+from app.core.logger import logger_manager
+from app.core.redis import redis_manager
+from app.repository.usage import usage_crud
+
+logger = logger_manager.get_logger(__name__)
+
+
+@celery_app.task(
+    name="usage_flush_task",
+    bind=True,
+    max_retries=2,
+    default_retry_delay=60,
+    time_limit=600,  # 10 minutes hard timeout
+    soft_time_limit=540,  # 9 minutes soft timeout
+)
+@with_db_init
+def usage_flush_task(self) -> dict:
+    """Flush usage counters to the agent_usage table
+
+    Counters are read without being reset and subtracted from Redis only after the
+    database commit, so calls recorded during the flush are kept for the next run.
+
+    Returns:
+        dict: Number of rows flushed
+    """
+    started = time.monotonic()
+    try:
+        client = redis_manager.get_sync_client()
+        rows = drain_usage(client)
+        if rows:
+            db = mysql_manager.get_sync_db()
+            try:
+                usage_crud.upsert_many(db, rows)
+                db.commit()
+            except Exception:
+                db.rollback()
+                raise
+            finally:
+                db.close()
+            ack_usage(client, rows)
+
+        logger.info(f"Usage flush finished: {len(rows)} rows")
+        return {
+            'success': True,
+            'rows': len(rows),
+            'duration_seconds': round(time.monotonic() - started, 2),
+            'message': 'Usage flush successful',
+        }
+
+    except Exception as e:
+        logger.error(f"Usage flush failed: {e}", exc_info=True)
+
+        if self.request.retries < self.max_retries:
+            raise self.retry(exc=e)
+
+        return {
+            'success': False,
+            'error': str(e),
+            'message': 'Usage flush failed',
+        }
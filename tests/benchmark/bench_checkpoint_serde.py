@@ -0,0 +1,113 @@
+"""Benchmark checkpoint serializers on synthetic threads
+
+Compares the default JsonPlusSerializer against CompressedSerializer (with and
+without a trained zstd dictionary) on threads of 50 / 200 / 1000 messages.
+
+Run with:
+    python -m tests.benchmark.bench_checkpoint_serde
+"""
+import asyncio
+import random
+import statistics
+import tempfile
+import time
+from pathlib import Path
+
+from langchain_core.messages import AIMessage, HumanMessage, ToolMessage
+from langgraph.checkpoint.base import empty_checkpoint
+from langgraph.checkpoint.serde.jsonplus import JsonPlusSerializer
+
+from app.agents.common.checkpoint import CompressedSerializer, PooledSqliteSaver, SqliteConnectionPool
+
+THREAD_SIZES = (50, 200, 1000)
+CHECKPOINTS_PER_THREAD = 20
+THREADS_PER_SIZE = 3
+
+WORDS = (
+    "agent checkpoint thread message tool result search query document summary answer "
+    "calculate weather report user assistant context memory retrieval stream token model"
+).split()
+
+
+def _text(rng: random.Random, length: int) -> str:
+    return " ".join(rng.choice(WORDS) for _ in range(length))
+
+
+def _messages(rng: random.Random, count: int) -> list:
+    messages = []
+    for i in range(count):
+        if i % 3 == 0:
+            messages.append(HumanMessage(content=_text(rng, 30), id=f"h{i}"))
+        elif i % 3 == 1:
+            messages.append(
+                AIMessage(
+                    content=_text(rng, 80),
+                    id=f"a{i}",
+                    tool_calls=[{"name": "search", "args": {"query": _text(rng, 5)}, "id": f"call{i}"}],
+                )
+            )
+        else:
+            messages.append(ToolMessage(content=_text(rng, 120), tool_call_id=f"call{i - 1}", id=f"t{i}"))
+    return messages
+
+
+async def _run(name: str, serde, workdir: Path) -> list[str]:
+    pool = SqliteConnectionPool(workdir / f"{name}.db", pool_size=2)
+    saver = PooledSqliteSaver(pool, serde=serde)
+    await saver.setup()
+    rng = random.Random(42)
+    lines = []
+
+    for size in THREAD_SIZES:
+        write_times, read_times = [], []
+        for t in range(THREADS_PER_SIZE):
+            thread_id = f"{size}-{t}"
+            messages = _messages(rng, size)
+            config = {"configurable": {"thread_id": thread_id, "checkpoint_ns": ""}}
+            # 模拟一次运行中最后若干个 super-step：消息列表逐步增长到 size
+            for step in range(CHECKPOINTS_PER_THREAD):
+                checkpoint = empty_checkpoint()
+                count = size - CHECKPOINTS_PER_THREAD + step + 1
+                checkpoint["channel_values"] = {"messages": messages[:count]}
+                checkpoint["channel_versions"] = {"messages": step + 1}
+                start = time.perf_counter()
+                config = await saver.aput(config, checkpoint, {"step": step}, {})
+                write_times.append(time.perf_counter() - start)
+
+            for _ in range(5):
+                start = time.perf_counter()
+                await saver.aget_tuple({"configurable": {"thread_id": thread_id, "checkpoint_ns": ""}})
+                read_times.append(time.perf_counter() - start)
+
+        async with pool.acquire() as conn:
+            async with conn.execute(
+                "SELECT SUM(LENGTH(checkpoint)) FROM checkpoints WHERE thread_id LIKE ?", (f"{size}-%",)
+            ) as cur:
+                stored = (await cur.fetchone())[0] or 0
+
+        lines.append(
+            f"{name:<16} {size:>5} msgs  "
+            f"write p50 {statistics.median(write_times) * 1000:8.2f} ms  "
+            f"read p50 {statistics.median(read_times) * 1000:8.2f} ms  "
+            f"bytes {stored / (THREADS_PER_SIZE * CHECKPOINTS_PER_THREAD) / 1024:10.1f} KiB/checkpoint"
+        )
+
+    await pool.close()
+    return lines
+
+
+async def main() -> None:
+    with tempfile.TemporaryDirectory() as tmp:
+        workdir = Path(tmp)
+        candidates = {
+            "jsonplus": JsonPlusSerializer(),
+            "zstd": CompressedSerializer(),
+            "zstd+dict": CompressedSerializer(dict_dir=workdir / "dicts", dict_samples=32),
+        }
+        for name, serde in candidates.items():
+            for line in await _run(name, serde, workdir):
+                print(line)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
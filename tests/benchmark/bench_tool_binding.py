@@ -0,0 +1,74 @@
+"""Benchmark per-call tool binding overhead with and without the tool schema cache
+
+create_agent calls model.bind_tools on every model call. This compares binding the
+raw LangChain tools (schemas regenerated each time) against binding the cached
+OpenAI-format schemas from ToolSchemaCache, for 10 / 50 / 200 tools.
+
+Run with:
+    python -m tests.benchmark.bench_tool_binding
+"""
+import statistics
+import time
+
+from langchain_core.tools import StructuredTool
+from langchain_openai import ChatOpenAI
+from pydantic import BaseModel, Field, create_model
+
+from app.agents.common.tool_schema import ToolSchemaCache
+
+TOOL_COUNTS = (10, 50, 200)
+CALLS = 50
+
+
+class Filters(BaseModel):
+    start: str | None = Field(None, description="Start date, ISO format")
+    end: str | None = Field(None, description="End date, ISO format")
+    tags: list[str] = Field(default_factory=list, description="Tags to match")
+
+
+def _tools(count: int) -> list[StructuredTool]:
+    tools = []
+    for i in range(count):
+        args = create_model(
+            f"Tool{i}Args",
+            query=(str, Field(description="Search query")),
+            limit=(int, Field(10, description="Maximum number of results")),
+            filters=(Filters | None, Field(None, description="Optional filters")),
+        )
+        tools.append(
+            StructuredTool.from_function(
+                func=lambda **kwargs: "ok",
+                name=f"tool_{i}",
+                description=f"Synthetic tool number {i} used to measure binding overhead.",
+                args_schema=args,
+            )
+        )
+    return tools
+
+
+def _measure(model: ChatOpenAI, make_tools) -> float:
+    times = []
+    for _ in range(CALLS):
+        start = time.perf_counter()
+        model.bind_tools(make_tools())
+        times.append(time.perf_counter() - start)
+    return statistics.median(times)
+
+
+def main() -> None:
+    model = ChatOpenAI(model="gpt-bench", api_key="sk-bench", base_url="http://localhost:1")
+    for count in TOOL_COUNTS:
+        tools = _tools(count)
+        cache = ToolSchemaCache(max_size=4096)
+        raw = _measure(model, lambda: tools)
+        cached = _measure(model, lambda: cache.convert(tools))
+        print(
+            f"{count:>4} tools  "
+            f"raw p50 {raw * 1000:8.3f} ms  "
+            f"cached p50 {cached * 1000:8.3f} ms  "
+            f"speedup {raw / cached:6.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+"""Test manifest-driven agent registry"""
+import asyncio
+import time
+
+import pytest
+
+from app.agents import agent_manager
+
+
+def test_manifest_is_read_without_importing(tmp_path):
+    """Test metadata.toml entries are turned into lazy agent specs"""
+    (tmp_path / "metadata.toml").write_text(
+        'entry = "graph:FooAgent"\nname = "Foo"\ndescription = "foo agent"\n', encoding="utf-8"
+    )
+    spec = agent_manager._read_manifest(tmp_path)
+    assert spec.id == "FooAgent"
+    assert spec.module == f"app.agents.{tmp_path.name}.graph"
+    assert spec.metadata["name"] == "Foo"
+
+
+def test_builtin_agents_are_registered():
+    """Test bundled agents are discovered from their manifests"""
+    ids = agent_manager.get_agent_ids()
+    assert "DeepAgent" in ids
+    assert "MiniAgent" in ids
+
+
+class FallbackAgent:
+    """Stands in for an agent found by importing a directory without metadata.toml"""
+
+    name = "Fallback"
+    description = "no manifest"
+
+    def __init__(self):
+        time.sleep(0.3)  # slow import / construction
+
+
+def test_listing_includes_agents_without_manifest(monkeypatch):
+    """Test agents registered through the import fallback are listed too"""
+    monkeypatch.setitem(agent_manager._classes, "FallbackAgent", FallbackAgent)
+    listed = {agent["id"]: agent for agent in agent_manager.list_agents()}
+    assert {"DeepAgent", "MiniAgent", "FallbackAgent"} <= set(listed)
+    assert listed["FallbackAgent"]["name"] == "Fallback" and not listed["FallbackAgent"]["loaded"]
+
+
+@pytest.mark.asyncio
+async def test_async_loading_keeps_the_event_loop_free(monkeypatch):
+    """Test loading an agent runs in a worker thread while the loop keeps serving"""
+    monkeypatch.setitem(agent_manager._classes, "FallbackAgent", FallbackAgent)
+    ticks = 0
+
+    async def ticker():
+        nonlocal ticks
+        while True:
+            ticks += 1
+            await asyncio.sleep(0.01)
+
+    task = asyncio.create_task(ticker())
+    try:
+        agent = await agent_manager.aget_agent("FallbackAgent")
+    finally:
+        task.cancel()
+        agent_manager._instances.pop("FallbackAgent", None)
+    assert isinstance(agent, FallbackAgent)
+    assert ticks > 5
@@ -0,0 +1,68 @@
+"""Test agent stream coalescing"""
+import asyncio
+import json
+from types import SimpleNamespace
+
+import pytest
+
+from app.services.agent_stream import StreamCoalescer, encode_ndjson, encode_sse
+
+
+def chunk(text="", msg_id="m1", tool_call_chunks=None):
+    return SimpleNamespace(type="AIMessageChunk", id=msg_id, content=text, tool_call_chunks=tool_call_chunks or [])
+
+
+META = {"langgraph_node": "model"}
+
+
+def test_text_and_tool_call_chunks_are_merged():
+    """Test consecutive chunks collapse into single delta and tool_call events"""
+    coalescer = StreamCoalescer(flush_tokens=100)
+    for text in ["Hel", "lo", " world"]:
+        coalescer.add(chunk(text), META)
+    coalescer.add(chunk(tool_call_chunks=[{"index": 0, "id": "c1", "name": "calc", "args": '{"a":'}]), META)
+    coalescer.add(chunk(tool_call_chunks=[{"index": 0, "id": None, "name": None, "args": " 1}"}]), META)
+    coalescer.add(SimpleNamespace(type="tool", id="t1", content="1", name="calc", tool_call_id="c1"), {"langgraph_node": "tools"})
+
+    events = coalescer.drain()
+    assert events == [
+        {"type": "delta", "id": "m1", "node": "model", "text": "Hello world"},
+        {"type": "tool_call", "id": "m1", "index": 0, "tool_call_id": "c1", "name": "calc", "args": '{"a": 1}'},
+        {"type": "message", "id": "t1", "node": "tools", "role": "tool", "content": "1", "name": "calc", "tool_call_id": "c1"},
+    ]
+    assert coalescer.drain() == []
+
+
+def test_encoders_are_compact():
+    """Test SSE and NDJSON framing"""
+    event = {"type": "delta", "id": "m1", "text": "你好"}
+    assert encode_sse(event) == 'event: delta\ndata: {"type":"delta","id":"m1","text":"你好"}\n\n'
+    assert json.loads(encode_ndjson(event)) == event
+
+
+@pytest.mark.asyncio
+async def test_stream_flushes_on_token_threshold():
+    """Test a fast producer is flushed in token-sized batches"""
+    async def source():
+        for i in range(10):
+            yield chunk(str(i)), META
+
+    batches = [batch async for batch in StreamCoalescer(flush_ms=10_000, flush_tokens=4, queue_size=2).stream(source())]
+    assert "".join(event["text"] for batch in batches for event in batch) == "0123456789"
+    assert len(batches) < 10
+
+
+@pytest.mark.asyncio
+async def test_stream_flushes_on_interval_and_propagates_errors():
+    """Test a slow producer is flushed by the timer and errors reach the consumer"""
+    async def source():
+        yield chunk("a"), META
+        await asyncio.sleep(0.05)
+        raise RuntimeError("boom")
+
+    coalescer = StreamCoalescer(flush_ms=10, flush_tokens=100)
+    batches = []
+    with pytest.raises(RuntimeError):
+        async for batch in coalescer.stream(source()):
+            batches.append(batch)
+    assert batches == [[{"type": "delta", "id": "m1", "node": "model", "text": "a"}]]
@@ -0,0 +1,37 @@
+"""Test attachment chunking and BM25 retrieval"""
+from app.agents.common.attachment_index import build_index, chunk_markdown, tokenize
+
+
+def test_tokenize_mixed_text():
+    """Test ASCII words and CJK bigrams"""
+    assert tokenize("BM25 检索算法") == ["bm25", "检索", "索算", "算法"]
+    assert tokenize("字") == ["字"]
+
+
+def test_chunks_keep_heading_and_line():
+    """Test chunks are bounded and carry their section heading"""
+    markdown = "# 第一章\n\n" + "\n".join(f"段落 {i} " + "内容" * 20 for i in range(20)) + "\n\n# 第二章\n\n结尾"
+    chunks = chunk_markdown(markdown, max_tokens=100)
+    assert len(chunks) > 2
+    assert all(text.startswith("# 第一章") for _, text in chunks[:-1])
+    assert chunks[-1] == (markdown.splitlines().index("# 第二章"), "# 第二章\n\n结尾")
+
+
+def test_search_ranks_relevant_chunks():
+    """Test the chunk mentioning the query terms is returned, under the budget"""
+    attachments = [
+        {"status": "parsed", "file_name": "a.md", "markdown": "\n\n".join(
+            ["## 营收\n\n公司营收同比增长百分之二十。", "## 人员\n\n员工总数三百人。"] + ["无关内容" * 30] * 10
+        )},
+        {"status": "parsed", "file_name": "b.md", "markdown": "## 风险\n\n汇率风险较高。"},
+    ]
+    index = build_index(attachments, chunk_tokens=50)
+    chunks = index.search("公司营收增长了多少？", top_k=2, max_tokens=1000)
+    assert chunks[0]["attachment"] == 1 and "营收" in chunks[0]["text"]
+    assert len(chunks) <= 2
+
+    # 没有命中时返回每个附件开头的片段
+    fallback = index.search("hello", top_k=5, max_tokens=1000)
+    assert [chunk["attachment"] for chunk in fallback] == [1, 2]
+    truncated = index.search("营收", top_k=5, max_tokens=5)
+    assert len(truncated) == 1 and truncated[0]["tokens"] <= 5
@@ -0,0 +1,48 @@
+"""Test attachment prompt rendering and caching"""
+from app.agents.common.middlewares.attachment_middleware import (
+    AttachmentPromptCache,
+    _build_attachment_prompt,
+    attachments_digest,
+    estimate_tokens,
+)
+
+
+def _attachment(name: str, markdown: str) -> dict:
+    return {"status": "parsed", "file_name": name, "markdown": markdown}
+
+
+def test_digest_depends_on_content():
+    """Test equal attachment lists share a digest"""
+    first = [_attachment("a.md", "hello")]
+    assert attachments_digest(first) == attachments_digest([dict(first[0])])
+    assert attachments_digest(first) != attachments_digest([_attachment("a.md", "hello!")])
+
+
+def test_estimate_tokens():
+    """Test ASCII and CJK text are weighted differently"""
+    assert estimate_tokens("abcdefgh") == 2
+    assert estimate_tokens("你好") == 2
+
+
+def test_truncation_is_deterministic_and_capped():
+    """Test long attachments are cut to the budget, earlier ones kept first"""
+    attachments = [
+        _attachment("a.md", "\n".join(f"line {i} " + "x" * 40 for i in range(500))),
+        _attachment("b.md", "第二个附件" * 2000),
+    ]
+    prompt = _build_attachment_prompt(attachments, max_tokens=1000)
+    assert estimate_tokens(prompt) <= 1000
+    assert "附件 1: a.md" in prompt and "已截断" in prompt
+    assert prompt == _build_attachment_prompt(attachments, max_tokens=1000)
+    assert "第二个附件" * 2000 in _build_attachment_prompt(attachments)
+
+
+def test_cache_renders_once():
+    """Test a digest is rendered once and evicted by LRU"""
+    cache = AttachmentPromptCache(max_size=1)
+    attachments = [_attachment("a.md", "hello")]
+    prompt, tokens = cache.get_or_render("d1", attachments)
+    assert "hello" in prompt and tokens == estimate_tokens(prompt)
+    assert cache.get_or_render("d1", []) == (prompt, tokens)
+    cache.get_or_render("d2", [])
+    assert cache.get_or_render("d1", []) == (None, 0)
@@ -0,0 +1,197 @@
+"""Test the write-behind buffer and the MySQL / Redis checkpointers"""
+import asyncio
+from contextlib import asynccontextmanager
+
+import pytest
+from fakeredis import FakeAsyncRedis
+from langgraph.checkpoint.base import ERROR, INTERRUPT, empty_checkpoint
+from sqlalchemy.dialects import mysql
+
+from app.agents.common.checkpoint import MySQLSaver, RedisSaver
+
+
+def _config(thread_id: str, checkpoint_id: str | None = None) -> dict:
+    configurable = {"thread_id": thread_id, "checkpoint_ns": ""}
+    if checkpoint_id:
+        configurable["checkpoint_id"] = checkpoint_id
+    return {"configurable": configurable}
+
+
+@pytest.fixture
+def client():
+    return FakeAsyncRedis()
+
+
+def _saver(client, **kwargs) -> RedisSaver:
+    kwargs.setdefault("flush_interval", 60)
+    return RedisSaver(client, prefix="cp", **kwargs)
+
+
+async def _stored_checkpoints(client, thread_id: str = "t1") -> int:
+    return await client.zcard(f"cp:{thread_id}::index")
+
+
+@pytest.mark.asyncio
+async def test_write_behind_flushes_on_interval(client):
+    """Test buffered checkpoints are written by the background flush"""
+    saver = _saver(client, flush_interval=0.05)
+    await saver.aput(_config("t1"), empty_checkpoint(), {"step": 0}, {})
+    assert await _stored_checkpoints(client) == 0
+
+    await asyncio.sleep(0.2)
+    assert await _stored_checkpoints(client) == 1
+    assert not saver._pending_checkpoints and saver._buffered_rows == 0
+    await saver.aclose()
+
+
+@pytest.mark.asyncio
+async def test_write_behind_flushes_on_row_threshold(client):
+    """Test reaching max_buffered_rows flushes synchronously"""
+    saver = _saver(client, max_buffered_rows=3)
+    config = await saver.aput(_config("t1"), empty_checkpoint(), {"step": 0}, {})
+    await saver.aput_writes(config, [("messages", "hi")], task_id="task-1")
+    assert await _stored_checkpoints(client) == 0
+
+    await saver.aput_writes(config, [("messages", "there")], task_id="task-2")
+    assert await _stored_checkpoints(client) == 1
+    assert await client.hlen(f"cp:t1::w:{config['configurable']['checkpoint_id']}") == 2
+    await saver.aclose()
+
+
+@pytest.mark.asyncio
+async def test_failed_flush_restores_buffer(client, monkeypatch):
+    """Test rows stay buffered after a failed flush and newer rows win"""
+    saver = _saver(client)
+    config = await saver.aput(_config("t1"), empty_checkpoint(), {"step": 0}, {})
+    await saver.aput_writes(config, [("messages", "hi")], task_id="task-1")
+
+    write_batch = saver._write_batch
+
+    async def broken(checkpoints, writes):
+        raise ConnectionError("redis down")
+
+    monkeypatch.setattr(saver, "_write_batch", broken)
+    with pytest.raises(ConnectionError):
+        await saver.aflush()
+    assert saver._buffered_rows == 2
+    assert len(saver._pending_checkpoints[("t1", "")]) == 1
+
+    monkeypatch.setattr(saver, "_write_batch", write_batch)
+    result = await saver.aget_tuple(config)
+    assert result.pending_writes == [("task-1", "messages", "hi")]
+    assert saver._buffered_rows == 0
+    await saver.aclose()
+
+
+@pytest.mark.asyncio
+async def test_put_writes_insert_vs_replace(client):
+    """Test regular writes keep the first value while special channels are replaced"""
+    saver = _saver(client)
+    config = await saver.aput(_config("t1"), empty_checkpoint(), {"step": 0}, {})
+
+    await saver.aput_writes(config, [("messages", "first")], task_id="task-1")
+    await saver.aflush()
+    await saver.aput_writes(config, [("messages", "second")], task_id="task-1")
+    await saver.aput_writes(config, [(ERROR, "boom")], task_id="task-2")
+    await saver.aflush()
+    await saver.aput_writes(config, [(ERROR, "boom again")], task_id="task-2")
+
+    result = await saver.aget_tuple(config)
+    assert result.pending_writes == [("task-1", "messages", "first"), ("task-2", ERROR, "boom again")]
+    await saver.aclose()
+
+
+@pytest.mark.asyncio
+async def test_list_before_and_limit(client):
+    """Test alist pages backwards with before and limit"""
+    saver = _saver(client)
+    config, ids = _config("t1"), []
+    for step in range(4):
+        config = await saver.aput(config, empty_checkpoint(), {"step": step}, {})
+        ids.append(config["configurable"]["checkpoint_id"])
+
+    items = [item async for item in saver.alist(_config("t1"), limit=2)]
+    assert [item.checkpoint["id"] for item in items] == [ids[3], ids[2]]
+
+    items = [item async for item in saver.alist(_config("t1"), before=_config("t1", ids[2]), limit=1)]
+    assert [item.checkpoint["id"] for item in items] == [ids[1]]
+
+    items = [item async for item in saver.alist(_config("t1"), filter={"step": 0})]
+    assert [item.checkpoint["id"] for item in items] == [ids[0]]
+    await saver.aclose()
+
+
+@pytest.mark.asyncio
+async def test_delete_thread_keeps_prefixed_threads(client):
+    """Test deleting a thread leaves threads whose id starts with "{thread_id}:" alone"""
+    saver = _saver(client)
+    await saver.aput(_config("t1"), empty_checkpoint(), {"step": 0}, {})
+    await saver.aput(_config("t1:x"), empty_checkpoint(), {"step": 0}, {})
+    await saver.aflush()
+
+    await saver.adelete_thread("t1")
+    assert await saver.aget_tuple(_config("t1")) is None
+    assert await saver.aget_tuple(_config("t1:x")) is not None
+    await saver.aclose()
+
+
+class FakeMySQLEngine:
+    """Records the statements MySQLSaver executes, compiled for MySQL"""
+
+    def __init__(self):
+        self.statements: list[tuple[str, list]] = []
+
+    @asynccontextmanager
+    async def begin(self):
+        yield self
+
+    connect = begin
+
+    async def execute(self, stmt, params=None):
+        self.statements.append((str(stmt.compile(dialect=mysql.dialect())), params))
+
+
+@pytest.mark.asyncio
+async def test_mysql_write_batch_statements():
+    """Test special writes upsert, regular writes insert-ignore and checkpoints upsert in one transaction"""
+    engine = FakeMySQLEngine()
+    saver = MySQLSaver(engine, flush_interval=60)
+    saver._is_setup = True
+    config = await saver.aput(_config("t1"), empty_checkpoint(), {"step": 0}, {})
+    await saver.aput_writes(config, [("messages", "hi")], task_id="task-1")
+    await saver.aput_writes(config, [(ERROR, "boom")], task_id="task-2")
+    await saver.aflush()
+
+    (upsert, upsert_rows), (insert, insert_rows), (checkpoint, checkpoint_rows) = engine.statements
+    assert upsert.startswith("INSERT INTO agent_checkpoint_writes") and "ON DUPLICATE KEY UPDATE" in upsert
+    assert [row["channel"] for row in upsert_rows] == [ERROR]
+    assert insert.startswith("INSERT IGNORE INTO agent_checkpoint_writes")
+    assert [row["channel"] for row in insert_rows] == ["messages"]
+    assert "replace" not in insert_rows[0]
+    assert checkpoint.startswith("INSERT INTO agent_checkpoints") and "ON DUPLICATE KEY UPDATE" in checkpoint
+    assert checkpoint_rows[0]["checkpoint_id"] == config["configurable"]["checkpoint_id"]
+
+
+@pytest.mark.asyncio
+async def test_redis_prune_pages_thread_index_and_keeps_interrupts(client):
+    """Test retention pages through the thread index, keeps interrupts and drops expired threads"""
+    saver = _saver(client)
+    interrupted = None
+    for thread_id in ("a", "b", "c"):
+        config = _config(thread_id)
+        for step in range(3):
+            config = await saver.aput(config, empty_checkpoint(), {"step": step}, {})
+            if thread_id == "b" and step == 0:
+                interrupted = config["configurable"]["checkpoint_id"]
+                await saver.aput_writes(config, [(INTERRUPT, "approve?")], task_id="task-1")
+    await saver.aflush()
+    await client.zadd("cp:threads", {"expired": 0})
+
+    stats = await saver.aprune(keep_last=1, batch_size=2)
+    assert stats["threads_scanned"] == 3
+    assert stats["checkpoints_deleted"] == 5
+    assert await client.zrange("cp:threads", 0, -1) == [b"a", b"b", b"c"]
+    items = [item.checkpoint["id"] async for item in saver.alist(_config("b"))]
+    assert len(items) == 2 and interrupted in items
+    assert await saver._list_interrupt_keys("b") == {("", interrupted)}
+    await saver.aclose()
@@ -0,0 +1,66 @@
+"""Test delta-encoded checkpoints"""
+import pytest
+from langgraph.checkpoint.base import empty_checkpoint
+from langgraph.checkpoint.serde.jsonplus import JsonPlusSerializer
+
+from app.agents.common.checkpoint import PooledSqliteSaver, SqliteConnectionPool
+from app.agents.common.checkpoint.base import CheckpointRow
+from app.agents.common.checkpoint.delta import DeltaCodec
+
+
+def _checkpoint(messages: list[str], version: int) -> dict:
+    checkpoint = empty_checkpoint()
+    checkpoint["channel_values"] = {"messages": list(messages), "step": version}
+    checkpoint["channel_versions"] = {"messages": version, "step": version}
+    return checkpoint
+
+
+@pytest.mark.asyncio
+async def test_codec_round_trip_with_fresh_cache():
+    """Test a delta chain decodes correctly without the writer's cache"""
+    serde = JsonPlusSerializer()
+    writer = DeltaCodec(serde, snapshot_interval=4)
+    rows: dict[str, CheckpointRow] = {}
+
+    parent_id, messages, expected = None, [], []
+    for step in range(10):
+        messages = messages + [f"message {step}"]
+        checkpoint = _checkpoint(messages, step)
+        type_, blob = writer.encode("t1", "", parent_id, checkpoint)
+        rows[checkpoint["id"]] = CheckpointRow("t1", "", checkpoint["id"], parent_id, type_, blob, b"{}")
+        expected.append(checkpoint)
+        parent_id = checkpoint["id"]
+
+    types = [row.type for row in rows.values()]
+    assert not DeltaCodec.is_delta(types[0])
+    assert not DeltaCodec.is_delta(types[4])
+    assert DeltaCodec.is_delta(types[3])
+
+    async def load_row(thread_id, checkpoint_ns, checkpoint_id):
+        return rows.get(checkpoint_id)
+
+    reader = DeltaCodec(serde, snapshot_interval=4)
+    for checkpoint in expected:
+        loaded = await reader.load(rows[checkpoint["id"]], load_row)
+        assert loaded["channel_values"] == checkpoint["channel_values"]
+
+
+@pytest.mark.asyncio
+async def test_saver_reads_delta_rows(tmp_path):
+    """Test the saver stores deltas and returns full checkpoints"""
+    pool = SqliteConnectionPool(tmp_path / "history.db", pool_size=2)
+    saver = PooledSqliteSaver(pool, delta_snapshot_interval=5)
+    await saver.setup()
+
+    config = {"configurable": {"thread_id": "t1", "checkpoint_ns": ""}}
+    messages = []
+    for step in range(3):
+        messages = messages + [f"message {step}"]
+        config = await saver.aput(config, _checkpoint(messages, step), {"step": step}, {})
+
+    # 新实例没有缓存，需要沿增量链回溯
+    reader = PooledSqliteSaver(pool)
+    latest = await reader.aget_tuple({"configurable": {"thread_id": "t1", "checkpoint_ns": ""}})
+    assert latest.checkpoint["channel_values"]["messages"] == messages
+    assert len([item async for item in reader.alist(None)]) == 3
+    await pool.close()
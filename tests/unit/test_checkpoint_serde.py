@@ -0,0 +1,41 @@
+"""Test compressed checkpoint serializer"""
+from langgraph.checkpoint.serde.jsonplus import JsonPlusSerializer
+
+from app.agents.common.checkpoint.serde import CompressedSerializer
+
+
+def _payload(i: int) -> dict:
+    return {"messages": [f"user question {i} about the weather report"] * 40, "step": i}
+
+
+def test_round_trip_and_legacy_rows():
+    """Test compressed values round-trip and uncompressed rows are still readable"""
+    serde = CompressedSerializer()
+    type_, blob = serde.dumps_typed(_payload(1))
+    assert type_.startswith(("zstd+", "zlib+"))
+    assert serde.loads_typed((type_, blob)) == _payload(1)
+
+    legacy = JsonPlusSerializer().dumps_typed(_payload(2))
+    assert serde.loads_typed(legacy) == _payload(2)
+
+
+def test_small_values_are_not_compressed():
+    """Test values below the size threshold are stored as is"""
+    serde = CompressedSerializer(min_size=1024)
+    assert serde.dumps_typed({"step": 1}) == JsonPlusSerializer().dumps_typed({"step": 1})
+
+
+def test_trained_dictionary_is_reused(tmp_path):
+    """Test a trained dictionary is persisted and used by a new serializer"""
+    serde = CompressedSerializer(dict_dir=tmp_path, dict_size=4096, dict_samples=64)
+    if serde.algorithm != "zstd":
+        return
+    blobs = [serde.dumps_typed(_payload(i)) for i in range(64)]
+    serde._trainer.join(timeout=10)  # trained in a background thread
+    blobs += [serde.dumps_typed(_payload(i)) for i in range(64, 80)]
+    assert serde.dict_id
+    assert [path.name for path in tmp_path.iterdir()] == [f"{serde.dict_id}.zdict"]
+
+    reader = CompressedSerializer(dict_dir=tmp_path)
+    assert reader.dict_id == serde.dict_id
+    assert [reader.loads_typed(blob) for blob in blobs] == [_payload(i) for i in range(80)]
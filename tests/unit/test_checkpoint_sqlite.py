@@ -0,0 +1,91 @@
+"""Test pooled SQLite checkpointer"""
+import pytest
+from langgraph.checkpoint.base import empty_checkpoint
+
+from app.agents.common.checkpoint import PooledSqliteSaver, SqliteConnectionPool
+
+
+@pytest.fixture
+async def saver(tmp_path):
+    pool = SqliteConnectionPool(tmp_path / "history.db", pool_size=2)
+    saver = PooledSqliteSaver(pool)
+    await saver.setup()
+    yield saver
+    await pool.close()
+
+
+def _config(thread_id: str, checkpoint_id: str | None = None) -> dict:
+    configurable = {"thread_id": thread_id, "checkpoint_ns": ""}
+    if checkpoint_id:
+        configurable["checkpoint_id"] = checkpoint_id
+    return {"configurable": configurable}
+
+
+@pytest.mark.asyncio
+async def test_put_and_get_latest(saver):
+    """Test the latest checkpoint is returned for a thread"""
+    first = empty_checkpoint()
+    config = await saver.aput(_config("t1"), first, {"step": 0}, {})
+
+    second = empty_checkpoint()
+    await saver.aput(config, second, {"step": 1}, {})
+
+    latest = await saver.aget_tuple(_config("t1"))
+    assert latest.checkpoint["id"] == second["id"]
+    assert latest.parent_config["configurable"]["checkpoint_id"] == first["id"]
+    assert latest.metadata["step"] == 1
+
+
+@pytest.mark.asyncio
+async def test_pending_writes_visible_before_next_checkpoint(saver):
+    """Test buffered writes are flushed on read"""
+    checkpoint = empty_checkpoint()
+    config = await saver.aput(_config("t2"), checkpoint, {"step": 0}, {})
+
+    await saver.aput_writes(config, [("messages", "hello")], task_id="task-1")
+    assert saver._pending_writes
+
+    result = await saver.aget_tuple(config)
+    assert result.pending_writes == [("task-1", "messages", "hello")]
+    assert not saver._pending_writes
+
+
+@pytest.mark.asyncio
+async def test_list_and_delete_thread(saver):
+    """Test listing checkpoints and deleting a thread"""
+    config = _config("t3")
+    for step in range(3):
+        config = await saver.aput(config, empty_checkpoint(), {"step": step}, {})
+
+    items = [item async for item in saver.alist(_config("t3"), limit=2)]
+    assert [item.metadata["step"] for item in items] == [2, 1]
+
+    await saver.adelete_thread("t3")
+    assert await saver.aget_tuple(_config("t3")) is None
+
+
+@pytest.mark.asyncio
+async def test_prune_keeps_latest_and_rewrites_delta_base(tmp_path):
+    """Test pruning keeps the latest checkpoints readable when they are delta encoded"""
+    pool = SqliteConnectionPool(tmp_path / "prune.db", pool_size=2)
+    writer = PooledSqliteSaver(pool, delta_snapshot_interval=50)
+    await writer.setup()
+
+    config, messages = _config("t1"), []
+    for step in range(10):
+        messages = messages + [f"message {step}"]
+        checkpoint = empty_checkpoint()
+        checkpoint["channel_values"] = {"messages": messages}
+        checkpoint["channel_versions"] = {"messages": step + 1}
+        config = await writer.aput(config, checkpoint, {"step": step}, {})
+
+    stats = await PooledSqliteSaver(pool).aprune(keep_last=3, batch_size=2)
+    assert stats["checkpoints_deleted"] == 7
+    assert stats["snapshots_rewritten"] == 1
+
+    reader = PooledSqliteSaver(pool)
+    history = [item async for item in reader.alist(_config("t1"))]
+    assert len(history) == 3
+    assert history[-1].checkpoint["channel_values"]["messages"] == messages[:8]
+    assert history[0].checkpoint["channel_values"]["messages"] == messages
+    await pool.close()
@@ -0,0 +1,36 @@
+"""Test cached agent configuration loading"""
+import os
+
+from app.agents.common import context as context_module
+from app.agents.common.context import BaseContext, load_config_file
+
+
+def test_config_file_cache_tracks_changes(tmp_path):
+    """Test cached config is reused until the file changes"""
+    path = tmp_path / "config.yaml"
+    path.write_text("model: a\n", encoding="utf-8")
+    first = load_config_file(path)
+    assert first == {"model": "a"}
+
+    first["model"] = "mutated"
+    assert load_config_file(path) == {"model": "a"}
+
+    path.write_text("model: bb\n", encoding="utf-8")
+    os.utime(path, ns=(1, 1))
+    assert load_config_file(path) == {"model": "bb"}
+
+
+def test_save_to_file_invalidates_cache(tmp_path, monkeypatch):
+    """Test saving a config is visible to the next from_file call"""
+    monkeypatch.setattr(context_module, "SAVE_DIR", str(tmp_path))
+    BaseContext.save_to_file({"model": "first"}, module_name="demo")
+    assert BaseContext.from_file(module_name="demo").model == "first"
+    BaseContext.save_to_file({"model": "second"}, module_name="demo")
+    assert BaseContext.from_file(module_name="demo").model == "second"
+
+
+def test_configurable_items_are_memoized_copies():
+    """Test configurable items are cached per class but returned as copies"""
+    items = BaseContext.get_configurable_items()
+    items["model"].description = "changed"
+    assert BaseContext.get_configurable_items()["model"].description != "changed"
@@ -0,0 +1,89 @@
+"""Test memoized tool selection in DynamicToolMiddleware"""
+import sys
+from types import SimpleNamespace
+
+import pytest
+
+from app.agents.common.middlewares import dynamic_tool_middleware
+from app.agents.common.middlewares.dynamic_tool_middleware import DynamicToolMiddleware
+
+
+def _tool(name: str) -> SimpleNamespace:
+    return SimpleNamespace(name=name)
+
+
+def test_resolve_keeps_registration_order_and_memoizes(monkeypatch):
+    """Test selection order does not matter and results are cached"""
+    monkeypatch.setattr(dynamic_tool_middleware, "mcp_generation", lambda: 0)
+    tools = [_tool("a"), _tool("b"), _tool("c")]
+    middleware = DynamicToolMiddleware(base_tools=tools)
+    middleware._all_mcp_tools["srv"] = [_tool("mcp__srv__x")]
+
+    first = middleware.resolve_tools(["c", "a", "missing"], ["srv"])
+    assert [tool.name for tool in first] == ["a", "c", "mcp__srv__x"]
+    assert middleware.resolve_tools(["missing", "a", "c"], ["srv"]) is first
+    assert middleware.resolve_tools(None, None) == []
+
+
+def test_cache_invalidated_on_reload(monkeypatch):
+    """Test new registrations and MCP generation changes drop cached selections"""
+    generation = [0]
+    monkeypatch.setattr(dynamic_tool_middleware, "mcp_generation", lambda: generation[0])
+    middleware = DynamicToolMiddleware(base_tools=[_tool("a")])
+
+    first = middleware.resolve_tools(["a", "b"], [])
+    assert [tool.name for tool in first] == ["a"]
+
+    middleware.tools.append(_tool("b"))
+    assert [tool.name for tool in middleware.resolve_tools(["a", "b"], [])] == ["a", "b"]
+
+    cached = middleware.resolve_tools(["a", "b"], [])
+    generation[0] += 1
+    assert middleware.resolve_tools(["a", "b"], []) is not cached
+
+
+@pytest.mark.asyncio
+async def test_mcp_reload_refetches_preloaded_servers(monkeypatch):
+    """Test an MCP generation change replaces the pre-loaded tools with the re-fetched ones"""
+    generation = [0]
+    served = {"srv": [_tool("mcp__srv__old")]}
+
+    async def fake_get_mcp_tools(name):
+        return served[name]
+
+    monkeypatch.setattr(dynamic_tool_middleware, "mcp_generation", lambda: generation[0])
+    monkeypatch.setitem(sys.modules, "app.services.mcp_service", SimpleNamespace(get_mcp_tools=fake_get_mcp_tools))
+    middleware = DynamicToolMiddleware(base_tools=[_tool("a")], mcp_servers=["srv"])
+    await middleware.initialize_mcp_tools()
+    old = middleware.resolve_tools(["a"], ["srv"])
+    assert [tool.name for tool in old] == ["a", "mcp__srv__old"]
+
+    new_tool = _tool("mcp__srv__new")
+    served["srv"] = [new_tool]
+    generation[0] += 1
+    await middleware._refresh_mcp_tools()
+
+    assert [tool.name for tool in middleware.tools] == ["a", "mcp__srv__new"]
+    assert middleware.resolve_tools(["a"], ["srv"]) == [middleware.tools[0], new_tool]
+
+    async def handler(request):
+        return request.tool
+
+    request = SimpleNamespace(tool_call={"name": "mcp__srv__new"}, tool=None)
+    request.override = lambda **kwargs: SimpleNamespace(**{**vars(request), **kwargs})
+    assert await middleware.awrap_tool_call(request, handler) is new_tool
+
+
+def test_unknown_names_do_not_grow_the_cache(monkeypatch):
+    """Test client-supplied unknown names share one entry and the cache is bounded"""
+    monkeypatch.setattr(dynamic_tool_middleware, "mcp_generation", lambda: 0)
+    monkeypatch.setattr(dynamic_tool_middleware, "_RESOLVED_CACHE_SIZE", 2)
+    middleware = DynamicToolMiddleware(base_tools=[_tool("a"), _tool("b"), _tool("c")])
+
+    for i in range(50):
+        middleware.resolve_tools(["a", f"junk-{i}"], [f"srv-{i}"])
+    assert list(middleware._resolved) == [(("a",), ())]
+
+    for selected in (["a"], ["b"], ["c"]):
+        middleware.resolve_tools(selected, [])
+    assert list(middleware._resolved) == [(("b",), ()), (("c",), ())]
@@ -0,0 +1,172 @@
+"""Test dispatching tool calls while the model is still streaming"""
+import asyncio
+import json
+import time
+
+import pytest
+from langchain.agents import create_agent
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, HumanMessage, ToolMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from langchain_core.tools import tool
+from langgraph.checkpoint.memory import InMemorySaver
+
+from app.agents.common.context import BaseContext
+from app.agents.common.middlewares.eager_tool_middleware import EagerToolDispatchMiddleware, _Dispatched
+from app.agents.common.middlewares.parallel_tool_middleware import ParallelToolMiddleware
+from app.agents.demo_agent import graph as demo_graph
+from app.agents.demo_agent.graph import MiniAgent
+from app.core.config import settings
+
+
+class StreamingToolModel(BaseChatModel):
+    """Streams two tool calls with a delay after each, then answers"""
+
+    delay: float = 0.2
+    turn: int = 0
+
+    @property
+    def _llm_type(self) -> str:
+        return "streaming-tool-model"
+
+    def bind_tools(self, tools, **kwargs):
+        return self
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        raise NotImplementedError
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs):
+        chunks = [chunk async for chunk in self._astream(messages)]
+        message = chunks[0].message
+        for chunk in chunks[1:]:
+            message += chunk.message
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(**message.model_dump(exclude={"type"})))])
+
+    async def _astream(self, messages, stop=None, run_manager=None, **kwargs):
+        self.turn += 1
+        if self.turn > 1:
+            yield ChatGenerationChunk(message=AIMessageChunk(content="ok"))
+            return
+        for index, city in enumerate(["beijing", "shanghai"]):
+            args = json.dumps({"city": city})
+            parts = [
+                {"index": index, "id": f"call_{index}", "name": "weather", "args": args[:5]},
+                {"index": index, "id": None, "name": None, "args": args[5:]},
+            ]
+            for part in parts:
+                yield ChatGenerationChunk(message=AIMessageChunk(content="", tool_call_chunks=[part]))
+            await asyncio.sleep(self.delay)
+
+
+calls: list[str] = []
+running = {"now": 0, "peak": 0}
+
+
+async def _weather(city: str) -> str:
+    calls.append(city)
+    running["now"] += 1
+    running["peak"] = max(running["peak"], running["now"])
+    try:
+        await asyncio.sleep(0.3)
+    finally:
+        running["now"] -= 1
+    return f"{city}: sunny"
+
+
+@tool
+async def weather(city: str) -> str:
+    """Look up the weather of a city"""
+    return await _weather(city)
+
+
+weather.metadata = {"eager": True}
+
+
+@tool("weather")
+async def weather_not_opted_in(city: str) -> str:
+    """Look up the weather of a city"""
+    return await _weather(city)
+
+
+@pytest.fixture(autouse=True)
+def _reset():
+    calls.clear()
+    running.update(now=0, peak=0)
+
+
+async def _run_mini_agent(monkeypatch, enabled: bool, tools=(weather,)) -> tuple[float, list]:
+    """Run the real MiniAgent middleware stack with a streaming model and the given tools"""
+    async def get_tools(context):
+        return list(tools)
+
+    async def get_checkpointer():
+        return InMemorySaver()
+
+    monkeypatch.setattr(settings.agent, "AGENT_TOOL_EAGER_DISPATCH", enabled)
+    monkeypatch.setattr(demo_graph, "load_configured_chat_model", lambda name: StreamingToolModel())
+    monkeypatch.setattr(demo_graph, "get_tools_from_context", get_tools)
+    agent = MiniAgent()
+    monkeypatch.setattr(agent, "_get_checkpointer", get_checkpointer)
+    graph = await agent.build_graph(BaseContext())
+
+    calls.clear()
+    start = time.perf_counter()
+    result = await graph.ainvoke(
+        {"messages": [HumanMessage(content="weather?")]}, {"configurable": {"thread_id": "t1"}}, context=BaseContext()
+    )
+    return time.perf_counter() - start, result["messages"]
+
+
+@pytest.mark.asyncio
+async def test_tools_start_before_model_finishes(monkeypatch):
+    """Test tool latency overlaps generation in the MiniAgent stack and results keep tool_call order"""
+    baseline, _ = await _run_mini_agent(monkeypatch, enabled=False)
+    elapsed, messages = await _run_mini_agent(monkeypatch, enabled=True)
+
+    assert calls == ["beijing", "shanghai"]  # each tool ran exactly once
+    tool_messages = [msg for msg in messages if isinstance(msg, ToolMessage)]
+    assert [msg.tool_call_id for msg in tool_messages] == ["call_0", "call_1"]
+    assert [msg.content for msg in tool_messages] == ["beijing: sunny", "shanghai: sunny"]
+    assert elapsed < baseline - 0.1
+
+
+@pytest.mark.asyncio
+async def test_tools_without_opt_in_are_not_dispatched(monkeypatch):
+    """Test eager dispatch only applies to tools with metadata={"eager": True}"""
+    elapsed, messages = await _run_mini_agent(monkeypatch, enabled=True, tools=(weather_not_opted_in,))
+    assert calls == ["beijing", "shanghai"]
+    assert elapsed > 0.4 + 0.3  # tools start only after the model turn ends
+
+
+@pytest.mark.asyncio
+async def test_dispatched_calls_share_the_concurrency_cap():
+    """Test calls started while streaming take the ParallelToolMiddleware slot when dispatched"""
+    parallel = ParallelToolMiddleware(max_concurrency=1)
+    agent = create_agent(
+        model=StreamingToolModel(delay=0.05), tools=[weather],
+        middleware=[parallel, EagerToolDispatchMiddleware(enabled=True, parallel=parallel)],
+    )
+    result = await agent.ainvoke({"messages": [HumanMessage(content="weather?")]})
+
+    assert running["peak"] == 1
+    assert calls == ["beijing", "shanghai"]
+    assert [msg.content for msg in result["messages"] if isinstance(msg, ToolMessage)] == ["beijing: sunny", "shanghai: sunny"]
+    assert parallel._batches == {} and parallel._dispatched == set()
+
+
+@pytest.mark.asyncio
+async def test_mismatched_call_is_not_reused():
+    """Test a dispatched call whose final arguments differ is cancelled and re-run"""
+    middleware = EagerToolDispatchMiddleware(enabled=True)
+    task = asyncio.create_task(asyncio.sleep(10))
+    middleware._pending["call_0"] = _Dispatched({"name": "weather", "args": {"city": "x"}}, (None, "call_0"), task)
+
+    class Request:
+        tool_call = {"name": "weather", "args": {"city": "y"}, "id": "call_0"}
+
+    async def handler(request):
+        return "handled"
+
+    assert await middleware.awrap_tool_call(Request(), handler) == "handled"
+    await asyncio.sleep(0)
+    assert task.cancelled()
@@ -0,0 +1,55 @@
+"""Test multi-endpoint failover and hedged requests"""
+import asyncio
+
+import pytest
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessageChunk, HumanMessage
+from langchain_core.outputs import ChatGenerationChunk
+
+from app.agents.common.failover import FailoverChatModel
+
+
+class EndpointModel(BaseChatModel):
+    model_name: str
+    delay: float = 0.0
+    fail: bool = False
+    calls: int = 0
+
+    @property
+    def _llm_type(self) -> str:
+        return "test"
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        raise NotImplementedError
+
+    async def _astream(self, messages, stop=None, run_manager=None, **kwargs):
+        self.calls += 1
+        await asyncio.sleep(self.delay)
+        if self.fail:
+            raise ConnectionError(self.model_name)
+        for token in (self.model_name, "!"):
+            yield ChatGenerationChunk(message=AIMessageChunk(content=token))
+
+
+@pytest.mark.asyncio
+async def test_hedge_wins_when_primary_is_slow():
+    """Test a second endpoint is tried after the hedge delay and the faster one wins"""
+    slow, fast = EndpointModel(model_name="slow", delay=1.0), EndpointModel(model_name="fast")
+    model = FailoverChatModel(models=[slow, fast], hedge_delay=0.05, min_hedge_delay=0.01)
+
+    result = await asyncio.wait_for(model.ainvoke([HumanMessage(content="hi")]), timeout=0.5)
+    assert result.content == "fast!"
+    assert slow.calls == 1 and fast.calls == 1
+
+
+@pytest.mark.asyncio
+async def test_failover_and_circuit_breaker():
+    """Test failures move to the next endpoint and open the circuit"""
+    broken, backup = EndpointModel(model_name="broken", fail=True), EndpointModel(model_name="backup")
+    model = FailoverChatModel(models=[broken, backup], hedge=False, failure_threshold=2)
+
+    for _ in range(3):
+        result = await model.ainvoke([HumanMessage(content="hi")])
+        assert result.content == "backup!"
+    assert broken.calls == 2  # skipped once the circuit is open
+    assert [stats["healthy"] for stats in model.endpoint_stats()] == [False, True]
@@ -0,0 +1,83 @@
+"""Test compiled graph cache"""
+import asyncio
+
+import pytest
+
+from app.agents.common.graph_cache import GraphCache, graph_cache_key
+from app.core.metrics import metrics_manager
+
+
+def test_cache_key_is_order_independent():
+    """Test keys only depend on the field values"""
+    assert graph_cache_key({"model": "a", "tools": ["x"]}) == graph_cache_key({"tools": ["x"], "model": "a"})
+    assert graph_cache_key({"model": "a"}) != graph_cache_key({"model": "b"})
+
+
+@pytest.mark.asyncio
+async def test_concurrent_requests_share_one_build():
+    """Test concurrent misses for the same key run a single build"""
+    cache = GraphCache("test", max_size=2)
+    calls = 0
+
+    async def build():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        return object()
+
+    results = await asyncio.gather(*[cache.get_or_build("k", build) for _ in range(10)])
+    assert calls == 1
+    assert all(result is results[0] for result in results)
+
+
+@pytest.mark.asyncio
+async def test_lru_eviction_and_invalidate():
+    """Test least recently used graphs are evicted and invalidate drops all"""
+    cache = GraphCache("test", max_size=2)
+
+    async def build():
+        return object()
+
+    await cache.get_or_build("a", build)
+    await cache.get_or_build("b", build)
+    await cache.get_or_build("a", build)
+    await cache.get_or_build("c", build)
+    assert "a" in cache and "c" in cache and "b" not in cache
+
+    cache.invalidate()
+    assert len(cache) == 0
+
+
+@pytest.mark.asyncio
+async def test_concurrent_reloads_rebuild_once():
+    """Test concurrent reloads share one rebuild and record its duration"""
+    cache = GraphCache("test-reload", max_size=2)
+    calls = 0
+
+    async def build():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        return object()
+
+    first = await cache.get_or_build("k", build)
+    results = await asyncio.gather(*[cache.reload("k", build) for _ in range(5)])
+    assert calls == 2
+    assert all(result is results[0] for result in results)
+    assert results[0] is not first
+    assert metrics_manager.get_summary("agent_graph_build_seconds", agent="test-reload")["count"] == 2
+
+
+def test_deep_agent_key_ignores_unused_fields():
+    """Test DeepAgent graphs are keyed only by the fields it builds from"""
+    from types import SimpleNamespace
+
+    from app.agents.deep_agent.graph import DeepAgent
+
+    agent = object.__new__(DeepAgent)
+    base = {"model": "m", "subagents_model": "s", "tools": ["a"], "knowledges": [], "mcps": []}
+    other = {**base, "tools": ["b"], "knowledges": ["kb"], "mcps": ["srv"]}
+    assert agent.get_graph_key(SimpleNamespace(**base)) == agent.get_graph_key(SimpleNamespace(**other))
+    assert agent.get_graph_key(SimpleNamespace(**base)) != agent.get_graph_key(
+        SimpleNamespace(**{**base, "subagents_model": "t"})
+    )
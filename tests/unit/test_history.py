@@ -0,0 +1,33 @@
+"""Test thread history serialization cache and pagination"""
+from langchain_core.messages import AIMessage, HumanMessage, ToolMessage
+
+from app.agents.common.history import HistoryCache, paginate, serialize_message
+
+
+def test_light_projection():
+    """Test light projection keeps role, text and tool names only"""
+    msg = AIMessage(content="", id="a", tool_calls=[{"name": "calc", "args": {"x": 1}, "id": "c1"}])
+    assert serialize_message(msg, "light") == {"id": "a", "type": "ai", "content": "", "tool_calls": ["calc"]}
+    tool = ToolMessage(content="2", name="calc", tool_call_id="c1", id="t")
+    assert serialize_message(tool, "light") == {"id": "t", "type": "tool", "content": "2", "name": "calc"}
+
+
+def test_paginate_cursors():
+    """Test latest-N default and before / after cursors"""
+    items = [{"id": str(i)} for i in range(10)]
+    assert paginate(items, limit=3) == (items[7:], True)
+    assert paginate(items, limit=3, before="7") == (items[4:7], True)
+    assert paginate(items, limit=3, after="7") == (items[8:], False)
+    assert paginate(items, limit=3, after="1") == (items[2:5], True)
+    assert paginate(items, before="missing") == ([], False)
+
+
+def test_cache_reuses_serialization_per_checkpoint():
+    """Test the same checkpoint is serialized once"""
+    cache = HistoryCache(max_size=2)
+    messages = [HumanMessage(content="hi", id="1")]
+    first = cache.get_or_serialize("t", "cp1", messages)
+    assert cache.get_or_serialize("t", "cp1", []) is first
+    assert cache.get_or_serialize("t", "cp2", messages) is not first
+    cache.invalidate("t")
+    assert cache.get_or_serialize("t", "cp1", []) == []
@@ -0,0 +1,93 @@
+"""Test exact-match LLM response cache"""
+from types import SimpleNamespace
+
+import pytest
+from langchain.agents import create_agent
+from langchain_core.language_models.fake_chat_models import GenericFakeChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, HumanMessage
+from langchain_core.tools import tool
+
+from app.agents.common.llm_cache import LLMResponseCache, llm_response_cache, model_temperature, request_cache_key
+from app.agents.common.middlewares.llm_cache_middleware import LLMCacheMiddleware
+from app.core.config import settings
+
+MODEL = SimpleNamespace(model_name="gpt-test", temperature=0)
+
+
+def test_key_ignores_message_ids_and_tool_order():
+    """Test equivalent requests share a key"""
+    tool_a = {"type": "function", "function": {"name": "a"}}
+    tool_b = {"type": "function", "function": {"name": "b"}}
+    first = request_cache_key(MODEL, [HumanMessage(content="1+1", id="x")], "sys", [tool_a, tool_b])
+    second = request_cache_key(MODEL, [HumanMessage(content="1+1", id="y")], "sys", [tool_b, tool_a])
+    assert first == second
+    assert first != request_cache_key(MODEL, [HumanMessage(content="1+2")], "sys", [tool_a, tool_b])
+    assert first != request_cache_key(MODEL, [HumanMessage(content="1+1")], "other", [tool_a, tool_b])
+
+
+def test_temperature_resolution():
+    """Test per-call settings override the model temperature"""
+    assert model_temperature(MODEL) == 0
+    assert model_temperature(MODEL, {"temperature": 0.7}) == 0.7
+    assert model_temperature(SimpleNamespace()) is None
+
+
+def test_entry_roundtrip():
+    """Test cached responses are compressed and restored"""
+    cache = LLMResponseCache(prefix="test", ttl=60, max_entries=10, max_entry_bytes=1 << 20)
+    value = {"result": [AIMessage(content="2" * 2000, id="m")], "structured_response": None}
+    raw = cache.encode(value)
+    assert len(raw) < 2000
+    assert cache.decode(raw)["result"][0].content == "2" * 2000
+
+
+class FakeToolModel(GenericFakeChatModel):
+    temperature: float = 0
+
+    def bind_tools(self, tools, **kwargs):
+        return self
+
+
+@tool
+def lookup(city: str) -> str:
+    """Look up a city"""
+    return f"{city}: ok"
+
+
+@pytest.mark.asyncio
+async def test_hit_is_replayed_as_a_stream_with_fresh_ids(monkeypatch):
+    """Test a cache hit streams in chunks and does not reuse message or tool_call ids"""
+    store = {}
+
+    async def get(key):
+        return store.get(key)
+
+    async def put(key, value):
+        store[key] = value
+        return True
+
+    monkeypatch.setattr(settings.llm, "LLM_CACHE_ENABLED", True)
+    monkeypatch.setattr(llm_response_cache, "get", get)
+    monkeypatch.setattr(llm_response_cache, "set", put)
+    answer = "The weather in Beijing is sunny with a light breeze."
+    model = FakeToolModel(messages=iter([
+        AIMessage(content="", tool_calls=[{"name": "lookup", "args": {"city": "beijing"}, "id": "call_1"}]),
+        AIMessage(content=answer),
+    ]))
+    agent = create_agent(model=model, tools=[lookup], middleware=[LLMCacheMiddleware(agent="test")])
+
+    first = await agent.ainvoke({"messages": [HumanMessage(content="weather?")]})
+    chunks = []
+    async for message, _ in agent.astream({"messages": [HumanMessage(content="weather?")]}, stream_mode="messages"):
+        if isinstance(message, AIMessageChunk):
+            chunks.append(message)
+    second = await agent.ainvoke({"messages": [HumanMessage(content="weather?")]})
+
+    assert "".join(chunk.text for chunk in chunks) == answer
+    assert len([chunk for chunk in chunks if chunk.text]) > 1
+    assert any(chunk.tool_call_chunks for chunk in chunks)
+    old, new = first["messages"][1], second["messages"][1]
+    assert new.response_metadata["cache"] == "hit" and new.id != old.id
+    assert new.tool_calls[0]["id"] != old.tool_calls[0]["id"]
+    assert second["messages"][2].tool_call_id == new.tool_calls[0]["id"]
+    assert second["messages"][-1].content == answer
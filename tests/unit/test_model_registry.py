@@ -0,0 +1,42 @@
+"""Test shared chat model registry"""
+from app.agents.common.models import ChatModelRegistry
+
+
+def test_same_config_reuses_model_and_pool():
+    """Test identical configs share the model and the HTTP pool per base_url"""
+    registry = ChatModelRegistry()
+    first = registry.get("openai", "gpt-4o-mini", "https://example.com/v1", "sk-test", temperature=0)
+    second = registry.get("openai", "gpt-4o-mini", "https://example.com/v1", "sk-test", temperature=0)
+    other = registry.get("openai", "gpt-4o-mini", "https://example.com/v1", "sk-test", temperature=1)
+
+    assert first is second
+    assert other is not first
+    stats = registry.stats()
+    assert stats["models"] == 2
+    assert list(stats["pools"]) == ["https://example.com/v1"]
+
+
+def test_configured_model_with_several_base_urls_fails_over(monkeypatch):
+    """Test a named model with several base_urls loads as one FailoverChatModel"""
+    from app.agents.common.failover import FailoverChatModel
+    from app.agents.common.models import load_configured_chat_model, model_registry
+    from app.core.config import settings
+
+    monkeypatch.setattr(settings.llm, "LLM_MODELS", {
+        "gpt-4o": {
+            "provider": "openai",
+            "api_key": "sk-test",
+            "base_urls": ["https://a.example.com/v1", "https://b.example.com/v1"],
+            "hedge": False,
+        },
+        "single": {"provider": "openai", "model": "gpt-4o-mini", "api_key": "sk-test", "base_url": "https://a.example.com/v1"},
+    })
+    model = load_configured_chat_model("gpt-4o")
+    assert isinstance(model, FailoverChatModel) and model.hedge is False
+    assert [str(m.openai_api_base) for m in model.models] == ["https://a.example.com/v1", "https://b.example.com/v1"]
+    assert all(m.model_name == "gpt-4o" for m in model.models)
+    assert load_configured_chat_model("gpt-4o") is model
+
+    single = load_configured_chat_model("single")
+    assert not isinstance(single, FailoverChatModel) and single.model_name == "gpt-4o-mini"
+    model_registry._models.clear()
@@ -0,0 +1,84 @@
+"""Test the parallel tool middleware"""
+import asyncio
+import time
+
+import pytest
+from langchain.agents import create_agent
+from langchain_core.language_models.fake_chat_models import GenericFakeChatModel
+from langchain_core.messages import AIMessage, HumanMessage, ToolMessage
+from langchain_core.tools import tool
+
+from app.agents.common.middlewares.parallel_tool_middleware import ParallelToolMiddleware
+
+
+class FakeToolModel(GenericFakeChatModel):
+    def bind_tools(self, tools, **kwargs):
+        return self
+
+
+running = {"now": 0, "peak": 0}
+
+
+@tool
+async def slow(seconds: float) -> str:
+    """Sleep for the given seconds"""
+    running["now"] += 1
+    running["peak"] = max(running["peak"], running["now"])
+    try:
+        await asyncio.sleep(seconds)
+    finally:
+        running["now"] -= 1
+    return "done"
+
+
+@tool
+async def broken() -> str:
+    """Always fails"""
+    await asyncio.sleep(0.01)
+    raise RuntimeError("boom")
+
+
+def _agent(calls: list[dict], middleware: ParallelToolMiddleware):
+    model = FakeToolModel(messages=iter([
+        AIMessage(content="", tool_calls=[{**call, "id": f"call_{i}"} for i, call in enumerate(calls)]),
+        AIMessage(content="ok"),
+    ]))
+    return create_agent(model=model, tools=[slow, broken], middleware=[middleware])
+
+
+@pytest.fixture(autouse=True)
+def _reset():
+    running.update(now=0, peak=0)
+
+
+@pytest.mark.asyncio
+async def test_concurrency_cap_and_timeout():
+    """Test calls from one turn respect the cap and a slow call times out"""
+    calls = [{"name": "slow", "args": {"seconds": 0.1}} for _ in range(4)]
+    calls.append({"name": "slow", "args": {"seconds": 5}})
+    agent = _agent(calls, ParallelToolMiddleware(max_concurrency=2, default_timeout=0.3))
+
+    start = time.perf_counter()
+    result = await agent.ainvoke({"messages": [HumanMessage(content="go")]})
+    assert time.perf_counter() - start < 2
+    assert running["peak"] == 2
+
+    tool_messages = [msg for msg in result["messages"] if isinstance(msg, ToolMessage)]
+    assert [msg.status for msg in tool_messages] == ["success"] * 4 + ["error"]
+    assert "超时" in tool_messages[-1].content
+    assert all("duration_ms" in msg.response_metadata for msg in tool_messages[:4])
+
+
+@pytest.mark.asyncio
+async def test_fatal_error_cancels_siblings():
+    """Test an unhandled tool error cancels the other calls of the batch"""
+    calls = [{"name": "broken", "args": {}}, {"name": "slow", "args": {"seconds": 5}}]
+    middleware = ParallelToolMiddleware(max_concurrency=4, default_timeout=0)
+    agent = _agent(calls, middleware)
+
+    start = time.perf_counter()
+    with pytest.raises(RuntimeError, match="boom"):
+        await agent.ainvoke({"messages": [HumanMessage(content="go")]})
+    assert time.perf_counter() - start < 2
+    assert running["now"] == 0
+    assert middleware._batches == {}
@@ -0,0 +1,94 @@
+"""Test cache-friendly system prompt assembly"""
+import pytest
+from langchain.agents import create_agent
+from langchain_core.language_models.fake_chat_models import GenericFakeChatModel
+from langchain_core.messages import AIMessage, HumanMessage
+from langgraph.checkpoint.memory import InMemorySaver
+
+from app.agents.common.middlewares.prompt_assembly_middleware import PromptAssemblyMiddleware
+from app.agents.common.prompt import SESSION, STABLE, VOLATILE, assemble_prompt, join_prompt, system_segments
+from app.agents.deep_agent.context import DEEP_PROMPT, DeepContext
+from app.agents.deep_agent.graph import context_aware_prompt
+from app.core.metrics import metrics_manager
+
+
+def test_join_prompt_drops_duplicates():
+    """Test a segment repeated or contained in an earlier one is sent once"""
+    base = "你是一位研究员。\n\n请先规划再执行。"
+    assert join_prompt(base, base) == base
+    assert join_prompt(base, "  请先规划再执行。 ") == base
+    assert join_prompt(base, "", "额外要求") == base + "\n\n额外要求"
+
+
+def test_assemble_orders_by_stability():
+    """Test stable segments form the prefix regardless of registration order"""
+    prompt, prefix_len = assemble_prompt([
+        (VOLATILE, "当前时间"),
+        (STABLE, "角色"),
+        (SESSION, "附件"),
+        (STABLE, "工具说明"),
+        (SESSION, "角色"),
+    ])
+    assert prompt == "角色\n\n工具说明\n\n附件\n\n当前时间"
+    assert prompt[:prefix_len] == "角色\n\n工具说明"
+
+
+def test_system_segments_from_content_blocks():
+    """Test each text block appended by a middleware becomes one segment"""
+    content = ["角色", {"type": "text", "text": "\n\n工具说明"}, {"type": "image_url", "image_url": "x"}]
+    assert system_segments(content) == ["角色", "\n\n工具说明"]
+    assert system_segments("角色") == ["角色"]
+    assert system_segments(None) == []
+
+
+class RecordingModel(GenericFakeChatModel):
+    prompts: list = []
+
+    def bind_tools(self, tools, **kwargs):
+        return self
+
+    async def _agenerate(self, messages, *args, **kwargs):
+        self.prompts.append(messages[0].content if messages[0].type == "system" else None)
+        return await super()._agenerate(messages, *args, **kwargs)
+
+
+def _deep_prompt_agent(middleware):
+    model = RecordingModel(messages=iter([AIMessage(content="ok") for _ in range(4)]))
+    model.prompts = []
+    agent = create_agent(
+        model=model, system_prompt=DEEP_PROMPT, middleware=[context_aware_prompt, middleware],
+        context_schema=DeepContext, checkpointer=InMemorySaver(),
+    )
+    return agent, model
+
+
+@pytest.mark.asyncio
+async def test_context_system_prompt_is_a_session_segment(monkeypatch):
+    """Test a per-request system prompt goes after DEEP_PROMPT instead of into the stable prefix"""
+    prefixes = []
+    monkeypatch.setattr(
+        metrics_manager, "observe",
+        lambda name, value, **labels: prefixes.append(value) if name == "llm_prompt_cacheable_prefix_chars" else None,
+    )
+    agent, model = _deep_prompt_agent(PromptAssemblyMiddleware())
+    config = {"configurable": {"thread_id": "t1"}}
+    await agent.ainvoke({"messages": [HumanMessage(content="hi")]}, config, context=DeepContext(system_prompt="简洁回答"))
+    await agent.ainvoke({"messages": [HumanMessage(content="hi")]}, config, context=DeepContext())
+
+    assert model.prompts == [DEEP_PROMPT.strip() + "\n\n简洁回答", DEEP_PROMPT.strip()]
+    assert prefixes == [len(DEEP_PROMPT.strip())] * 2
+
+
+@pytest.mark.asyncio
+async def test_prefix_changes_are_counted_per_thread(monkeypatch):
+    """Test threads with different stable prefixes do not count as prefix changes"""
+    changes = []
+    monkeypatch.setattr(metrics_manager, "inc", lambda name, *args, **labels: changes.append(name))
+    middleware = PromptAssemblyMiddleware()
+
+    for thread_id, prompt in [("t1", "角色一"), ("t2", "角色二"), ("t1", "角色一"), ("t1", "角色三")]:
+        agent = create_agent(
+            model=RecordingModel(messages=iter([AIMessage(content="ok")])), system_prompt=prompt, middleware=[middleware]
+        )
+        await agent.ainvoke({"messages": [HumanMessage(content="hi")]}, {"configurable": {"thread_id": thread_id}})
+    assert changes.count("llm_prompt_prefix_changes_total") == 1
@@ -0,0 +1,64 @@
+"""Test adaptive LLM admission control"""
+import asyncio
+
+import pytest
+
+from app.agents.common.scheduler import AdaptiveLimiter, AdmissionRejected, is_rate_limited
+
+
+class RateLimitError(Exception):
+    status_code = 429
+
+
+@pytest.mark.asyncio
+async def test_interactive_waiters_are_admitted_first():
+    """Test queued calls are admitted by priority, then FIFO"""
+    limiter = AdaptiveLimiter("m", initial=1, max_queue=10)
+    await limiter.acquire()
+    order = []
+
+    async def call(name, priority):
+        await limiter.acquire(priority)
+        order.append(name)
+        limiter.release()
+
+    tasks = [
+        asyncio.create_task(call("bg", "background")),
+        asyncio.create_task(call("ui1", "interactive")),
+        asyncio.create_task(call("ui2", "interactive")),
+    ]
+    await asyncio.sleep(0)
+    limiter.release()
+    await asyncio.gather(*tasks)
+    assert order == ["ui1", "ui2", "bg"]
+    assert limiter.in_flight == 0
+
+
+@pytest.mark.asyncio
+async def test_full_queue_and_timeout_are_rejected():
+    """Test bounded queue rejects instead of piling up"""
+    limiter = AdaptiveLimiter("m", initial=1, max_queue=1, queue_timeout=0.01)
+    await limiter.acquire()
+    with pytest.raises(AdmissionRejected):
+        await limiter.acquire()
+    waiter = asyncio.create_task(limiter.acquire())
+    await asyncio.sleep(0)
+    with pytest.raises(AdmissionRejected):
+        await limiter.acquire()
+    with pytest.raises(AdmissionRejected):
+        await waiter
+
+
+def test_aimd_adjustments():
+    """Test additive increase and multiplicative decrease with cooldown"""
+    limiter = AdaptiveLimiter("m", initial=4, min_limit=1, max_limit=8, target_latency=1.0)
+    for _ in range(4):
+        limiter.on_success(0.1)
+    assert 4.9 < limiter.limit < 5
+    limiter.on_rate_limited()
+    decreased = limiter.limit
+    assert decreased < 4
+    limiter.on_rate_limited()  # within cooldown
+    assert limiter.limit == decreased
+    assert is_rate_limited(RateLimitError())
+    assert not is_rate_limited(ValueError())
@@ -0,0 +1,110 @@
+"""Test semantic response cache"""
+import hashlib
+import threading
+
+import numpy as np
+import pytest
+
+from app.agents.common.semantic_cache import SemanticCache, load_embedder
+
+
+class HashingEmbedder:
+    """Deterministic test embedding that hashes character n-grams into a fixed dimension"""
+
+    def __init__(self, dim: int = 512, ngram: int = 3):
+        self.dim = dim
+        self.ngram = ngram
+
+    def embed_query(self, text: str) -> list[float]:
+        text = " ".join(text.lower().split())
+        vec = np.zeros(self.dim, dtype=np.float32)
+        for n in range(1, self.ngram + 1):
+            for i in range(max(1, len(text) - n + 1)):
+                digest = hashlib.blake2b(text[i:i + n].encode("utf-8"), digest_size=8).digest()
+                value = int.from_bytes(digest, "little")
+                vec[value % self.dim] += 1.0 if value >> 63 else -1.0
+        return vec.tolist()
+
+    async def aembed_query(self, text: str) -> list[float]:
+        return self.embed_query(text)
+
+
+def make_cache(tmp_path, **kwargs):
+    options = {"threshold": 0.8, "max_entries": 2, "ttl": 3600, "persist_dir": tmp_path, "persist_every": 100}
+    options.update(kwargs)
+    return SemanticCache("test", embedder=HashingEmbedder(), **options)
+
+
+@pytest.mark.asyncio
+async def test_near_duplicates_hit_within_partition(tmp_path):
+    """Test similar questions hit and other system prompts do not"""
+    cache = make_cache(tmp_path)
+    await cache.store("sys", "How do I reset my password?", "Use the reset link.")
+
+    found = await cache.lookup("sys", "how do I reset my password")
+    assert found is not None and found[0] == "Use the reset link."
+    assert await cache.lookup("sys", "What is the weather in Paris tomorrow?") is None
+    assert await cache.lookup("other", "How do I reset my password?") is None
+
+
+@pytest.mark.asyncio
+async def test_lru_eviction_and_ttl(tmp_path):
+    """Test the least recently hit entry is evicted and expired entries are ignored"""
+    cache = make_cache(tmp_path)
+    await cache.store("sys", "first question about billing", "a1")
+    await cache.store("sys", "second question about shipping", "a2")
+    assert await cache.lookup("sys", "first question about billing") is not None
+    await cache.store("sys", "third question about refunds", "a3")
+    assert await cache.lookup("sys", "second question about shipping") is None
+    assert await cache.lookup("sys", "first question about billing") is not None
+
+    expired = make_cache(tmp_path / "ttl", ttl=-1)
+    await expired.store("sys", "question", "answer")
+    assert await expired.lookup("sys", "question") is None
+
+
+@pytest.mark.asyncio
+async def test_persistence(tmp_path):
+    """Test flushed partitions are loaded by a new cache"""
+    cache = make_cache(tmp_path)
+    await cache.store("sys", "Which plans do you offer?", "Free and Pro.")
+    cache.flush()
+
+    reloaded = make_cache(tmp_path)
+    found = await reloaded.lookup("sys", "which plans do you offer")
+    assert found is not None and found[0] == "Free and Pro."
+
+
+@pytest.mark.asyncio
+async def test_partition_includes_model_tools_and_knowledges(tmp_path):
+    """Test answers are not shared across models, tool sets or knowledge bases"""
+    cache = make_cache(tmp_path)
+    base = SemanticCache.partition_key("sys", model="gpt-4o", tools=["calculator", "search"], knowledges=["kb1"])
+    await cache.store(base, "How do I reset my password?", "Use the reset link.")
+
+    same = SemanticCache.partition_key("sys", model="gpt-4o", tools=["search", "calculator"], knowledges=["kb1"])
+    assert await cache.lookup(same, "How do I reset my password?") is not None
+    for other in (
+        SemanticCache.partition_key("sys", model="gpt-4o-mini", tools=["calculator", "search"], knowledges=["kb1"]),
+        SemanticCache.partition_key("sys", model="gpt-4o", tools=["calculator"], knowledges=["kb1"]),
+        SemanticCache.partition_key("sys", model="gpt-4o", tools=["calculator", "search"], knowledges=["kb2"]),
+    ):
+        assert await cache.lookup(other, "How do I reset my password?") is None
+
+
+@pytest.mark.asyncio
+async def test_store_persists_off_the_event_loop(tmp_path, monkeypatch):
+    """Test periodic persistence runs in a worker thread"""
+    cache = make_cache(tmp_path, persist_every=1)
+    threads = []
+    flush = cache.flush
+    monkeypatch.setattr(cache, "flush", lambda: (threads.append(threading.current_thread()), flush()))
+    await cache.store("sys", "Which plans do you offer?", "Free and Pro.")
+    assert threads and threads[0] is not threading.main_thread()
+    assert (tmp_path / "sys.npz").exists()
+
+
+def test_embedding_model_is_required():
+    """Test the cache cannot run without a configured embedding model"""
+    with pytest.raises(ValueError):
+        load_embedder("")
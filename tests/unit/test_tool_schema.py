@@ -0,0 +1,40 @@
+"""Test the tool schema cache"""
+from langchain_core.tools import StructuredTool
+from langchain_core.utils.function_calling import convert_to_openai_tool
+
+from app.agents.common import tool_schema
+from app.agents.common.tool_schema import ToolSchemaCache
+
+
+def _tool(name: str, description: str = "demo") -> StructuredTool:
+    def search(query: str, limit: int = 10) -> str:
+        return query
+
+    return StructuredTool.from_function(func=search, name=name, description=description)
+
+
+def test_schema_reused_until_tool_changes():
+    """Test schemas are converted once per tool object and version"""
+    cache = ToolSchemaCache(max_size=8)
+    tool = _tool("search")
+    first = cache.get(tool)
+    assert first == convert_to_openai_tool(tool)
+    assert cache.get(tool) is first
+
+    tool.description = "changed"
+    assert cache.get(tool) is not first
+    assert cache.get(tool)["function"]["description"] == "changed"
+
+    builtin = {"type": "web_search_preview"}
+    assert cache.get(builtin) is builtin
+
+
+def test_cache_cleared_on_mcp_reload(monkeypatch):
+    """Test an MCP generation change drops cached schemas"""
+    generation = [0]
+    monkeypatch.setattr(tool_schema, "mcp_generation", lambda: generation[0])
+    cache = ToolSchemaCache(max_size=8)
+    tool = _tool("search")
+    first = cache.get(tool)
+    generation[0] += 1
+    assert cache.get(tool) is not first
@@ -0,0 +1,76 @@
+"""Test token usage accounting"""
+from langchain_core.messages import AIMessage
+from langchain_core.outputs import ChatGeneration, LLMResult
+
+from app.agents.common.usage import ack_usage, drain_usage, extract_usage, usage_key
+
+
+class FakeRedis:
+    """Minimal in-memory client for the hash / set commands used by drain and ack"""
+
+    def __init__(self):
+        self.hashes: dict[str, dict] = {}
+        self.sets: dict[str, set] = {}
+
+    def smembers(self, key):
+        return set(self.sets.get(key, set()))
+
+    def srem(self, key, member):
+        self.sets.get(key, set()).discard(member)
+
+    def hgetall(self, key):
+        return {k: str(v) for k, v in self.hashes.get(key, {}).items()}
+
+    def delete(self, key):
+        self.hashes.pop(key, None)
+
+    def hincrby(self, key, field, value):
+        data = self.hashes.setdefault(key, {})
+        data[field] = int(data.get(field, 0)) + value
+
+    def pipeline(self, transaction=False):
+        return self
+
+    def execute(self):
+        return []
+
+
+def test_extract_usage():
+    """Test usage metadata and model name are read from generations"""
+    msg = AIMessage(
+        content="ok",
+        usage_metadata={
+            "input_tokens": 10,
+            "output_tokens": 3,
+            "total_tokens": 13,
+            "input_token_details": {"cache_read": 4},
+        },
+        response_metadata={"model_name": "gpt-test"},
+    )
+    result = LLMResult(generations=[[ChatGeneration(message=msg), ChatGeneration(message=AIMessage(content="x"))]])
+    assert extract_usage(result) == [
+        ("gpt-test", {"prompt_tokens": 10, "completion_tokens": 3, "cached_tokens": 4})
+    ]
+
+
+def test_drain_and_ack_keep_new_counts():
+    """Test counts added between drain and ack are kept for the next flush"""
+    client = FakeRedis()
+    key = usage_key("2026-01-30", "1", "ChatbotAgent", "gpt-test")
+    client.sets["usage:keys"] = {key}
+    client.hashes[key] = {
+        "usage_date": "2026-01-30", "user_id": "1", "agent_id": "ChatbotAgent", "model": "gpt-test",
+        "calls": 2, "prompt_tokens": 20, "completion_tokens": 5, "cached_tokens": 0, "latency_ms": 800,
+    }
+
+    rows = drain_usage(client)
+    assert len(rows) == 1 and rows[0]["prompt_tokens"] == 20 and rows[0]["agent_id"] == "ChatbotAgent"
+
+    client.hincrby(key, "calls", 1)
+    client.hincrby(key, "prompt_tokens", 7)
+    ack_usage(client, rows)
+    assert client.hashes[key]["calls"] == 1 and client.hashes[key]["prompt_tokens"] == 7
+
+    # 旧日期的计数全部写入后 key 被清理
+    ack_usage(client, drain_usage(client))
+    assert drain_usage(client) == [] and key not in client.hashes